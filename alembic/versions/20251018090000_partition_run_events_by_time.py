@@ -0,0 +1,101 @@
+"""Partition run_events by created_at
+
+Revision ID: 3c9d2f6a8b41
+Revises: aee821a02fc8
+Create Date: 2025-10-18 09:00:00.000000
+
+"""
+
+from datetime import UTC, datetime, timedelta
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3c9d2f6a8b41"
+down_revision = "aee821a02fc8"
+branch_labels = None
+depends_on = None
+
+# Hourly partitions created up front; the event store keeps creating
+# upcoming ones and drops expired ones
+PARTITIONS_BEHIND = 1
+PARTITIONS_AHEAD = 3
+
+
+def upgrade() -> None:
+    """Recreate run_events as a table range-partitioned by hour."""
+    op.execute("ALTER TABLE run_events RENAME TO run_events_unpartitioned")
+    op.execute("DROP INDEX IF EXISTS idx_run_events_run_id")
+    op.execute("DROP INDEX IF EXISTS idx_run_events_seq")
+    op.execute(
+        "ALTER TABLE run_events_unpartitioned DROP CONSTRAINT IF EXISTS run_events_pkey"
+    )
+
+    # The partition key has to be part of the primary key
+    op.execute(
+        """
+        CREATE TABLE run_events (
+            id TEXT NOT NULL,
+            run_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            data JSONB,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            CONSTRAINT run_events_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    # Replay reads by (run_id, seq); the run_id prefix covers run lookups
+    op.create_index("idx_run_events_seq", "run_events", ["run_id", "seq"])
+    op.execute("CREATE TABLE run_events_default PARTITION OF run_events DEFAULT")
+
+    current = datetime.now(UTC).replace(minute=0, second=0, microsecond=0)
+    for offset in range(-PARTITIONS_BEHIND, PARTITIONS_AHEAD + 1):
+        start = current + timedelta(hours=offset)
+        end = start + timedelta(hours=1)
+        op.execute(
+            f"CREATE TABLE run_events_p{start:%Y%m%d%H} PARTITION OF run_events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+
+    op.execute(
+        """
+        INSERT INTO run_events (id, run_id, seq, event, data, created_at)
+        SELECT id, run_id, seq, event, data, created_at
+        FROM run_events_unpartitioned
+        """
+    )
+    op.execute("DROP TABLE run_events_unpartitioned")
+
+
+def downgrade() -> None:
+    """Restore the unpartitioned run_events table."""
+    op.execute("ALTER TABLE run_events RENAME TO run_events_partitioned")
+    op.execute("DROP INDEX IF EXISTS idx_run_events_seq")
+    op.execute(
+        "ALTER TABLE run_events_partitioned DROP CONSTRAINT IF EXISTS run_events_pkey"
+    )
+    op.execute(
+        """
+        CREATE TABLE run_events (
+            id TEXT NOT NULL,
+            run_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            data JSONB,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            CONSTRAINT run_events_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.create_index("idx_run_events_run_id", "run_events", ["run_id"])
+    op.create_index("idx_run_events_seq", "run_events", ["run_id", "seq"])
+    op.execute(
+        """
+        INSERT INTO run_events (id, run_id, seq, event, data, created_at)
+        SELECT DISTINCT ON (id) id, run_id, seq, event, data, created_at
+        FROM run_events_partitioned
+        ORDER BY id, created_at
+        """
+    )
+    op.execute("DROP TABLE run_events_partitioned")
@@ -0,0 +1,30 @@
+"""Add binary payload column to run_events
+
+Revision ID: 8e4a1b7c2d90
+Revises: 3c9d2f6a8b41
+Create Date: 2025-10-18 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8e4a1b7c2d90"
+down_revision = "3c9d2f6a8b41"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Store pre-encoded, compressed SSE frames next to the JSONB data.
+
+    Existing rows keep their JSONB data; readers handle both formats.
+    """
+    op.add_column("run_events", sa.Column("payload", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop the binary payload column (events stored only there are lost)."""
+    op.drop_column("run_events", "payload")
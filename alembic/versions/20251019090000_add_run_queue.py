@@ -0,0 +1,42 @@
+"""Add execution kwargs and a queue index to runs
+
+Revision ID: 4f2c7a9e1b35
+Revises: 8e4a1b7c2d90
+Create Date: 2025-10-19 09:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4f2c7a9e1b35"
+down_revision = "8e4a1b7c2d90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Keep what is needed to start a run later, and index each thread's queue.
+
+    Runs created with multitask_strategy='enqueue' wait as 'queued' rows and
+    are started from these stored arguments once the thread is free.
+    """
+    op.add_column(
+        "runs",
+        sa.Column("kwargs", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+    op.create_index(
+        "idx_runs_thread_queue",
+        "runs",
+        ["thread_id", "created_at"],
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+
+
+def downgrade() -> None:
+    """Drop the queue index and stored kwargs (queued runs can no longer start)."""
+    op.drop_index("idx_runs_thread_queue", table_name="runs")
+    op.drop_column("runs", "kwargs")
@@ -0,0 +1,43 @@
+"""Add worker claim leases to runs
+
+Revision ID: 9c1e5d7a3f28
+Revises: 4f2c7a9e1b35
+Create Date: 2025-10-20 09:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9c1e5d7a3f28"
+down_revision = "4f2c7a9e1b35"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Record which worker executes a run and until when its claim holds.
+
+    Workers renew the lease while they execute a run; a running run whose
+    lease expired (its worker crashed or was killed) is claimed again.
+    """
+    op.add_column("runs", sa.Column("claimed_by", sa.Text(), nullable=True))
+    op.add_column(
+        "runs",
+        sa.Column("lease_expires_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "idx_runs_lease",
+        "runs",
+        ["lease_expires_at"],
+        postgresql_where=sa.text("status = 'running'"),
+    )
+
+
+def downgrade() -> None:
+    """Drop worker leases (runs of dead workers are no longer reclaimed)."""
+    op.drop_index("idx_runs_lease", table_name="runs")
+    op.drop_column("runs", "lease_expires_at")
+    op.drop_column("runs", "claimed_by")
@@ -0,0 +1,41 @@
+"""Add a per-run expiry of stored events to runs
+
+Revision ID: 5a8f2c6d9b14
+Revises: 9c1e5d7a3f28
+Create Date: 2025-10-21 09:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5a8f2c6d9b14"
+down_revision = "9c1e5d7a3f28"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Persist when a run's events expire, for retentions set per run.
+
+    Runs with the server-wide retention leave it NULL; the others are
+    deleted (shorter) or kept past partition drops (longer) until then.
+    """
+    op.add_column(
+        "runs",
+        sa.Column("events_expire_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "idx_runs_events_expire_at",
+        "runs",
+        ["events_expire_at"],
+        postgresql_where=sa.text("events_expire_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Drop per-run event expiries (all events use the server-wide retention)."""
+    op.drop_index("idx_runs_events_expire_at", table_name="runs")
+    op.drop_column("runs", "events_expire_at")
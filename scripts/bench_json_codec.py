@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark the per-event encode cost of the JSON codecs.
+
+Encodes typical run events (token chunks, state snapshots with a growing
+message history, interrupts) into SSE frames and stored JSON with every
+available codec and prints the mean cost per event.
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.messages import (  # noqa: E402
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    ToolMessage,
+)
+from langgraph.types import Interrupt  # noqa: E402
+
+from src.agent_server.core.serializers import json_codec  # noqa: E402
+from src.agent_server.services.event_converter import EventConverter  # noqa: E402
+
+
+def sample_events(history: int) -> dict[str, tuple]:
+    """Build one raw event of each kind, with `history` messages of state"""
+    messages = []
+    for i in range(history):
+        messages.append(HumanMessage(content=f"Consulta número {i} sobre la ODS"))
+        messages.append(
+            AIMessage(
+                content="Revisando el instructivo correspondiente. " * 8,
+                id=f"ai-{i}",
+                tool_calls=[
+                    {"name": "buscar", "args": {"query": f"ods {i}"}, "id": f"c{i}"}
+                ],
+            )
+        )
+        messages.append(ToolMessage(content="resultado " * 20, tool_call_id=f"c{i}"))
+    chunk = AIMessageChunk(content="token", id="ai-stream")
+    metadata = {"langgraph_node": "agent", "langgraph_step": 3, "thread_id": "t-1"}
+    return {
+        "messages": ("messages", (chunk, metadata)),
+        "values": ("values", {"messages": messages, "step": history}),
+        "interrupt": (
+            "updates",
+            {"__interrupt__": (Interrupt(value={"question": "¿Confirmar?"}, id="i"),)},
+        ),
+    }
+
+
+def bench(codec_name: str, events: dict[str, tuple], number: int) -> dict[str, float]:
+    """Mean microseconds to encode each event kind with a codec"""
+    json_codec._codec = json_codec.create_json_codec(codec_name)
+    converter = EventConverter()
+    results = {}
+    for kind, raw_event in events.items():
+        seconds = timeit.timeit(
+            lambda raw_event=raw_event: converter.encode_raw_event(
+                "run_event_1", raw_event
+            ),
+            number=number,
+        )
+        results[kind] = seconds / number * 1e6
+    return results
+
+
+def main():
+    """Run the benchmark and print a table"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", type=int, default=10)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    events = sample_events(args.history)
+    codecs = [json_codec.CODEC_STDLIB]
+    if json_codec.orjson is not None:
+        codecs.append(json_codec.CODEC_ORJSON)
+
+    results = {name: bench(name, events, args.number) for name in codecs}
+    print(f"{'event':<12}" + "".join(f"{name:>12}" for name in codecs))
+    for kind in events:
+        row = "".join(f"{results[name][kind]:>10.1f}us" for name in codecs)
+        print(f"{kind:<12}{row}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Measure event-loop lag while large run states are serialized.
+
+Encodes large values events the way the streaming path does, inline,
+through the size-aware (thread pool) offload and in a process pool, while a
+ticker coroutine records how late it wakes up. The ticker stands in for the
+other SSE streams of the process.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+from src.agent_server.core.serializers import offload  # noqa: E402
+from src.agent_server.services.event_converter import EventConverter  # noqa: E402
+
+TICK = 0.001
+
+
+def large_state(messages: int) -> dict:
+    """A values payload with a long message history"""
+    history = []
+    for i in range(messages):
+        history.append(HumanMessage(content=f"Pregunta {i} " * 20))
+        history.append(AIMessage(content=f"Respuesta {i} " * 80, id=f"ai-{i}"))
+    return {"messages": history}
+
+
+async def ticker(lags: list[float], stop: asyncio.Event) -> None:
+    """Record how late a periodic 1ms timer fires"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(
+    threshold: int, state: dict, events: int, processes: ProcessPoolExecutor | None
+) -> list[float]:
+    """Encode `events` values events with the given offload threshold, or in
+    the process pool if one is given"""
+    offload.SERIALIZE_OFFLOAD_THRESHOLD = threshold
+    converter = EventConverter()
+    loop = asyncio.get_running_loop()
+    lags: list[float] = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.01)
+    for i in range(events):
+        if processes is not None:
+            await loop.run_in_executor(
+                processes,
+                converter.encode_raw_event,
+                f"run_event_{i}",
+                ("values", state),
+            )
+        else:
+            await offload.serialize_offloaded(
+                converter.encode_raw_event,
+                f"run_event_{i}",
+                ("values", state),
+                payload=state,
+            )
+        await asyncio.sleep(0)
+    stop.set()
+    await task
+    return lags
+
+
+def main():
+    """Run both modes and print lag percentiles"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+
+    state = large_state(args.messages)
+    print(f"state of ~{offload.estimate_size(state, 1 << 40) / 1e6:.1f} MB")
+    with ProcessPoolExecutor(max_workers=2) as processes:
+        # Start the worker processes before timing
+        processes.submit(EventConverter().encode_raw_event, "warmup", {}).result()
+        for name, threshold, pool in (
+            ("inline", 0, None),
+            ("offloaded", 262144, None),
+            ("processes", 0, processes),
+        ):
+            started = time.perf_counter()
+            lags = asyncio.run(run(threshold, state, args.events, pool))
+            elapsed = time.perf_counter() - started
+            lags_ms = sorted(lag * 1000 for lag in lags)
+            p99 = lags_ms[int(len(lags_ms) * 0.99)]
+            print(
+                f"{name:<10} ticks={len(lags_ms):<5} "
+                f"median={statistics.median(lags_ms):6.2f}ms "
+                f"p99={p99:6.2f}ms max={lags_ms[-1]:6.2f}ms "
+                f"total={elapsed:5.2f}s"
+            )
+    offload.shutdown_serialization_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Microbenchmark GeneralSerializer over soporte_ods graph state.
+
+Builds a state like the soporte_ods graph's (message history, domain
+models, location and confirmation dicts), checks that the type-dispatch
+serializer matches the attribute-probing chain it replaced, and prints the
+cost of both per state.
+"""
+
+import argparse
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+
+from graphs.soporte_ods.models import MotoboyModel, ViajeModel  # noqa: E402
+from src.agent_server.core.serializers import GeneralSerializer  # noqa: E402
+
+
+def probing_serialize(obj: Any) -> Any:
+    """The previous GeneralSerializer logic, probing attributes per object"""
+    if hasattr(obj, "model_dump") and callable(obj.model_dump):
+        return obj.model_dump()
+    elif hasattr(obj, "dict") and callable(obj.dict):
+        return obj.dict()
+    elif (
+        obj.__class__.__name__ == "Interrupt"
+        and hasattr(obj, "value")
+        and hasattr(obj, "id")
+    ):
+        return {"value": probing_serialize(obj.value), "id": obj.id}
+    elif hasattr(obj, "_asdict") and callable(obj._asdict):
+        return {k: probing_serialize(v) for k, v in obj._asdict().items()}
+    elif isinstance(obj, (set, frozenset)):
+        return list(obj)
+    elif isinstance(obj, (tuple, list)):
+        return [probing_serialize(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: probing_serialize(v) for k, v in obj.items()}
+    elif isinstance(obj, (str, int, float, bool, type(None))):
+        return obj
+    else:
+        return str(obj)
+
+
+def soporte_state(turns: int) -> dict[str, Any]:
+    """Build a soporte_ods state with `turns` tool-using conversation turns"""
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"No me aparece el viaje {i}"))
+        messages.append(
+            AIMessage(
+                content="",
+                id=f"ai-{i}",
+                tool_calls=[
+                    {"name": "consultar_viaje", "args": {"id": i}, "id": f"c{i}"}
+                ],
+            )
+        )
+        messages.append(
+            ToolMessage(content="estado: en curso " * 10, tool_call_id=f"c{i}")
+        )
+        messages.append(AIMessage(content="El viaje está en curso. " * 4, id=f"r-{i}"))
+    now = datetime(2025, 10, 18, 12, 0)
+    return {
+        "messages": messages,
+        "motoboy_id": 4211,
+        "motoboy": MotoboyModel(
+            id_motoboy=4211, nombre_completo="Juan Pérez", cuit="20123456789"
+        ),
+        "viaje": [
+            ViajeModel(
+                id_viaje=i,
+                id_reserva=100 + i,
+                id_motoboy=4211,
+                direccion_origen="Av. Corrientes 1234",
+                direccion_destino="Av. Santa Fe 4321",
+                latitud_origen=-34.6,
+                longitud_origen=-58.4,
+                fecha_asignacion_reserva=now,
+            )
+            for i in range(3)
+        ],
+        "reserva": None,
+        "location_info": {
+            "lat": -34.6,
+            "lng": -58.4,
+            "updated_at": now.isoformat(),
+            "accuracy": 12.5,
+        },
+        "last_context_refresh": now,
+        "pending_confirmation": {
+            "tool": "cancelar_viaje",
+            "args": {"id_viaje": 1},
+            "tags": {"urgente"},
+        },
+        "should_observe": False,
+        "is_last_step": False,
+    }
+
+
+def main():
+    """Run the benchmark and print the results"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    state = soporte_state(args.turns)
+    serializer = GeneralSerializer()
+    if serializer.serialize(state) != probing_serialize(state):
+        print("❌ Type-dispatch output differs from the probing serializer")
+        sys.exit(1)
+
+    # Graph state as objects, and as the plain dicts and lists it dumps to
+    cases = {"objects": state, "plain": probing_serialize(state)}
+    print(f"{'state':<10}{'probing':>12}{'dispatch':>12}")
+    for case, value in cases.items():
+        row = ""
+        for fn in (probing_serialize, serializer.serialize):
+            seconds = min(
+                timeit.repeat(
+                    lambda fn=fn, value=value: fn(value),
+                    number=args.number,
+                    repeat=5,
+                )
+            )
+            row += f"{seconds / args.number * 1e6:>10.1f}us"
+        print(f"{case:<10}{row}")
+
+
+if __name__ == "__main__":
+    main()
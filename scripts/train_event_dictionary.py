@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Train a zstd dictionary for compressed run event storage.
+
+Samples the most recent stored events, trains a dictionary on their SSE
+frames and writes it to a file to be used as EVENT_STORAGE_ZSTD_DICT.
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from src.agent_server.core.database import db_manager  # noqa: E402
+from src.agent_server.core.event_codec import train_dictionary  # noqa: E402
+from src.agent_server.core.sse import SSEEvent  # noqa: E402
+from src.agent_server.services.event_converter import EventConverter  # noqa: E402
+
+
+async def sample_frames(limit: int) -> list[bytes]:
+    """Load the SSE frames of the most recent stored events"""
+    await db_manager.initialize()
+    try:
+        async with db_manager.get_engine().begin() as conn:
+            rs = await conn.execute(
+                text(
+                    """
+                    SELECT id, event, data, payload, created_at
+                    FROM run_events
+                    ORDER BY created_at DESC
+                    LIMIT :limit
+                    """
+                ),
+                {"limit": limit},
+            )
+            rows = rs.fetchall()
+    finally:
+        await db_manager.close()
+
+    converter = EventConverter()
+    frames = []
+    for r in rows:
+        event = SSEEvent(
+            id=r.id,
+            event=r.event,
+            data=r.data,
+            timestamp=r.created_at,
+            payload=bytes(r.payload) if r.payload is not None else None,
+        )
+        frame = converter.convert_stored_to_sse(event)
+        if frame:
+            frames.append(frame.encode("utf-8"))
+    return frames
+
+
+def main():
+    """Train the dictionary and write it to the output file."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="File to write the dictionary to")
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    load_dotenv()
+    frames = asyncio.run(sample_frames(args.samples))
+    if len(frames) < 100:
+        print(f"❌ Only {len(frames)} stored events found, need at least 100")
+        sys.exit(1)
+
+    dictionary = train_dictionary(frames, args.size)
+    Path(args.output).write_bytes(dictionary)
+    print(
+        f"✅ Trained a {len(dictionary)} byte dictionary on {len(frames)} events, "
+        f"set EVENT_STORAGE_ZSTD_DICT={args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
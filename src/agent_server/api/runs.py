@@ -2,16 +2,17 @@
 
 import asyncio
 import contextlib
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Awaitable, Callable
 from datetime import UTC, datetime
-from typing import Any
+from typing import Any, NamedTuple
 from uuid import uuid4
 
 import structlog
 from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from langgraph.types import Command, Send
-from sqlalchemy import delete, select, update
+from sqlalchemy import cast, delete, func, insert, null, select, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.auth_ctx import with_auth_ctx
@@ -21,10 +22,23 @@ from ..core.orm import Run as RunORM
 from ..core.orm import Thread as ThreadORM
 from ..core.orm import _get_session_maker, get_session
 from ..core.serializers import GeneralSerializer
+from ..core.serializers.offload import serialize_offloaded
 from ..core.sse import create_end_event, get_sse_headers
+from ..core.sse_compression import create_sse_response
 from ..models import Run, RunCreate, RunStatus, User
+from ..services.event_compactor import event_compactor
+from ..services.event_persistence import POLICY_CONFIG_KEY, resolve_persistence_policy
+from ..services.event_store import EVENT_RETENTION_HOURS, event_store
 from ..services.langgraph_service import create_run_config, get_langgraph_service
+from ..services.run_completion import (
+    RUN_JOIN_TIMEOUT,
+    RUN_WAIT_TIMEOUT,
+    run_completion,
+)
+from ..services.run_executor import RunQueueFullError, run_executor
+from ..services.run_worker import executes_in_workers, notify_workers, request_cancel
 from ..services.streaming_service import streaming_service
+from ..services.values_delta import VALUES_DELTA_MODE, ValuesDeltaEncoder
 from ..utils.assistants import resolve_assistant_id
 from ..utils.run_utils import _merge_jsonb, _should_skip_event
 
@@ -104,66 +118,84 @@ async def update_thread_metadata(
     await session.commit()
 
 
-async def _validate_resume_command(
-    session: AsyncSession, thread_id: str, command: dict[str, Any] | None
+def _validate_resume_command(
+    thread_status: str | None, command: dict[str, Any] | None
 ) -> None:
     """Validate resume command requirements."""
-    if command and command.get("resume") is not None:
-        # Check if thread exists and is in interrupted state
-        thread_stmt = select(ThreadORM).where(ThreadORM.thread_id == thread_id)
-        thread = await session.scalar(thread_stmt)
-        if not thread:
-            raise HTTPException(404, f"Thread '{thread_id}' not found")
-        if thread.status != "interrupted":
-            raise HTTPException(
-                400, "Cannot resume: thread is not in interrupted state"
-            )
+    # Resuming needs the thread to be in interrupted state
+    if (
+        command
+        and command.get("resume") is not None
+        and thread_status != "interrupted"
+    ):
+        raise HTTPException(400, "Cannot resume: thread is not in interrupted state")
+
+
+def _ensure_run_capacity() -> None:
+    """Reject a new run with 429 while the run execution queue is full."""
+    try:
+        run_executor.ensure_capacity()
+    except RunQueueFullError as e:
+        raise HTTPException(
+            429, str(e), headers={"Retry-After": str(e.retry_after)}
+        ) from e
+
+
+def _active_run_query(thread_id: str, multitask_strategy: str | None) -> Any:
+    """Scalar subquery for an active run on a thread, as the strategy sees it."""
+    if not multitask_strategy:
+        return null()
+    # Active runs (and, when enqueueing, earlier queued runs, so the new run
+    # keeps its place behind them)
+    statuses = ["pending", "running", "streaming"]
+    if multitask_strategy == "enqueue":
+        statuses.append("queued")
+    return (
+        select(RunORM.run_id)
+        .where(RunORM.thread_id == thread_id, RunORM.status.in_(statuses))
+        .limit(1)
+        .scalar_subquery()
+    )
 
 
 async def _handle_multitask_strategy(
-    session: AsyncSession, thread_id: str, multitask_strategy: str | None
-) -> None:
+    thread_id: str, multitask_strategy: str | None, active_run_id: str | None
+) -> bool:
     """Handle multitask strategy for concurrent runs.
 
     Args:
-        session: Database session
-        thread_id: Thread ID to check for active runs
+        thread_id: Thread ID the new run is created on
         multitask_strategy: Strategy to use ('reject', 'interrupt', 'enqueue', or None)
+        active_run_id: Active run found on the thread by ``_active_run_query``
+
+    Returns:
+        True if the new run must be queued behind the thread's active run
 
     Raises:
         HTTPException: If strategy is 'reject' and there's an active run
     """
-    if not multitask_strategy:
-        return
-
-    # Check for active runs on this thread
-    active_runs_stmt = select(RunORM).where(
-        RunORM.thread_id == thread_id,
-        RunORM.status.in_(["pending", "running", "streaming"])
-    )
-    active_run = await session.scalar(active_runs_stmt)
-
-    if not active_run:
+    if not multitask_strategy or not active_run_id:
         # No active run, nothing to do
-        return
+        return False
 
     # Handle strategy
     if multitask_strategy == "reject":
         raise HTTPException(
             409,
-            f"Thread '{thread_id}' has an active run (run_id: {active_run.run_id}). "
+            f"Thread '{thread_id}' has an active run (run_id: {active_run_id}). "
             "Cannot create new run with multitask_strategy='reject'."
         )
     elif multitask_strategy == "interrupt":
         # Interrupt the active run
         logger.info(
-            f"Interrupting active run {active_run.run_id} on thread {thread_id} "
+            f"Interrupting active run {active_run_id} on thread {thread_id} "
             f"due to multitask_strategy='interrupt'"
         )
-        await streaming_service.interrupt_run(active_run.run_id)
+        await streaming_service.interrupt_run(active_run_id)
+        await request_cancel(active_run_id)
 
         # Cancel background task if exists
-        task = active_runs.pop(active_run.run_id, None)
+        task = active_runs.pop(active_run_id, None)
         if task and not task.done():
             task.cancel()
             try:
@@ -171,47 +203,58 @@ async def _handle_multitask_strategy(
             except asyncio.CancelledError:
                 pass
             except Exception as e:
-                logger.warning(f"Error canceling task for run {active_run.run_id}: {e}")
+                logger.warning(f"Error canceling task for run {active_run_id}: {e}")
     elif multitask_strategy == "enqueue":
-        # TODO: Implement enqueue strategy (queue the run to execute after active one finishes)
-        logger.warning(
-            f"multitask_strategy='enqueue' not yet implemented, proceeding anyway"
+        # The run waits in the thread's queue and starts once the thread is free
+        logger.info(
+            f"Queueing run on thread {thread_id} behind run {active_run_id} "
+            f"due to multitask_strategy='enqueue'"
         )
+        return True
     else:
         logger.warning(
             f"Unknown multitask_strategy '{multitask_strategy}', ignoring"
         )
+    return False
 
 
-@router.post("/threads/{thread_id}/runs", response_model=Run)
-async def create_run(
-    thread_id: str,
-    request: RunCreate,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
-) -> Run:
-    """Create and execute a new run (persisted)."""
+def _run_metadata(
+    thread_metadata: dict[str, Any] | None, assistant_metadata: dict[str, Any] | None
+) -> dict[str, Any]:
+    """Thread and assistant metadata added to the run's configurable (thread wins)."""
+    return {**(assistant_metadata or {}), **(thread_metadata or {})}
 
-    # Validate resume command requirements early
-    await _validate_resume_command(session, thread_id, request.command)
 
-    run_id = str(uuid4())
+class _NewRun(NamedTuple):
+    """A persisted run with the data needed to execute it."""
+
+    run: Run
+    assistant: AssistantORM
+    enqueued: bool
+    metadata: dict[str, Any]
 
-    # Get LangGraph service
-    langgraph_service = get_langgraph_service()
-    logger.info(
-        f"create_run: scheduling background task run_id={run_id} thread_id={thread_id} user={user.identity}"
-    )
-    logger.info(
-        f"[create_run] scheduling background task run_id={run_id} thread_id={thread_id} user={user.identity}"
-    )
 
-    # Validate assistant exists and get its graph_id. If a graph_id was provided
-    # instead of an assistant UUID, map it deterministically and fall back to the
-    # default assistant created at startup.
-    requested_id = str(request.assistant_id)
+async def _create_run_record(
+    session: AsyncSession,
+    thread_id: str,
+    run_id: str,
+    request: RunCreate,
+    user: User,
+    status: str = "pending",
+) -> _NewRun:
+    """Validate and persist a new run in a single transaction.
+
+    The thread, the assistant and any active run on the thread are read in
+    one query. The run insert carries the thread's busy status and metadata
+    update as a CTE, so creating a run takes one read, one write and the
+    commit, and the executor gets the metadata without re-reading it.
+    """
+    langgraph_service = get_langgraph_service()
     available_graphs = langgraph_service.list_graphs()
-    resolved_assistant_id = resolve_assistant_id(requested_id, available_graphs)
+    # A graph_id is mapped deterministically to its default assistant
+    resolved_assistant_id = resolve_assistant_id(
+        str(request.assistant_id), available_graphs
+    )
 
     config = request.config
     context = request.context
@@ -229,10 +272,29 @@ async def create_run(
     else:
         context = configurable.copy()
 
-    assistant_stmt = select(AssistantORM).where(
-        AssistantORM.assistant_id == resolved_assistant_id,
+    creation_read = (
+        select(
+            ThreadORM.status,
+            ThreadORM.metadata_json,
+            AssistantORM,
+            _active_run_query(thread_id, request.multitask_strategy),
+        )
+        .select_from(ThreadORM)
+        .outerjoin(AssistantORM, AssistantORM.assistant_id == resolved_assistant_id)
+        .where(ThreadORM.thread_id == thread_id)
     )
-    assistant = await session.scalar(assistant_stmt)
+    if request.multitask_strategy in ("enqueue", "reject"):
+        # Hold the thread row lock until the commit, like queue hand-offs do:
+        # an active run ending meanwhile hands off only after our run is
+        # visible, and concurrent creations can't both find the thread free.
+        # Not for "interrupt", whose cancelled run needs the row to clean up.
+        creation_read = creation_read.with_for_update(of=ThreadORM)
+    row = (await session.execute(creation_read)).one_or_none()
+    if row is None:
+        raise HTTPException(404, f"Thread '{thread_id}' not found")
+    thread_status, thread_metadata, assistant, active_run_id = row
+
+    _validate_resume_command(thread_status, request.command)
     if not assistant:
         raise HTTPException(404, f"Assistant '{request.assistant_id}' not found")
 
@@ -240,46 +302,21 @@ async def create_run(
     context = _merge_jsonb(assistant.context, context)
 
     # Validate the assistant's graph exists
-    available_graphs = langgraph_service.list_graphs()
     if assistant.graph_id not in available_graphs:
         raise HTTPException(
             404, f"Graph '{assistant.graph_id}' not found for assistant"
         )
 
-    # Handle multitask strategy before creating run
-    await _handle_multitask_strategy(session, thread_id, request.multitask_strategy)
-
-    # Mark thread as busy and update metadata with assistant/graph info
-    await set_thread_status(session, thread_id, "busy")
-    await update_thread_metadata(
-        session, thread_id, assistant.assistant_id, assistant.graph_id
+    enqueued = await _handle_multitask_strategy(
+        thread_id, request.multitask_strategy, active_run_id
     )
 
-    # Persist run record via ORM model in core.orm (Run table)
     now = datetime.now(UTC)
-    run_orm = RunORM(
-        run_id=run_id,  # explicitly set (DB can also default-generate if omitted)
-        thread_id=thread_id,
-        assistant_id=resolved_assistant_id,
-        status="pending",
-        input=request.input or {},
-        config=config,
-        context=context,
-        user_id=user.identity,
-        created_at=now,
-        updated_at=now,
-        output=None,
-        error_message=None,
-    )
-    session.add(run_orm)
-    await session.commit()
-
-    # Build response from ORM -> Pydantic
     run = Run(
         run_id=run_id,
         thread_id=thread_id,
         assistant_id=resolved_assistant_id,
-        status="pending",
+        status="queued" if enqueued else status,
         input=request.input or {},
         config=config,
         context=context,
@@ -289,18 +326,59 @@ async def create_run(
         output=None,
         error_message=None,
     )
+    insert_run = insert(RunORM).values(
+        **run.model_dump(exclude={"queue_position"}),
+        kwargs=_run_kwargs(request, user),
+    )
+    metadata: dict[str, Any] = {}
+    if not enqueued:
+        # Mark thread as busy and add assistant/graph info to its metadata
+        graph_info = {
+            "assistant_id": str(assistant.assistant_id),
+            "graph_id": assistant.graph_id,
+        }
+        insert_run = insert_run.add_cte(
+            update(ThreadORM)
+            .where(ThreadORM.thread_id == thread_id)
+            .values(
+                status="busy",
+                metadata_json=func.coalesce(
+                    ThreadORM.metadata_json, cast({}, JSONB)
+                ).op("||", return_type=JSONB)(cast(graph_info, JSONB)),
+                updated_at=now,
+            )
+            .returning(ThreadORM.thread_id)
+            .cte("busy_thread")
+        )
+        metadata = _run_metadata(
+            {**(thread_metadata or {}), **graph_info}, assistant.metadata_dict
+        )
+    await session.execute(insert_run)
+    if not enqueued:
+        await notify_workers(session)
+    await session.commit()
 
-    # Start execution asynchronously
+    if enqueued:
+        # Started by the run ahead of it once that one finishes
+        positions = await _queue_positions(session, thread_id)
+        run.queue_position = positions.get(run_id)
+    return _NewRun(run, assistant, enqueued, metadata)
+
+
+def _submit_new_run(new_run: _NewRun, request: RunCreate, user: User) -> asyncio.Task:
+    """Schedule a newly created run for execution in this process."""
+    run = new_run.run
     # Don't pass the session to avoid transaction conflicts
-    task = asyncio.create_task(
-        execute_run_async(
-            run_id,
-            thread_id,
-            assistant.graph_id,
+    task = run_executor.submit(
+        run.run_id,
+        lambda: execute_run_async(
+            run.run_id,
+            run.thread_id,
+            new_run.assistant.graph_id,
             request.input or {},
             user,
-            config,
-            context,
+            run.config,
+            run.context,
             request.stream_mode,
             None,  # Don't pass session to avoid conflicts
             request.checkpoint,
@@ -309,145 +387,287 @@ async def create_run(
             request.interrupt_after,
             request.multitask_strategy,
             request.stream_subgraphs,
-        )
+            metadata=new_run.metadata,
+        ),
+        user_id=user.identity,
+        assistant_id=run.assistant_id,
+        graph_id=new_run.assistant.graph_id,
     )
-    logger.info(
-        f"[create_run] background task created task_id={id(task)} for run_id={run_id}"
+    active_runs[run.run_id] = task
+    return task
+
+
+def _run_kwargs(request: RunCreate, user: User) -> dict[str, Any]:
+    """Execution arguments stored with a run so it can be started later."""
+    return {
+        "stream_mode": request.stream_mode,
+        "checkpoint": request.checkpoint,
+        "command": request.command,
+        "interrupt_before": request.interrupt_before,
+        "interrupt_after": request.interrupt_after,
+        "multitask_strategy": request.multitask_strategy,
+        "stream_subgraphs": request.stream_subgraphs,
+        "user": user.model_dump(mode="json"),
+    }
+
+
+async def _queue_positions(session: AsyncSession, thread_id: str) -> dict[str, int]:
+    """Map each queued run of a thread to its position (1 = next to start)."""
+    result = await session.scalars(
+        select(RunORM.run_id)
+        .where(RunORM.thread_id == thread_id, RunORM.status == "queued")
+        .order_by(RunORM.created_at, RunORM.run_id)
     )
-    active_runs[run_id] = task
+    return {run_id: position for position, run_id in enumerate(result.all(), 1)}
+
 
+def _run_from_orm(run_orm: RunORM, positions: dict[str, int] | None = None) -> Run:
+    """Build the Run response from its ORM row, with its queue position."""
+    run = Run.model_validate(
+        {c.name: getattr(run_orm, c.name) for c in run_orm.__table__.columns}
+    )
+    if positions:
+        run.queue_position = positions.get(run.run_id)
     return run
 
 
-@router.post("/threads/{thread_id}/runs/stream")
-async def create_and_stream_run(
-    thread_id: str,
-    request: RunCreate,
-    user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
-) -> StreamingResponse:
-    """Create a new run and stream its execution - persisted + SSE."""
+async def start_next_queued_run(thread_id: str) -> str | None:
+    """Start the oldest queued run of a thread, returning its run_id.
 
-    # Validate resume command requirements early
-    await _validate_resume_command(session, thread_id, request.command)
+    Nothing is started while another run is active on the thread. Hand-offs
+    hold the thread row lock, so when several callers race for the same
+    thread only one of them starts a run.
+    """
+    maker = _get_session_maker()
+    async with maker() as session:
+        while True:
+            await session.execute(
+                select(ThreadORM.thread_id)
+                .where(ThreadORM.thread_id == thread_id)
+                .with_for_update()
+            )
+            busy = await session.scalar(
+                select(RunORM.run_id)
+                .where(
+                    RunORM.thread_id == thread_id,
+                    RunORM.status.in_(["pending", "running", "streaming"]),
+                )
+                .limit(1)
+            )
+            run_orm = None
+            if busy is None:
+                next_run = (
+                    select(RunORM.run_id)
+                    .where(RunORM.thread_id == thread_id, RunORM.status == "queued")
+                    .order_by(RunORM.created_at, RunORM.run_id)
+                    .limit(1)
+                    .scalar_subquery()
+                )
+                run_orm = await session.scalar(
+                    update(RunORM)
+                    .where(RunORM.run_id == next_run)
+                    .values(status="pending", updated_at=datetime.now(UTC))
+                    .returning(RunORM)
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
+            if run_orm is None:
+                return None
+
+            run_id = run_orm.run_id
+            assistant = await session.scalar(
+                select(AssistantORM).where(
+                    AssistantORM.assistant_id == run_orm.assistant_id
+                )
+            )
+            langgraph_service = get_langgraph_service()
+            if not assistant or assistant.graph_id not in langgraph_service.list_graphs():
+                await update_run_status(
+                    run_id,
+                    "failed",
+                    output={},
+                    error=f"Assistant '{run_orm.assistant_id}' is no longer available",
+                    session=session,
+                )
+                await streaming_service.signal_run_error(
+                    run_id, "Assistant is no longer available"
+                )
+                continue
 
-    run_id = str(uuid4())
+            await set_thread_status(session, thread_id, "busy")
+            await update_thread_metadata(
+                session, thread_id, assistant.assistant_id, assistant.graph_id
+            )
+            if executes_in_workers():
+                # Now pending, the run is claimed by a run worker
+                await notify_workers(session)
+                await session.commit()
+                return run_id
+            break
+
+    logger.info(f"Starting queued run {run_id} on thread {thread_id}")
+    task = run_executor.submit(
+        run_id,
+        _stored_run(run_orm, assistant.graph_id),
+        user_id=run_orm.user_id,
+        assistant_id=run_orm.assistant_id,
+        graph_id=assistant.graph_id,
+    )
+    active_runs[run_id] = task
+    return run_id
 
-    # Get LangGraph service
-    langgraph_service = get_langgraph_service()
-    logger.info(
-        f"[create_and_stream_run] scheduling background task run_id={run_id} thread_id={thread_id} user={user.identity}"
+
+async def _drop_unstarted_run(session: AsyncSession, run_id: str, status: str) -> bool:
+    """Stop a run before it starts executing, returning whether it had not started.
+
+    Such a run never reaches the hand-off in ``execute_run_async``, so the
+    caller starts the next queued run of the thread instead. Pending runs
+    are only taken from the workers if none has claimed them yet.
+    """
+    if run_executor.cancel_queued(run_id):
+        active_runs.pop(run_id, None)
+        return True
+    if not executes_in_workers():
+        return False
+    dropped = await session.scalar(
+        update(RunORM)
+        .where(RunORM.run_id == run_id, RunORM.status == "pending")
+        .values(status=status, updated_at=datetime.now(UTC))
+        .returning(RunORM.run_id)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return dropped is not None
+
+
+def _stored_run(run_orm: RunORM, graph_id: str) -> Callable[[], Awaitable[None]]:
+    """Build the execution of a persisted run from its stored kwargs."""
+    kwargs = run_orm.kwargs or {}
+    user = User.model_validate(kwargs.get("user") or {"identity": run_orm.user_id})
+    return lambda: execute_run_async(
+        run_orm.run_id,
+        run_orm.thread_id,
+        graph_id,
+        run_orm.input or {},
+        user,
+        run_orm.config,
+        run_orm.context,
+        kwargs.get("stream_mode"),
+        None,
+        kwargs.get("checkpoint"),
+        kwargs.get("command"),
+        kwargs.get("interrupt_before"),
+        kwargs.get("interrupt_after"),
+        kwargs.get("multitask_strategy"),
+        kwargs.get("stream_subgraphs"),
     )
 
-    # Validate assistant exists and get its graph_id. Allow passing a graph_id
-    # by mapping it to a deterministic assistant ID.
-    requested_id = str(request.assistant_id)
-    available_graphs = langgraph_service.list_graphs()
 
-    resolved_assistant_id = resolve_assistant_id(requested_id, available_graphs)
+async def execute_stored_run(run_orm: RunORM) -> None:
+    """Execute a persisted run claimed by a run worker."""
+    maker = _get_session_maker()
+    async with maker() as session:
+        assistant = await session.scalar(
+            select(AssistantORM).where(
+                AssistantORM.assistant_id == run_orm.assistant_id
+            )
+        )
+    if not assistant:
+        error = f"Assistant '{run_orm.assistant_id}' is no longer available"
+        await update_run_status(run_orm.run_id, "failed", output={}, error=error)
+        await streaming_service.signal_run_error(run_orm.run_id, error)
+        return
+    await _stored_run(run_orm, assistant.graph_id)()
 
-    config = request.config
-    context = request.context
-    configurable = config.get("configurable", {})
 
-    if config.get("configurable") and context:
-        raise HTTPException(
-            status_code=400,
-            detail="Cannot specify both configurable and context. Prefer setting context alone. Context was introduced in LangGraph 0.6.0 and is the long term planned replacement for configurable.",
+async def start_queued_runs() -> int:
+    """Start the queues of threads that have no active run, e.g. after a restart."""
+    maker = _get_session_maker()
+    async with maker() as session:
+        busy_threads = select(RunORM.thread_id).where(
+            RunORM.status.in_(["pending", "running", "streaming"])
         )
+        result = await session.scalars(
+            select(RunORM.thread_id)
+            .where(RunORM.status == "queued", RunORM.thread_id.not_in(busy_threads))
+            .distinct()
+        )
+        thread_ids = result.all()
+    started = 0
+    for thread_id in thread_ids:
+        if await start_next_queued_run(thread_id):
+            started += 1
+    if started:
+        logger.info(f"Started {started} queued runs left from a previous process")
+    return started
 
-    if context:
-        configurable = context.copy()
-        config["configurable"] = configurable
-    else:
-        context = configurable.copy()
 
-    assistant_stmt = select(AssistantORM).where(
-        AssistantORM.assistant_id == resolved_assistant_id,
-    )
-    assistant = await session.scalar(assistant_stmt)
-    if not assistant:
-        raise HTTPException(404, f"Assistant '{request.assistant_id}' not found")
+@router.post("/threads/{thread_id}/runs", response_model=Run)
+async def create_run(
+    thread_id: str,
+    request: RunCreate,
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> Run:
+    """Create and execute a new run (persisted)."""
 
-    config = _merge_jsonb(assistant.config, config)
-    context = _merge_jsonb(assistant.context, context)
+    _ensure_run_capacity()
 
-    # Validate the assistant's graph exists
-    available_graphs = langgraph_service.list_graphs()
-    if assistant.graph_id not in available_graphs:
-        raise HTTPException(
-            404, f"Graph '{assistant.graph_id}' not found for assistant"
-        )
+    run_id = str(uuid4())
+    logger.info(
+        f"[create_run] scheduling background task run_id={run_id} thread_id={thread_id} user={user.identity}"
+    )
 
-    # Handle multitask strategy before creating run
-    await _handle_multitask_strategy(session, thread_id, request.multitask_strategy)
+    new_run = await _create_run_record(session, thread_id, run_id, request, user)
+    if new_run.enqueued or executes_in_workers():
+        # Started by the run ahead of it once that one finishes, or claimed
+        # and executed by a run worker process
+        return new_run.run
 
-    # Mark thread as busy and update metadata with assistant/graph info
-    await set_thread_status(session, thread_id, "busy")
-    await update_thread_metadata(
-        session, thread_id, assistant.assistant_id, assistant.graph_id
+    # Start execution asynchronously
+    task = _submit_new_run(new_run, request, user)
+    logger.info(
+        f"[create_run] background task created task_id={id(task)} for run_id={run_id}"
     )
 
-    # Persist run record
-    now = datetime.now(UTC)
-    run_orm = RunORM(
-        run_id=run_id,
-        thread_id=thread_id,
-        assistant_id=resolved_assistant_id,
-        status="streaming",
-        input=request.input or {},
-        config=config,
-        context=context,
-        user_id=user.identity,
-        created_at=now,
-        updated_at=now,
-        output=None,
-        error_message=None,
+    return new_run.run
+
+
+@router.post("/threads/{thread_id}/runs/stream")
+async def create_and_stream_run(
+    thread_id: str,
+    request: RunCreate,
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+    accept_encoding: str | None = Header(None, alias="Accept-Encoding"),
+) -> StreamingResponse:
+    """Create a new run and stream its execution - persisted + SSE."""
+
+    _ensure_run_capacity()
+
+    run_id = str(uuid4())
+    logger.info(
+        f"[create_and_stream_run] scheduling background task run_id={run_id} thread_id={thread_id} user={user.identity}"
     )
-    session.add(run_orm)
-    await session.commit()
 
-    # Build response model for stream context
-    run = Run(
-        run_id=run_id,
-        thread_id=thread_id,
-        assistant_id=resolved_assistant_id,
-        status="streaming",
-        input=request.input or {},
-        config=config,
-        context=context,
-        user_id=user.identity,
-        created_at=now,
-        updated_at=now,
-        output=None,
-        error_message=None,
+    new_run = await _create_run_record(
+        session,
+        thread_id,
+        run_id,
+        request,
+        user,
+        status="pending" if executes_in_workers() else "streaming",
     )
+    run = new_run.run
+    config = run.config
 
-    # Start background execution that will populate the broker
-    # Don't pass the session to avoid transaction conflicts
-    task = asyncio.create_task(
-        execute_run_async(
-            run_id,
-            thread_id,
-            assistant.graph_id,
-            request.input or {},
-            user,
-            config,
-            context,
-            request.stream_mode,
-            None,  # Don't pass session to avoid conflicts
-            request.checkpoint,
-            request.command,
-            request.interrupt_before,
-            request.interrupt_after,
-            request.multitask_strategy,
-            request.stream_subgraphs,
+    # Start background execution that will populate the broker; a queued
+    # run streams from the same broker once the run ahead of it finishes
+    if not new_run.enqueued and not executes_in_workers():
+        task = _submit_new_run(new_run, request, user)
+        logger.info(
+            f"[create_and_stream_run] background task created task_id={id(task)} for run_id={run_id}"
         )
-    )
-    logger.info(
-        f"[create_and_stream_run] background task created task_id={id(task)} for run_id={run_id}"
-    )
-    active_runs[run_id] = task
 
     # Extract requested stream mode(s)
     stream_mode = request.stream_mode
@@ -457,13 +677,13 @@ async def create_and_stream_run(
     # Stream immediately from broker (which will also include replay of any early events)
     cancel_on_disconnect = (request.on_disconnect or "continue").lower() == "cancel"
 
-    return StreamingResponse(
+    return create_sse_response(
         streaming_service.stream_run_execution(
             run,
             None,
             cancel_on_disconnect=cancel_on_disconnect,
         ),
-        media_type="text/event-stream",
+        accept_encoding,
         headers={
             **get_sse_headers(),
             "Location": f"/threads/{thread_id}/runs/{run_id}/stream",
@@ -499,9 +719,10 @@ async def get_run(
         f"[get_run] found run status={run_orm.status} user={user.identity} thread_id={thread_id} run_id={run_id}"
     )
     # Convert to Pydantic
-    return Run.model_validate(
-        {c.name: getattr(run_orm, c.name) for c in run_orm.__table__.columns}
-    )
+    positions = None
+    if run_orm.status == "queued":
+        positions = await _queue_positions(session, thread_id)
+    return _run_from_orm(run_orm, positions)
 
 
 @router.get("/threads/{thread_id}/runs", response_model=list[Run])
@@ -528,10 +749,10 @@ async def list_runs(
     logger.info(f"[list_runs] querying DB thread_id={thread_id} user={user.identity}")
     result = await session.scalars(stmt)
     rows = result.all()
-    runs = [
-        Run.model_validate({c.name: getattr(r, c.name) for c in r.__table__.columns})
-        for r in rows
-    ]
+    positions = None
+    if any(r.status == "queued" for r in rows):
+        positions = await _queue_positions(session, thread_id)
+    runs = [_run_from_orm(r, positions) for r in rows]
     logger.info(
         f"[list_runs] total={len(runs)} user={user.identity} thread_id={thread_id}"
     )
@@ -599,6 +820,20 @@ async def update_run(
     )
 
 
+async def _await_run_end(run_id: str, timeout: float) -> bool:
+    """Wait up to ``timeout`` seconds for a run to end, returning whether it did.
+
+    A run executing in this process is awaited through its task, so its
+    thread is idle again when this returns. Runs executing elsewhere (or
+    still queued) are awaited through completion notifications.
+    """
+    task = active_runs.get(run_id)
+    if task is not None:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        return bool(done)
+    return await run_completion.wait(run_id, timeout) is not None
+
+
 @router.get("/threads/{thread_id}/runs/{run_id}/join")
 async def join_run(
     thread_id: str,
@@ -625,17 +860,9 @@ async def join_run(
         output = getattr(run_orm, "output", None) or {}
         return output
 
-    # Wait for background task to complete
-    task = active_runs.get(run_id)
-    if task:
-        try:
-            await asyncio.wait_for(task, timeout=30.0)
-        except TimeoutError:
-            # Task is taking too long, but that's okay - we'll check DB status
-            pass
-        except asyncio.CancelledError:
-            # Task was cancelled, that's also okay
-            pass
+    # Wait for the run to end, wherever it executes; past the timeout we
+    # return the current output and the run carries on
+    await _await_run_end(run_id, RUN_JOIN_TIMEOUT)
 
     # Return final output from database
     run_orm = await session.scalar(select(RunORM).where(RunORM.run_id == run_id))
@@ -659,120 +886,27 @@ async def wait_for_run(
 
     Compatible with LangGraph SDK's runs.wait() method and Agent Protocol spec.
     """
-    # Validate resume command requirements early
-    await _validate_resume_command(session, thread_id, request.command)
+    _ensure_run_capacity()
 
     run_id = str(uuid4())
-
-    # Get LangGraph service
-    langgraph_service = get_langgraph_service()
     logger.info(
         f"[wait_for_run] creating run run_id={run_id} thread_id={thread_id} user={user.identity}"
     )
 
-    # Validate assistant exists and get its graph_id
-    requested_id = str(request.assistant_id)
-    available_graphs = langgraph_service.list_graphs()
-    resolved_assistant_id = resolve_assistant_id(requested_id, available_graphs)
-
-    config = request.config
-    context = request.context
-    configurable = config.get("configurable", {})
-
-    if config.get("configurable") and context:
-        raise HTTPException(
-            status_code=400,
-            detail="Cannot specify both configurable and context. Prefer setting context alone. Context was introduced in LangGraph 0.6.0 and is the long term planned replacement for configurable.",
-        )
+    new_run = await _create_run_record(session, thread_id, run_id, request, user)
 
-    if context:
-        configurable = context.copy()
-        config["configurable"] = configurable
-    else:
-        context = configurable.copy()
-
-    assistant_stmt = select(AssistantORM).where(
-        AssistantORM.assistant_id == resolved_assistant_id,
-    )
-    assistant = await session.scalar(assistant_stmt)
-    if not assistant:
-        raise HTTPException(404, f"Assistant '{request.assistant_id}' not found")
-
-    config = _merge_jsonb(assistant.config, config)
-    context = _merge_jsonb(assistant.context, context)
-
-    # Validate the assistant's graph exists
-    available_graphs = langgraph_service.list_graphs()
-    if assistant.graph_id not in available_graphs:
-        raise HTTPException(
-            404, f"Graph '{assistant.graph_id}' not found for assistant"
-        )
-
-    # Handle multitask strategy before creating run
-    await _handle_multitask_strategy(session, thread_id, request.multitask_strategy)
-
-    # Mark thread as busy and update metadata with assistant/graph info
-    await set_thread_status(session, thread_id, "busy")
-    await update_thread_metadata(
-        session, thread_id, assistant.assistant_id, assistant.graph_id
-    )
-
-    # Persist run record
-    now = datetime.now(UTC)
-    run_orm = RunORM(
-        run_id=run_id,
-        thread_id=thread_id,
-        assistant_id=resolved_assistant_id,
-        status="pending",
-        input=request.input or {},
-        config=config,
-        context=context,
-        user_id=user.identity,
-        created_at=now,
-        updated_at=now,
-        output=None,
-        error_message=None,
-    )
-    session.add(run_orm)
-    await session.commit()
-
-    # Start execution asynchronously
-    task = asyncio.create_task(
-        execute_run_async(
-            run_id,
-            thread_id,
-            assistant.graph_id,
-            request.input or {},
-            user,
-            config,
-            context,
-            request.stream_mode,
-            None,  # Don't pass session to avoid conflicts
-            request.checkpoint,
-            request.command,
-            request.interrupt_before,
-            request.interrupt_after,
-            request.multitask_strategy,
-            request.stream_subgraphs,
+    # Start execution asynchronously (a queued run is started by the run ahead
+    # of it, and in worker mode a run worker claims it)
+    if not (new_run.enqueued or executes_in_workers()):
+        task = _submit_new_run(new_run, request, user)
+        logger.info(
+            f"[wait_for_run] background task created task_id={id(task)} for run_id={run_id}"
         )
-    )
-    logger.info(
-        f"[wait_for_run] background task created task_id={id(task)} for run_id={run_id}"
-    )
-    active_runs[run_id] = task
 
-    # Wait for task to complete with timeout
-    try:
-        await asyncio.wait_for(task, timeout=300.0)  # 5 minute timeout
-    except TimeoutError:
+    # Wait for the run to end with timeout
+    if not await _await_run_end(run_id, RUN_WAIT_TIMEOUT):
         logger.warning(f"[wait_for_run] timeout waiting for run_id={run_id}")
         # Don't raise, just return current state
-    except asyncio.CancelledError:
-        logger.info(f"[wait_for_run] cancelled run_id={run_id}")
-        # Task was cancelled, continue to return final state
-    except Exception as e:
-        logger.error(f"[wait_for_run] exception in run_id={run_id}: {e}")
-        # Exception already handled by execute_run_async
 
     # Get final output from database
     run_orm = await session.scalar(
@@ -815,6 +949,7 @@ async def stream_run(
     _stream_mode: str | None = Query(None),
     user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
+    accept_encoding: str | None = Header(None, alias="Accept-Encoding"),
 ) -> StreamingResponse:
     """Stream run execution with SSE and reconnection support - persisted metadata."""
     logger.info(
@@ -842,9 +977,9 @@ async def stream_run(
         logger.info(
             f"[stream_run] starting terminal stream run_id={run_id} status={run_orm.status}"
         )
-        return StreamingResponse(
+        return create_sse_response(
             generate_final(),
-            media_type="text/event-stream",
+            accept_encoding,
             headers={
                 **get_sse_headers(),
                 "Location": f"/threads/{thread_id}/runs/{run_id}/stream",
@@ -859,11 +994,11 @@ async def stream_run(
         {c.name: getattr(run_orm, c.name) for c in run_orm.__table__.columns}
     )
 
-    return StreamingResponse(
+    return create_sse_response(
         streaming_service.stream_run_execution(
             run_model, last_event_id, cancel_on_disconnect=False
         ),
-        media_type="text/event-stream",
+        accept_encoding,
         headers={
             **get_sse_headers(),
             "Location": f"/threads/{thread_id}/runs/{run_id}/stream",
@@ -908,6 +1043,13 @@ async def cancel_run_endpoint(
     if not run_orm:
         raise HTTPException(404, f"Run '{run_id}' not found")
 
+    # A run that never started frees the thread for the runs queued behind it
+    unstarted = await _drop_unstarted_run(
+        session, run_id, "interrupted" if action == "interrupt" else "cancelled"
+    )
+    if unstarted:
+        await set_thread_status(session, thread_id, "idle")
+
     if action == "interrupt":
         logger.info(
             f"[cancel_run] interrupt run_id={run_id} user={user.identity} thread_id={thread_id}"
@@ -925,6 +1067,7 @@ async def cancel_run_endpoint(
             f"[cancel_run] cancel run_id={run_id} user={user.identity} thread_id={thread_id}"
         )
         await streaming_service.cancel_run(run_id)
+        await request_cancel(run_id)
         # Persist status as cancelled
         await session.execute(
             update(RunORM)
@@ -933,6 +1076,9 @@ async def cancel_run_endpoint(
         )
         await session.commit()
 
+    if unstarted:
+        await start_next_queued_run(thread_id)
+
     # Optionally wait for background task
     if wait:
         task = active_runs.get(run_id)
@@ -971,8 +1117,13 @@ async def execute_run_async(
     interrupt_after: str | list[str] | None = None,
     _multitask_strategy: str | None = None,
     subgraphs: bool | None = False,
+    metadata: dict[str, Any] | None = None,
 ) -> None:
-    """Execute run asynchronously in background using streaming to capture all events"""  # Use provided session or get a new one
+    """Execute run asynchronously in background using streaming to capture all events.
+
+    ``metadata`` is the thread and assistant metadata resolved when the run
+    was created; it is read from the database when not given.
+    """  # Use provided session or get a new one
     if session is None:
         maker = _get_session_maker()
         session = maker()
@@ -989,41 +1140,49 @@ async def execute_run_async(
     else:
         stream_mode = _normalize_mode(stream_mode)
 
+    # Which events are stored for replay (assistant config, request override)
+    persistence = resolve_persistence_policy(config)
+
     try:
         # Update status
         await update_run_status(run_id, "running", session=session)
+        if (
+            persistence.enabled
+            and persistence.retention_hours is not None
+            and persistence.retention_hours > EVENT_RETENTION_HOURS
+        ):
+            # Keep the first events of a long run past their partition's drop
+            await _expire_run_events(run_id, persistence.retention_hours)
 
         # Get graph and execute
         langgraph_service = get_langgraph_service()
         graph = await langgraph_service.get_graph(graph_id)
 
-        # Fetch thread and assistant to merge their metadata into config
-        thread_stmt = select(ThreadORM).where(ThreadORM.thread_id == thread_id)
-        thread = await session.scalar(thread_stmt)
+        if metadata is None:
+            # Thread and assistant metadata of the run, in one query
+            row = (
+                await session.execute(
+                    select(ThreadORM.metadata_json, AssistantORM.metadata_dict)
+                    .select_from(RunORM)
+                    .join(ThreadORM, ThreadORM.thread_id == RunORM.thread_id)
+                    .outerjoin(
+                        AssistantORM, AssistantORM.assistant_id == RunORM.assistant_id
+                    )
+                    .where(RunORM.run_id == run_id)
+                )
+            ).one_or_none()
+            metadata = _run_metadata(*row) if row else {}
 
-        # Merge thread metadata into config if thread exists
         merged_config = (config or {}).copy()
-        if thread and thread.metadata_json:
+        # Server-side setting, not passed on to the graph
+        merged_config.pop(POLICY_CONFIG_KEY, None)
+        if metadata:
             merged_config.setdefault("configurable", {})
-            # Merge thread metadata into configurable (don't overwrite existing keys)
-            for key, value in thread.metadata_json.items():
+            # Merge thread and assistant metadata into configurable (don't
+            # overwrite existing keys; thread metadata takes precedence)
+            for key, value in metadata.items():
                 merged_config["configurable"].setdefault(key, value)
 
-        # Also merge assistant metadata if available
-        # Find assistant by looking up the run record or querying by graph_id
-        run_stmt = select(RunORM).where(RunORM.run_id == run_id)
-        run_record = await session.scalar(run_stmt)
-        if run_record and run_record.assistant_id:
-            assistant_stmt = select(AssistantORM).where(
-                AssistantORM.assistant_id == run_record.assistant_id
-            )
-            assistant = await session.scalar(assistant_stmt)
-            if assistant and assistant.metadata_dict:
-                merged_config.setdefault("configurable", {})
-                # Merge assistant metadata (thread metadata takes precedence)
-                for key, value in assistant.metadata_dict.items():
-                    merged_config["configurable"].setdefault(key, value)
-
         run_config = create_run_config(
             run_id, thread_id, user, merged_config, checkpoint
         )
@@ -1070,6 +1229,20 @@ async def execute_run_async(
         else:
             final_stream_modes = stream_mode.copy()
 
+        # values-delta is derived from the graph's values stream: the first
+        # event carries the full state, later ones a patch against the previous.
+        # When values is requested too, each delta follows its values event.
+        values_delta = None
+        emit_values = True
+        if VALUES_DELTA_MODE in final_stream_modes:
+            final_stream_modes = [
+                m for m in final_stream_modes if m != VALUES_DELTA_MODE
+            ]
+            if "values" not in final_stream_modes:
+                final_stream_modes.append("values")
+                emit_values = False
+            values_delta = ValuesDeltaEncoder()
+
         # Ensure interrupt events are captured by including updates mode
         # Track whether updates was explicitly requested by user
         user_requested_updates = "updates" in final_stream_modes
@@ -1079,34 +1252,49 @@ async def execute_run_async(
         only_interrupt_updates = not user_requested_updates
 
         async with with_auth_ctx(user, []):
-            async for raw_event in graph.astream(
-                execution_input,
-                config=run_config,
-                context=context,
-                subgraphs=subgraphs,
-                stream_mode=final_stream_modes,
-            ):
+            # Optionally merge token chunks into fewer events, frames and rows
+            events = streaming_service.coalesce_messages(
+                run_id,
+                graph.astream(
+                    execution_input,
+                    config=run_config,
+                    context=context,
+                    subgraphs=subgraphs,
+                    stream_mode=final_stream_modes,
+                ),
+            )
+            async for raw_event in events:
                 # Skip events that contain langsmith:nostream tag
                 if _should_skip_event(raw_event):
                     continue
 
-                event_counter += 1
-                event_id = f"{run_id}_event_{event_counter}"
-
-                # Forward to broker for live consumers
-                await streaming_service.put_to_broker(
-                    run_id,
-                    event_id,
-                    raw_event,
-                    only_interrupt_updates=only_interrupt_updates,
-                )
-                # Store for replay
-                await streaming_service.store_event_from_raw(
-                    run_id,
-                    event_id,
-                    raw_event,
-                    only_interrupt_updates=only_interrupt_updates,
-                )
+                stream_events = [raw_event]
+                if values_delta:
+                    # Large states are diffed off the event loop; the encoder
+                    # keeps the last state, so never in a serialization process
+                    delta_event = await serialize_offloaded(
+                        values_delta.encode, raw_event, stateful=True
+                    )
+                    if delta_event is not raw_event:
+                        stream_events = (
+                            [raw_event, delta_event] if emit_values else [delta_event]
+                        )
+
+                for stream_event in stream_events:
+                    event_counter += 1
+                    event_id = f"{run_id}_event_{event_counter}"
+                    # Forward to broker for live consumers (serialized once)
+                    encoded_event = await streaming_service.put_to_broker(
+                        run_id,
+                        event_id,
+                        stream_event,
+                        only_interrupt_updates=only_interrupt_updates,
+                        policy=persistence,
+                    )
+                    # Store the same encoded event for replay
+                    await streaming_service.store_encoded_event(
+                        run_id, encoded_event, persistence
+                    )
 
                 # Check for interrupt in this event
                 event_data = None
@@ -1126,6 +1314,9 @@ async def execute_run_async(
                     # Non-tuple events are values mode
                     final_output = raw_event
 
+        # Barrier: every stored event is durable before the status changes
+        await streaming_service.flush_events(run_id)
+
         if has_interrupt:
             await update_run_status(
                 run_id, "interrupted", output=final_output or {}, session=session
@@ -1149,6 +1340,7 @@ async def execute_run_async(
             await set_thread_status(session, thread_id, "idle")
 
     except asyncio.CancelledError:
+        await streaming_service.flush_events(run_id)
         # Store empty output to avoid JSON serialization issues
         await update_run_status(run_id, "cancelled", output={}, session=session)
         if not session:
@@ -1160,6 +1352,7 @@ async def execute_run_async(
         await streaming_service.signal_run_cancelled(run_id)
         raise
     except Exception as e:
+        await streaming_service.flush_events(run_id)
         # Store empty output to avoid JSON serialization issues
         await update_run_status(
             run_id, "failed", output={}, error=str(e), session=session
@@ -1176,6 +1369,24 @@ async def execute_run_async(
         # Clean up broker
         await streaming_service.cleanup_run(run_id)
         active_runs.pop(run_id, None)
+        if persistence.enabled:
+            # Shrink the stored event log once reconnects no longer need it
+            event_compactor.schedule(run_id)
+            if persistence.retention_hours is not None:
+                await _expire_run_events(run_id, persistence.retention_hours)
+        # Hand the thread to the next run queued on it, if any
+        try:
+            await start_next_queued_run(thread_id)
+        except Exception as e:
+            logger.error(f"Failed to start next queued run on thread {thread_id}: {e}")
+
+
+async def _expire_run_events(run_id: str, retention_hours: float) -> None:
+    """Store when the run's events expire, logging rather than failing the run"""
+    try:
+        await event_store.expire_run(run_id, retention_hours)
+    except Exception as e:
+        logger.error(f"Failed to set event expiry of run {run_id}: {e}")
 
 
 async def update_run_status(
@@ -1196,7 +1407,9 @@ async def update_run_status(
         if output is not None:
             # Serialize output to ensure JSON compatibility
             try:
-                serialized_output = serializer.serialize(output)
+                serialized_output = await serialize_offloaded(
+                    serializer.serialize, output
+                )
                 values["output"] = serialized_output
             except Exception as e:
                 logger.warning(f"Failed to serialize output for run {run_id}: {e}")
@@ -1210,7 +1423,10 @@ async def update_run_status(
         await session.execute(
             update(RunORM).where(RunORM.run_id == str(run_id)).values(**values)
         )  # type: ignore[arg-type]
+        # Waiters in every process learn of a terminal status as it commits
+        await run_completion.notify(session, str(run_id), status)
         await session.commit()
+        run_completion.resolve(str(run_id), status)
         logger.info(f"[update_run_status] commit done run_id={run_id}")
     finally:
         # Close only if we created it here
@@ -1257,9 +1473,12 @@ async def delete_run(
         )
 
     # If forcing and active, cancel first
+    unstarted = False
     if force and run_orm.status in ["pending", "running", "streaming"]:
         logger.info(f"[delete_run] force-cancelling active run run_id={run_id}")
+        unstarted = await _drop_unstarted_run(session, run_id, "cancelled")
         await streaming_service.cancel_run(run_id)
+        await request_cancel(run_id)
         # Best-effort: wait for bg task to settle
         task = active_runs.get(run_id)
         if task:
@@ -1281,5 +1500,9 @@ async def delete_run(
     if task and not task.done():
         task.cancel()
 
+    if unstarted:
+        await set_thread_status(session, thread_id, "idle")
+        await start_next_queued_run(thread_id)
+
     # 204 No Content
     return
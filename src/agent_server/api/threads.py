@@ -17,6 +17,7 @@ from ..core.auth_deps import get_current_user
 from ..core.orm import Run as RunORM
 from ..core.orm import Thread as ThreadORM
 from ..core.orm import get_session
+from ..core.serializers.offload import serialize_offloaded
 from ..models import (
     Thread,
     ThreadCheckpointPostRequest,
@@ -242,7 +243,8 @@ async def get_thread_state_at_checkpoint(
             )
 
         # Convert snapshot to ThreadCheckpoint using service
-        thread_checkpoint = thread_state_service.convert_snapshot_to_thread_state(
+        thread_checkpoint = await serialize_offloaded(
+            thread_state_service.convert_snapshot_to_thread_state,
             state_snapshot,
             thread_id,
         )
@@ -385,8 +387,10 @@ async def get_thread_history_post(
                 state_snapshots.append(snapshot)
 
         # Convert snapshots to ThreadState using service
-        thread_states = thread_state_service.convert_snapshots_to_thread_states(
-            state_snapshots, thread_id
+        thread_states = await serialize_offloaded(
+            thread_state_service.convert_snapshots_to_thread_states,
+            state_snapshots,
+            thread_id,
         )
 
         return thread_states
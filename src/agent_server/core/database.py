@@ -97,6 +97,10 @@ class DatabaseManager:
             await self._store.setup()
         return self._store
 
+    def get_dsn(self) -> str:
+        """Get the plain ``postgresql://`` DSN for drivers used outside SQLAlchemy"""
+        return self._database_url.replace("postgresql+asyncpg://", "postgresql://")
+
     def get_engine(self) -> AsyncEngine:
         """Get the SQLAlchemy engine for metadata tables"""
         if not self.engine:
@@ -0,0 +1,115 @@
+"""Compressed binary storage format for persisted run events"""
+
+import os
+from pathlib import Path
+
+import structlog
+
+try:  # Optional codec, used only when installed
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+logger = structlog.getLogger(__name__)
+
+FORMAT_JSONB = "jsonb"
+FORMAT_ZSTD = "zstd"
+
+# How new run_events rows store their payload: `jsonb` (data column) or
+# `zstd` (pre-encoded SSE frame, compressed into the payload column)
+EVENT_STORAGE_FORMAT = os.getenv("EVENT_STORAGE_FORMAT", FORMAT_JSONB).lower()
+EVENT_STORAGE_ZSTD_LEVEL = int(os.getenv("EVENT_STORAGE_ZSTD_LEVEL", "3"))
+# Optional dictionary trained on event frames (scripts/train_event_dictionary.py)
+EVENT_STORAGE_ZSTD_DICT = os.getenv("EVENT_STORAGE_ZSTD_DICT", "")
+
+# First byte of a stored payload: how the rest of it is encoded
+TAG_RAW = b"\x00"
+TAG_ZSTD = b"\x01"
+
+
+class EventPayloadCodec:
+    """Encodes SSE frames into the ``run_events.payload`` bytea column.
+
+    A payload is a one byte tag followed by the UTF-8 frame, either as is
+    or zstd-compressed. Dictionary-compressed frames record the dictionary
+    id in their zstd header, so rows written with and without a dictionary
+    can be read back as long as the dictionary is still configured.
+    """
+
+    def __init__(
+        self,
+        storage_format: str | None = None,
+        level: int | None = None,
+        dictionary: bytes | None = None,
+    ):
+        self.storage_format = storage_format or EVENT_STORAGE_FORMAT
+        if self.storage_format == FORMAT_ZSTD and zstandard is None:
+            logger.warning(
+                "EVENT_STORAGE_FORMAT=zstd requires the `zstandard` package, "
+                "storing events as JSONB"
+            )
+            self.storage_format = FORMAT_JSONB
+        elif self.storage_format not in (FORMAT_JSONB, FORMAT_ZSTD):
+            logger.warning(
+                f"Unknown event storage format '{self.storage_format}', using JSONB"
+            )
+            self.storage_format = FORMAT_JSONB
+        self.level = EVENT_STORAGE_ZSTD_LEVEL if level is None else level
+        if dictionary is None and EVENT_STORAGE_ZSTD_DICT:
+            dictionary = Path(EVENT_STORAGE_ZSTD_DICT).read_bytes()
+        self._dictionary = (
+            zstandard.ZstdCompressionDict(dictionary)
+            if dictionary and zstandard is not None
+            else None
+        )
+        self._compressor = None
+        self._decompressor = None
+
+    @property
+    def binary(self) -> bool:
+        """Check if new events are stored in the binary payload column"""
+        return self.storage_format == FORMAT_ZSTD
+
+    def encode(self, frame: str) -> bytes:
+        """Encode an SSE frame into a stored payload"""
+        if self._compressor is None:
+            self._compressor = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._dictionary
+            )
+        return TAG_ZSTD + self._compressor.compress(frame.encode("utf-8"))
+
+    def decode(self, payload: bytes) -> str:
+        """Decode a stored payload back into its SSE frame"""
+        payload = bytes(payload)
+        tag, body = payload[:1], payload[1:]
+        if tag == TAG_RAW:
+            return body.decode("utf-8")
+        if tag == TAG_ZSTD:
+            if zstandard is None:
+                raise RuntimeError(
+                    "Stored event is zstd-compressed but `zstandard` is not installed"
+                )
+            if self._decompressor is None:
+                self._decompressor = zstandard.ZstdDecompressor(
+                    dict_data=self._dictionary
+                )
+            return self._decompressor.decompress(body).decode("utf-8")
+        raise ValueError(f"Unknown stored event payload tag: {tag!r}")
+
+
+def train_dictionary(samples: list[bytes], size: int = 64 * 1024) -> bytes:
+    """Train a zstd dictionary on sample SSE frames"""
+    if zstandard is None:
+        raise RuntimeError("Training a dictionary requires the `zstandard` package")
+    return zstandard.train_dictionary(size, samples).as_bytes()
+
+
+_codec: EventPayloadCodec | None = None
+
+
+def get_event_codec() -> EventPayloadCodec:
+    """Return the process-wide event payload codec"""
+    global _codec
+    if _codec is None:
+        _codec = EventPayloadCodec()
+    return _codec
@@ -1,6 +1,7 @@
 """Health check endpoints"""
 
 import contextlib
+from typing import Any
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
@@ -138,3 +139,26 @@ async def readiness_check() -> dict[str, str]:
 async def liveness_check() -> dict[str, str]:
     """Kubernetes liveness probe endpoint"""
     return {"status": "alive"}
+
+
+@router.get("/stats/streaming")
+async def streaming_stats() -> dict[str, Any]:
+    """Live broker buffer occupancy per run and event writer backlog"""
+    from ..services.broker import broker_manager
+    from ..services.event_writer import event_writer
+
+    return {**broker_manager.get_stats(), "event_writer": event_writer.get_stats()}
+
+
+@router.get("/stats/runs")
+async def run_stats() -> dict[str, Any]:
+    """Run execution concurrency, queue depth and queue wait times"""
+    from ..services.run_completion import run_completion
+    from ..services.run_executor import run_executor
+    from ..services.run_worker import executes_in_workers, pending_run_stats
+
+    stats = {**run_executor.get_stats(), "completion": run_completion.get_stats()}
+    if executes_in_workers():
+        # Runs wait in the database for workers, not in this process
+        stats["pending_by_user"] = await pending_run_stats()
+    return stats
@@ -21,6 +21,7 @@ from sqlalchemy import (
     ForeignKey,
     Index,
     Integer,
+    LargeBinary,
     Text,
     text,
 )
@@ -133,6 +134,17 @@ class Run(Base):
     # If migrations add this column later, it's already represented here.
     config: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     context: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    # Execution arguments (stream mode, checkpoint, command, ...) for queued runs
+    kwargs: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    # Run worker executing the run, and until when its claim holds unrenewed
+    claimed_by: Mapped[str | None] = mapped_column(Text, nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True
+    )
+    # When the run's stored events expire, if its retention isn't the default
+    events_expire_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True
+    )
     output: Mapped[dict | None] = mapped_column(JSONB)
     error_message: Mapped[str | None] = mapped_column(Text)
     user_id: Mapped[str] = mapped_column(Text, nullable=False)
@@ -150,6 +162,22 @@ class Run(Base):
         Index("idx_runs_status", "status"),
         Index("idx_runs_assistant_id", "assistant_id"),
         Index("idx_runs_created_at", "created_at"),
+        Index(
+            "idx_runs_thread_queue",
+            "thread_id",
+            "created_at",
+            postgresql_where=text("status = 'queued'"),
+        ),
+        Index(
+            "idx_runs_lease",
+            "lease_expires_at",
+            postgresql_where=text("status = 'running'"),
+        ),
+        Index(
+            "idx_runs_events_expire_at",
+            "events_expire_at",
+            postgresql_where=text("events_expire_at IS NOT NULL"),
+        ),
     )
 
 
@@ -161,14 +189,15 @@ class RunEvent(Base):
     seq: Mapped[int] = mapped_column(Integer, nullable=False)
     event: Mapped[str] = mapped_column(Text, nullable=False)
     data: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    payload: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
-        TIMESTAMP(timezone=True), server_default=text("now()")
+        TIMESTAMP(timezone=True), server_default=text("now()"), primary_key=True
     )
 
     # Indexes for performance
     __table_args__ = (
-        Index("idx_run_events_run_id", "run_id"),
         Index("idx_run_events_seq", "run_id", "seq"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
@@ -2,6 +2,13 @@
 
 from .base import Serializer
 from .general import GeneralSerializer
+from .json_codec import JSONCodec, get_json_codec
 from .langgraph import LangGraphSerializer
 
-__all__ = ["Serializer", "GeneralSerializer", "LangGraphSerializer"]
+__all__ = [
+    "Serializer",
+    "GeneralSerializer",
+    "LangGraphSerializer",
+    "JSONCodec",
+    "get_json_codec",
+]
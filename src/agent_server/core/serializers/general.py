@@ -1,12 +1,83 @@
 """General-purpose object serialization based on LangGraph's approach"""
 
-from typing import Any
+from collections.abc import Callable
+from typing import Any, ClassVar
 
 from .base import SerializationError, Serializer
 
+# Resolved handler: (serializer, obj) -> JSON-compatible value
+Handler = Callable[["GeneralSerializer", Any], Any]
+
+
+def _model_dump(_serializer: "GeneralSerializer", obj: Any) -> Any:
+    return obj.model_dump()
+
+
+def _dict_method(_serializer: "GeneralSerializer", obj: Any) -> Any:
+    return obj.dict()
+
+
+def _interrupt(serializer: "GeneralSerializer", obj: Any) -> Any:
+    return {"value": serializer._serialize_object(obj.value), "id": obj.id}
+
+
+def _named_tuple(serializer: "GeneralSerializer", obj: Any) -> Any:
+    return {k: serializer._serialize_object(v) for k, v in obj._asdict().items()}
+
+
+def _set(_serializer: "GeneralSerializer", obj: Any) -> Any:
+    return list(obj)
+
+
+def _sequence(serializer: "GeneralSerializer", obj: Any) -> Any:
+    serialize = serializer._serialize_object
+    return [serialize(item) for item in obj]
+
+
+def _mapping(serializer: "GeneralSerializer", obj: Any) -> Any:
+    serialize = serializer._serialize_object
+    return {k: serialize(v) for k, v in obj.items()}
+
+
+def _identity(_serializer: "GeneralSerializer", obj: Any) -> Any:
+    return obj
+
+
+def _string(_serializer: "GeneralSerializer", obj: Any) -> Any:
+    return str(obj)
+
 
 class GeneralSerializer(Serializer):
-    """Simple object serializer using LangGraph's proven approach"""
+    """Simple object serializer using LangGraph's proven approach.
+
+    The handler for an object is resolved once per concrete class and
+    cached, so repeated objects of a class cost a single dict lookup.
+    Resolution assumes instances of a class agree on the attributes it
+    checks (``model_dump``, ``dict``, ``_asdict``, Interrupt fields).
+    Classes themselves don't (they all share the class ``type``), so the
+    handler of a class object is resolved every time.
+    """
+
+    # Handlers registered for custom types, matched along the class MRO
+    _registry: ClassVar[dict[type, Callable[[Any], Any]]] = {}
+    # Resolved handler per concrete class, shared by all instances
+    _dispatch: ClassVar[dict[type, Handler]] = {}
+
+    @classmethod
+    def register(cls, obj_type: type, handler: Callable[[Any], Any]) -> None:
+        """Serialize instances of a type (and its subclasses) with a handler.
+
+        Registered handlers take precedence over the built-in rules; their
+        result is encoded as is, without further serialization.
+        """
+        cls._registry[obj_type] = handler
+        cls._dispatch.clear()
+
+    @classmethod
+    def unregister(cls, obj_type: type) -> None:
+        """Remove a handler registered for a type"""
+        cls._registry.pop(obj_type, None)
+        cls._dispatch.clear()
 
     def serialize(self, obj: Any) -> Any:
         """Serialize any object to JSON-compatible format using LangGraph's logic"""
@@ -19,13 +90,29 @@ class GeneralSerializer(Serializer):
 
     def _serialize_object(self, obj: Any) -> Any:
         """Core serialization logic based on LangGraph SDK's _orjson_default"""
+        if isinstance(obj, type):
+            return self._resolve_handler(obj)(self, obj)
+        obj_type = type(obj)
+        handler = self._dispatch.get(obj_type)
+        if handler is None:
+            handler = self._resolve_handler(obj)
+            self._dispatch[obj_type] = handler
+        return handler(self, obj)
+
+    def _resolve_handler(self, obj: Any) -> Handler:
+        """Pick the handler for an object's class"""
+        for base in type(obj).__mro__:
+            custom = self._registry.get(base)
+            if custom is not None:
+                return lambda _serializer, value: custom(value)
+
         # Handle Pydantic v2 models (model_dump method)
         if hasattr(obj, "model_dump") and callable(obj.model_dump):
-            return obj.model_dump()
+            return _model_dump
 
         # Handle LangChain objects and Pydantic v1 models (dict method)
         elif hasattr(obj, "dict") and callable(obj.dict):
-            return obj.dict()
+            return _dict_method
 
         # Handle LangGraph Interrupt objects (they don't have .dict() method)
         elif (
@@ -33,28 +120,28 @@ class GeneralSerializer(Serializer):
             and hasattr(obj, "value")
             and hasattr(obj, "id")
         ):
-            return {"value": self._serialize_object(obj.value), "id": obj.id}
+            return _interrupt
 
         # Handle NamedTuples (like PregelTask) - they have _asdict() method
         elif hasattr(obj, "_asdict") and callable(obj._asdict):
-            return {k: self._serialize_object(v) for k, v in obj._asdict().items()}
+            return _named_tuple
 
         # Handle sets and frozensets
         elif isinstance(obj, (set, frozenset)):
-            return list(obj)
+            return _set
 
         # Handle tuples and lists recursively
         elif isinstance(obj, (tuple, list)):
-            return [self._serialize_object(item) for item in obj]
+            return _sequence
 
         # Handle dictionaries recursively
         elif isinstance(obj, dict):
-            return {k: self._serialize_object(v) for k, v in obj.items()}
+            return _mapping
 
         # Handle basic JSON-serializable types
         elif isinstance(obj, (str, int, float, bool, type(None))):
-            return obj
+            return _identity
 
         # Fallback to string representation for unknown types
         else:
-            return str(obj)
+            return _string
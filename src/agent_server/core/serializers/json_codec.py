@@ -0,0 +1,139 @@
+"""Pluggable JSON codecs for SSE frames and stored events"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from typing import Any
+
+import structlog
+
+from .general import GeneralSerializer
+
+try:  # Optional native encoder, used only when installed
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+logger = structlog.getLogger(__name__)
+
+CODEC_ORJSON = "orjson"
+CODEC_STDLIB = "stdlib"
+
+# JSON codec used to encode events: `orjson` (native, needs the `orjson`
+# package) or `stdlib` (the json module)
+JSON_CODEC = os.getenv("JSON_CODEC", CODEC_ORJSON).lower()
+
+_serializer = GeneralSerializer()
+
+
+class JSONCodec(ABC):
+    """Encodes to and decodes from compact JSON text"""
+
+    name: str
+
+    @abstractmethod
+    def dumps(self, obj: Any, default: Callable[[Any], Any] | None = None) -> str:
+        """Serialize an object to compact JSON, using ``default`` for unknown types"""
+
+    @abstractmethod
+    def loads(self, data: str | bytes) -> Any:
+        """Parse JSON text"""
+
+
+class StdlibJSONCodec(JSONCodec):
+    """The json module, calling ``default`` for every non-native object"""
+
+    name = CODEC_STDLIB
+
+    def dumps(self, obj: Any, default: Callable[[Any], Any] | None = None) -> str:
+        return json.dumps(
+            obj, default=default or _serializer.serialize, separators=(",", ":")
+        )
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+def _tuple_default(obj: Any) -> Any:
+    """General serializer default that, like the json module, encodes
+    tuple subclasses such as NamedTuples as arrays"""
+    if isinstance(obj, tuple):
+        return list(obj)
+    return _serializer.serialize(obj)
+
+
+def _with_tuples(default: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Wrap a caller's default to encode tuple subclasses as arrays"""
+
+    def encode(obj: Any) -> Any:
+        if isinstance(obj, tuple):
+            return list(obj)
+        return default(obj)
+
+    return encode
+
+
+class OrjsonJSONCodec(JSONCodec):
+    """orjson, encoding dicts, lists, strings and numbers natively.
+
+    Everything else goes through ``default`` as with the stdlib codec:
+    Pydantic models, LangChain messages, NamedTuples (as arrays, matching
+    the json module) and sets, and also datetimes and dataclasses (such as
+    ``Interrupt``), which orjson would otherwise encode in its own format.
+    orjson applies ``default`` to nested results as well. Plain Enum
+    members are the one difference: orjson always encodes them as their
+    value, where the json module gives ``str(member)``. Objects orjson
+    rejects (integers beyond 64 bits, too deep nesting) are encoded by the
+    stdlib codec instead.
+    """
+
+    name = CODEC_ORJSON
+
+    def __init__(self) -> None:
+        self._fallback = StdlibJSONCodec()
+        self._options = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+
+    def dumps(self, obj: Any, default: Callable[[Any], Any] | None = None) -> str:
+        if default is None or isinstance(
+            getattr(default, "__self__", None), GeneralSerializer
+        ):
+            encode_default = _tuple_default
+        else:
+            encode_default = _with_tuples(default)
+        try:
+            return orjson.dumps(
+                obj, default=encode_default, option=self._options
+            ).decode()
+        except orjson.JSONEncodeError:
+            return self._fallback.dumps(obj, default)
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+
+def create_json_codec(name: str | None = None) -> JSONCodec:
+    """Create a codec by name, falling back to the stdlib codec"""
+    name = (name or JSON_CODEC).lower()
+    if name == CODEC_ORJSON:
+        if orjson is not None:
+            return OrjsonJSONCodec()
+        logger.info("JSON_CODEC=orjson requires the `orjson` package, using stdlib")
+    elif name != CODEC_STDLIB:
+        logger.warning(f"Unknown JSON codec '{name}', using stdlib")
+    return StdlibJSONCodec()
+
+
+_codec: JSONCodec | None = None
+
+
+def get_json_codec() -> JSONCodec:
+    """Return the process-wide JSON codec"""
+    global _codec
+    if _codec is None:
+        _codec = create_json_codec()
+    return _codec
@@ -1,12 +1,12 @@
 """LangGraph-specific serialization"""
 
-import json
 from typing import Any
 
 import structlog
 
 from .base import SerializationError, Serializer
 from .general import GeneralSerializer
+from .json_codec import get_json_codec
 
 logger = structlog.getLogger(__name__)
 
@@ -19,7 +19,8 @@ class LangGraphSerializer(Serializer):
 
     def serialize(self, obj: Any) -> Any:
         """Main serialization entry point"""
-        return json.loads(json.dumps(obj, default=self.general_serializer.serialize))
+        codec = get_json_codec()
+        return codec.loads(codec.dumps(obj, default=self.general_serializer.serialize))
 
     def serialize_task(self, task: Any) -> dict[str, Any]:
         """Serialize a LangGraph task to ThreadTask format"""
@@ -0,0 +1,150 @@
+"""Size-aware offloading of heavy serialization off the event loop"""
+
+import asyncio
+import functools
+import os
+import pickle
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, TypeVar
+
+import structlog
+
+T = TypeVar("T")
+
+logger = structlog.getLogger(__name__)
+
+# Payloads estimated above this many bytes are serialized in the worker
+# pool instead of on the event loop (0 disables offloading)
+SERIALIZE_OFFLOAD_THRESHOLD = int(os.getenv("SERIALIZE_OFFLOAD_THRESHOLD", "262144"))
+SERIALIZE_OFFLOAD_WORKERS = int(os.getenv("SERIALIZE_OFFLOAD_WORKERS", "2"))
+# Processes serializing large payloads instead of the threads (0 keeps threads):
+# the event loop stays responsive at the cost of pickling each payload
+SERIALIZE_OFFLOAD_PROCESSES = int(os.getenv("SERIALIZE_OFFLOAD_PROCESSES", "0"))
+
+_executor: ThreadPoolExecutor | None = None
+_process_executor: ProcessPoolExecutor | None = None
+# Whether each serialization function can be sent to a process
+_picklable: dict[tuple[Any, ...], bool] = {}
+
+
+def estimate_size(obj: Any, limit: int) -> int:
+    """Roughly estimate the JSON size of a payload, counting up to ``limit``.
+
+    Walks containers and object attributes, stopping as soon as the limit
+    is reached, so the estimate of a large payload stays cheap.
+    """
+    size = 0
+    stack = [obj]
+    while stack and size < limit:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item) + 2
+        elif isinstance(item, (bytes, bytearray)):
+            size += len(item)
+        elif isinstance(item, dict):
+            size += 2 + 4 * len(item)
+            for key, value in item.items():
+                if isinstance(key, str):
+                    size += len(key)
+                stack.append(value)
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            size += 2 + len(item)
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            size += 2
+            stack.append(vars(item))
+        else:
+            size += 8
+    return size
+
+
+def is_large(payload: Any, threshold: int | None = None) -> bool:
+    """Check if a payload is worth serializing off the event loop"""
+    threshold = SERIALIZE_OFFLOAD_THRESHOLD if threshold is None else threshold
+    return threshold > 0 and estimate_size(payload, threshold) >= threshold
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=SERIALIZE_OFFLOAD_WORKERS, thread_name_prefix="serialize"
+        )
+    return _executor
+
+
+def _get_process_executor() -> ProcessPoolExecutor:
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = ProcessPoolExecutor(max_workers=SERIALIZE_OFFLOAD_PROCESSES)
+    return _process_executor
+
+
+def _sendable(fn: Callable[..., Any]) -> bool:
+    """Check once per function (and bound class) if it can go to a process"""
+    owner = getattr(fn, "__self__", None)
+    key = (
+        getattr(fn, "__module__", None),
+        getattr(fn, "__qualname__", None),
+        type(owner),
+    )
+    sendable = _picklable.get(key)
+    if sendable is None:
+        try:
+            pickle.dumps(fn)
+            sendable = True
+        except Exception:
+            sendable = False
+        _picklable[key] = sendable
+    return sendable
+
+
+async def serialize_offloaded(
+    fn: Callable[..., T], *args: Any, payload: Any = None, stateful: bool = False
+) -> T:
+    """Call a serialization function, in the worker pool if the payload is large.
+
+    ``payload`` is what gets size-checked, defaulting to the first argument.
+    Serialization is pure Python and holds the GIL, but in a worker thread
+    the interpreter keeps switching back to the event loop, so other streams
+    stall for about a switch interval (5ms) at a time instead of the whole
+    encode. With SERIALIZE_OFFLOAD_PROCESSES, functions that can be pickled
+    run in a process pool instead, which keeps the loop nearly free while
+    the payload is pickled to and encoded in the worker, in several times
+    the wall time; scripts/bench_loop_lag.py measures both. Handlers
+    registered with GeneralSerializer after the pool started are not seen
+    by its processes. Calls the process pool cannot take are run in threads,
+    as are ``stateful`` ones, whose changes to their object must be kept.
+    """
+    if not is_large(args[0] if payload is None else payload):
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args)
+    if SERIALIZE_OFFLOAD_PROCESSES > 0 and not stateful and _sendable(fn):
+        try:
+            return await loop.run_in_executor(_get_process_executor(), call)
+        except BrokenProcessPool:
+            logger.warning("Serialization process pool broke, restarting it")
+            _shutdown_process_pool(wait=False)
+        except Exception as e:
+            # Unpicklable arguments, or an error the thread retry reports
+            logger.debug(f"Serializing in a thread after process failure: {e}")
+    return await loop.run_in_executor(_get_executor(), call)
+
+
+def _shutdown_process_pool(wait: bool) -> None:
+    global _process_executor
+    if _process_executor is not None:
+        _process_executor.shutdown(wait=wait, cancel_futures=not wait)
+        _process_executor = None
+
+
+def shutdown_serialization_pool() -> None:
+    """Stop the worker pools once pending serializations are done"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    _shutdown_process_pool(wait=True)
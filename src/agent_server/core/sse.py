@@ -7,7 +7,7 @@ from datetime import UTC, datetime
 from typing import Any
 
 # Import our serializer for handling complex objects
-from .serializers import GeneralSerializer
+from .serializers import GeneralSerializer, get_json_codec
 
 # Global serializer instance
 _serializer = GeneralSerializer()
@@ -38,18 +38,23 @@ def format_sse_message(
         event_id: Optional event ID
         serializer: Optional custom serializer function
     """
-    lines = []
+    # Convert data to JSON string
+    data_str = "" if data is None else serialize_json(data, serializer)
+    return format_sse_frame(event, data_str, event_id)
 
-    lines.append(f"event: {event}")
 
-    # Convert data to JSON string
-    if data is None:
-        data_str = ""
-    else:
-        # Use our general serializer by default to handle complex objects
-        default_serializer = serializer or _serializer.serialize
-        data_str = json.dumps(data, default=default_serializer, separators=(",", ":"))
+def serialize_json(data: Any, serializer: Callable[[Any], Any] | None = None) -> str:
+    """Serialize data to compact JSON, handling complex objects"""
+    # Use our general serializer by default to handle complex objects
+    default_serializer = serializer or _serializer.serialize
+    return get_json_codec().dumps(data, default=default_serializer)
 
+
+def format_sse_frame(event: str, data_str: str, event_id: str | None = None) -> str:
+    """Format an SSE frame around already serialized JSON data"""
+    lines = []
+
+    lines.append(f"event: {event}")
     lines.append(f"data: {data_str}")
 
     if event_id:
@@ -73,6 +78,13 @@ def create_values_event(chunk_data: dict[str, Any], event_id: str | None = None)
     return format_sse_message("values", chunk_data, event_id)
 
 
+def create_values_delta_event(
+    delta_data: dict[str, Any], event_id: str | None = None
+) -> str:
+    """Create values-delta event (full state snapshot or JSON patch)"""
+    return format_sse_message("values-delta", delta_data, event_id)
+
+
 def create_updates_event(
     updates_data: dict[str, Any], event_id: str | None = None
 ) -> str:
@@ -183,6 +195,30 @@ def create_messages_event(
         return format_sse_message(event_type, messages_data, event_id)
 
 
+@dataclass(frozen=True, slots=True)
+class EncodedEvent:
+    """A run event serialized once and shared by every consumer.
+
+    ``frame`` is sent verbatim to all live subscribers; ``stored_data`` is
+    the JSON text persisted to ``run_events`` (None for stream modes that
+    are not stored). Both are built from the same serialized payload.
+    ``stored_before`` is set on events received from another process: the
+    sequence of the latest event it persisted before this one.
+    """
+
+    id: str
+    mode: str
+    frame: str | None
+    stored_event: str | None = None
+    stored_data: str | None = None
+    stored_before: int | None = None
+
+    @property
+    def size(self) -> int:
+        """Approximate memory held by the encoded event"""
+        return len(self.frame or "") + len(self.stored_data or "")
+
+
 # Legacy compatibility functions (deprecated)
 @dataclass
 class SSEEvent:
@@ -192,6 +228,8 @@ class SSEEvent:
     event: str
     data: dict[str, Any]
     timestamp: datetime | None = None
+    # Compressed SSE frame of events stored in the binary format
+    payload: bytes | None = None
 
     def __post_init__(self) -> None:
         if self.timestamp is None:
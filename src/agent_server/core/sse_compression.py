@@ -0,0 +1,184 @@
+"""Streaming compression for Server-Sent Events responses"""
+
+import os
+import zlib
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+
+try:  # Optional codecs, used only when installed
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+# Enabled encodings in server preference order; empty or "none" disables
+SSE_COMPRESSION = os.getenv("SSE_COMPRESSION", "zstd,br,gzip")
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+class SSECompressor(ABC):
+    """Stateful compressor that flushes after every event.
+
+    One compression context is kept for the whole response, so later events
+    are compressed against the history of earlier ones, while the sync
+    flush makes each event decodable as soon as it is received.
+    """
+
+    encoding: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compress one event and flush it to a decodable boundary"""
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        """Terminate the compressed stream"""
+
+
+class GzipSSECompressor(SSECompressor):
+    encoding = "gzip"
+
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliSSECompressor(SSECompressor):
+    encoding = "br"
+
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdSSECompressor(SSECompressor):
+    encoding = "zstd"
+
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> list[str]:
+    """Encodings enabled by ``SSE_COMPRESSION`` whose codec is installed"""
+    installed = {
+        "gzip": True,
+        "br": brotli is not None,
+        "zstd": zstandard is not None,
+    }
+    enabled = [e.strip().lower() for e in SSE_COMPRESSION.split(",")]
+    return [e for e in enabled if installed.get(e)]
+
+
+def _parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q-value}"""
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities
+
+
+def negotiate_sse_encoding(accept_encoding: Any) -> str | None:
+    """Pick the content coding for an SSE response, None for identity"""
+    if not isinstance(accept_encoding, str) or not accept_encoding:
+        return None
+    qualities = _parse_accept_encoding(accept_encoding)
+    wildcard = qualities.get("*", 0.0)
+
+    best: tuple[float, int] | None = None
+    chosen = None
+    for rank, encoding in enumerate(available_encodings()):
+        quality = qualities.get(encoding, wildcard)
+        if quality <= 0:
+            continue
+        # Client quality first, then server preference
+        key = (quality, -rank)
+        if best is None or key > best:
+            best, chosen = key, encoding
+    return chosen
+
+
+def create_sse_compressor(encoding: str) -> SSECompressor:
+    """Create a fresh compressor for a negotiated encoding"""
+    if encoding == "gzip":
+        return GzipSSECompressor()
+    if encoding == "br":
+        return BrotliSSECompressor()
+    if encoding == "zstd":
+        return ZstdSSECompressor()
+    raise ValueError(f"Unsupported SSE encoding: {encoding}")
+
+
+async def compress_sse_stream(
+    stream: AsyncIterator[str | bytes], compressor: SSECompressor
+) -> AsyncIterator[bytes]:
+    """Compress an SSE stream, flushing after every event"""
+    try:
+        async for chunk in stream:
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.finish()
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def create_sse_response(
+    stream: AsyncIterator[str | bytes],
+    accept_encoding: Any = None,
+    headers: dict[str, str] | None = None,
+) -> StreamingResponse:
+    """Build an SSE StreamingResponse, compressed if the client accepts it"""
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    encoding = negotiate_sse_encoding(accept_encoding)
+    if encoding is not None:
+        stream = compress_sse_stream(stream, create_sse_compressor(encoding))
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
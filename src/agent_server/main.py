@@ -29,17 +29,23 @@ from starlette.middleware.authentication import AuthenticationMiddleware
 
 from .api.assistants import router as assistants_router
 from .api.runs import router as runs_router
+from .api.runs import start_queued_runs
 from .api.store import router as store_router
 from .api.threads import router as threads_router
 from .core.auth_middleware import get_auth_backend, on_auth_error
 from .core.database import db_manager
 from .core.health import router as health_router
+from .core.serializers.offload import shutdown_serialization_pool
 from .middleware import DoubleEncodedJSONMiddleware, StructLogMiddleware
 from .models.errors import AgentProtocolError, get_error_type
 from .observability.base import get_observability_manager
 from .observability.langfuse_integration import _langfuse_provider
+from .services.broker import broker_manager
+from .services.event_compactor import event_compactor
 from .services.event_store import event_store
+from .services.event_writer import event_writer
 from .services.langgraph_service import get_langgraph_service
+from .services.run_completion import run_completion
 from .utils.setup_logging import setup_logging
 
 # Task management for run cancellation
@@ -66,6 +72,18 @@ async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
     # Initialize event store cleanup task
     await event_store.start_cleanup_task()
 
+    # Start the write-behind event writer
+    await event_writer.start()
+
+    # Initialize broker cleanup (and cross-process transport, if configured)
+    await broker_manager.start_cleanup_task()
+
+    # Learn of runs ending in any process, for join and wait requests
+    await run_completion.start()
+
+    # Resume thread run queues left waiting by a previous process
+    await start_queued_runs()
+
     yield
 
     # Shutdown: Clean up connections and cancel active runs
@@ -73,9 +91,21 @@ async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
         if not task.done():
             task.cancel()
 
+    # Drop pending compactions; finished runs keep their full event log
+    await event_compactor.stop()
+
+    # Persist events still queued before closing the database
+    await event_writer.stop()
+
     # Stop event store cleanup task
     await event_store.stop_cleanup_task()
 
+    await broker_manager.stop_cleanup_task()
+
+    await run_completion.stop()
+
+    shutdown_serialization_pool()
+
     await db_manager.close()
 
 
@@ -79,7 +79,7 @@ class Run(BaseModel):
     run_id: str
     thread_id: str
     assistant_id: str
-    status: str = "pending"  # pending, running, completed, failed, cancelled
+    status: str = "pending"  # queued, pending, running, completed, failed, cancelled
     input: dict[str, Any]
     output: dict[str, Any] | None = None
     error_message: str | None = None
@@ -88,6 +88,10 @@ class Run(BaseModel):
     user_id: str
     created_at: datetime
     updated_at: datetime
+    queue_position: int | None = Field(
+        None,
+        description="Position in the thread's run queue (1 = next) while queued",
+    )
 
     class Config:
         from_attributes = True
@@ -2,117 +2,555 @@
 
 import asyncio
 import contextlib
-from collections.abc import AsyncIterator
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
 from typing import Any
 
 import structlog
 
+from ..core.sse import EncodedEvent
+from ..utils import extract_event_sequence
 from .base_broker import BaseBrokerManager, BaseRunBroker
 
 logger = structlog.getLogger(__name__)
 
-
-class RunBroker(BaseRunBroker):
-    """Manages event queuing and distribution for a specific run"""
+# Overflow policies applied when a run's buffer is full of unread events
+POLICY_BLOCK = "block"  # producer waits for the slowest subscriber
+POLICY_DROP_MESSAGES = "drop_messages"  # skip intermediate `messages` chunks
+POLICY_DISCONNECT = "disconnect"  # slow subscriber resumes from the event store
+OVERFLOW_POLICIES = (POLICY_BLOCK, POLICY_DROP_MESSAGES, POLICY_DISCONNECT)
+
+# Maximum number of events retained per run for live subscribers
+DEFAULT_BUFFER_SIZE = int(os.getenv("BROKER_BUFFER_SIZE", "1024"))
+# Maximum (approximate) payload bytes retained per run
+DEFAULT_BUFFER_BYTES = int(os.getenv("BROKER_BUFFER_BYTES", str(8 * 1024 * 1024)))
+# Maximum (approximate) payload bytes retained across all runs of the process
+DEFAULT_TOTAL_BYTES = int(os.getenv("BROKER_TOTAL_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_OVERFLOW_POLICY = os.getenv("BROKER_OVERFLOW_POLICY", POLICY_DISCONNECT)
+# Seconds a blocked producer waits before disconnecting the slow subscriber
+DEFAULT_BLOCK_TIMEOUT = float(os.getenv("BROKER_BLOCK_TIMEOUT", "30"))
+# Seconds a finished run's stream state outlives its last subscriber
+DEFAULT_STATE_TTL = float(os.getenv("BROKER_STATE_TTL", "60"))
+
+
+def _is_end_event(payload: Any) -> bool:
+    """Check if a broker payload is the terminal ``end`` event"""
+    if isinstance(payload, EncodedEvent):
+        return payload.mode == "end"
+    return isinstance(payload, tuple) and len(payload) >= 1 and payload[0] == "end"
+
+
+def _is_message_chunk(payload: Any) -> bool:
+    """Check if a broker payload is a ``messages`` token chunk"""
+    if isinstance(payload, EncodedEvent):
+        return payload.mode == "messages"
+    if not isinstance(payload, tuple):
+        return False
+    if len(payload) == 2:
+        return payload[0] == "messages"
+    return len(payload) == 3 and payload[1] == "messages"
+
+
+def _estimate_size(obj: Any, depth: int = 0) -> int:
+    """Cheap approximation of the encoded size of a broker payload"""
+    if isinstance(obj, EncodedEvent):
+        return obj.size
+    if isinstance(obj, (str, bytes, bytearray)):
+        return len(obj)
+    if obj is None or isinstance(obj, (bool, int, float)):
+        return 8
+    if depth >= 8:
+        return 64
+    if isinstance(obj, dict):
+        return 2 + sum(
+            len(str(k)) + _estimate_size(v, depth + 1) for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return 2 + sum(_estimate_size(item, depth + 1) for item in obj)
+    # LangChain messages carry almost all of their weight in `content`
+    content = getattr(obj, "content", None)
+    if content is not None:
+        return 128 + _estimate_size(content, depth + 1)
+    return 64
+
+
+class SubscriberLaggedError(Exception):
+    """Raised in a subscriber that was disconnected for falling behind"""
 
     def __init__(self, run_id: str):
+        super().__init__(f"Subscriber of run {run_id} lagged behind broker buffer")
+        self.run_id = run_id
+
+
+class BufferBudget:
+    """Byte budget shared by the buffers of all brokers of a manager"""
+
+    def __init__(self, max_bytes: int = DEFAULT_TOTAL_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def has_room(self, size: int) -> bool:
+        """Check if ``size`` more bytes fit into the budget"""
+        return self.used + size <= self.max_bytes
+
+
+class RunBroker(BaseRunBroker):
+    """Fans out events for a specific run to any number of subscribers.
+
+    Events are appended to a bounded ring buffer addressed by absolute
+    offsets. Each subscriber created by ``aiter()`` keeps its own cursor
+    into the buffer, so consuming an event never takes it away from other
+    subscribers and memory is bounded by the buffer size, not by the number
+    of watchers.
+
+    Events every subscriber has read are evicted freely once the buffer
+    reaches its event or byte cap. If the oldest event is still unread, the
+    overflow ``policy`` decides: block the producer, drop the incoming
+    ``messages`` chunk, or disconnect the slowest subscribers, which then
+    raise ``SubscriberLaggedError`` and resume from the event store.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        buffer_size: int | None = None,
+        max_bytes: int | None = None,
+        policy: str | None = None,
+        budget: BufferBudget | None = None,
+        block_timeout: float | None = None,
+    ):
         self.run_id = run_id
-        self.queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
+        self.buffer_size = buffer_size or DEFAULT_BUFFER_SIZE
+        self.max_bytes = max_bytes or DEFAULT_BUFFER_BYTES
+        self.policy = policy or DEFAULT_OVERFLOW_POLICY
+        if self.policy not in OVERFLOW_POLICIES:
+            logger.warning(
+                f"Unknown broker overflow policy '{self.policy}', using '{POLICY_DISCONNECT}'"
+            )
+            self.policy = POLICY_DISCONNECT
+        self.block_timeout = (
+            DEFAULT_BLOCK_TIMEOUT if block_timeout is None else block_timeout
+        )
+        self._budget = budget
+        self._buffer: deque[tuple[str, Any, int]] = deque()
+        self._bytes = 0
+        # Absolute offset of the oldest event still held in the buffer
+        self._base_offset = 0
+        # Per-subscriber cursors (absolute offset of the next event to read)
+        self._cursors: dict[int, int] = {}
+        self._subscriber_ids = itertools.count()
+        self._lagged: set[int] = set()
+        # Sequence after which every published event is still buffered
+        # (None until the first event); the tail replayed to reconnects
+        self._retained_floor: int | None = None
+        # Futures of subscribers parked until the next event or run completion
+        self._waiters: set[asyncio.Future[None]] = set()
+        # Futures of producers blocked until the slowest subscriber advances
+        self._drain_waiters: set[asyncio.Future[None]] = set()
+        self.dropped_events = 0
+        self.disconnected_subscribers = 0
         self.finished = asyncio.Event()
+        # Called when the run is finished and its last subscriber has left
+        self.on_idle: Callable[[], None] | None = None
         self._created_at = asyncio.get_event_loop().time()
 
+    @property
+    def next_offset(self) -> int:
+        """Absolute offset that the next published event will get"""
+        return self._base_offset + len(self._buffer)
+
+    @property
+    def subscriber_count(self) -> int:
+        """Number of subscribers currently iterating this broker"""
+        return len(self._cursors)
+
+    @property
+    def max_subscriber_lag(self) -> int:
+        """Number of buffered events the slowest subscriber has not read"""
+        return self.next_offset - self._min_cursor()
+
     async def put(self, event_id: str, payload: Any) -> None:
-        """Put an event into the broker queue"""
+        """Append an event to the buffer and wake up subscribers"""
+        await self._append(event_id, payload, on_end=self.mark_finished)
+
+    async def _append(
+        self, event_id: str, payload: Any, on_end: Callable[[], None]
+    ) -> None:
+        """Buffer an event, calling ``on_end`` when it ends the run"""
         if self.finished.is_set():
             logger.warning(
                 f"Attempted to put event {event_id} into finished broker for run {self.run_id}"
             )
             return
 
-        await self.queue.put((event_id, payload))
+        size = _estimate_size(payload)
+        while self._buffer and self._is_over_capacity(size):
+            if self._min_cursor() > self._base_offset:
+                # Every subscriber has read the oldest event
+                self._evict_oldest()
+                continue
+
+            if self.policy == POLICY_DROP_MESSAGES and _is_message_chunk(payload):
+                # Live subscribers miss this token; it is still persisted and
+                # the next `values` event carries the complete state.
+                self.dropped_events += 1
+                self._raise_floor(event_id)
+                return
+            if self.policy == POLICY_BLOCK and await self._wait_for_drain():
+                continue
+            self._disconnect_laggards()
+
+        if self._retained_floor is None:
+            self._retained_floor = extract_event_sequence(event_id) - 1
+        self._buffer.append((event_id, payload, size))
+        self._bytes += size
+        if self._budget is not None:
+            self._budget.used += size
+        self._wake_subscribers()
 
         # Check if this is an end event
-        if isinstance(payload, tuple) and len(payload) >= 1 and payload[0] == "end":
-            self.mark_finished()
+        if _is_end_event(payload):
+            on_end()
 
     async def aiter(self) -> AsyncIterator[tuple[str, Any]]:
-        """Async iterator yielding (event_id, payload) pairs"""
-        while True:
-            try:
-                # Use timeout to check if run is finished
-                event_id, payload = await asyncio.wait_for(
-                    self.queue.get(), timeout=0.1
-                )
-                yield event_id, payload
-
-                # Check if this is an end event
-                if (
-                    isinstance(payload, tuple)
-                    and len(payload) >= 1
-                    and payload[0] == "end"
-                ):
+        """Async iterator yielding (event_id, payload) pairs from an own cursor.
+
+        A new subscriber starts at the oldest event still retained in the
+        buffer; callers deduplicate against what they already replayed.
+
+        Raises:
+            SubscriberLaggedError: If the overflow policy disconnected this
+                subscriber for falling behind the buffer
+        """
+        subscriber_id = next(self._subscriber_ids)
+        self._cursors[subscriber_id] = self._base_offset
+        try:
+            while True:
+                if subscriber_id in self._lagged:
+                    raise SubscriberLaggedError(self.run_id)
+
+                cursor = self._cursors[subscriber_id]
+                if cursor < self.next_offset:
+                    event_id, payload, _ = self._buffer[cursor - self._base_offset]
+                    self._cursors[subscriber_id] = cursor + 1
+                    if cursor == self._base_offset:
+                        self._wake_producers()
+                    yield event_id, payload
+
+                    # Check if this is an end event
+                    if _is_end_event(payload):
+                        break
+                    continue
+
+                # Check if run is finished and this subscriber has drained it
+                if self.finished.is_set():
                     break
 
-            except TimeoutError:
-                # Check if run is finished and queue is empty
-                if self.finished.is_set() and self.queue.empty():
-                    break
-                continue
+                # Park until an event is published or the run finishes
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.add(waiter)
+                try:
+                    await waiter
+                finally:
+                    self._waiters.discard(waiter)
+        finally:
+            self._cursors.pop(subscriber_id, None)
+            self._lagged.discard(subscriber_id)
+            self._wake_producers()
+            self._notify_if_idle()
 
     def mark_finished(self) -> None:
         """Mark this broker as finished"""
         self.finished.set()
+        self._wake_subscribers()
         logger.debug(f"Broker for run {self.run_id} marked as finished")
+        self._notify_if_idle()
+
+    def retains_after(self, sequence: int) -> bool:
+        """Check if every event after ``sequence`` is still in the buffer.
+
+        Reconnecting clients are then served from memory without reading
+        the event store.
+        """
+        return self._retained_floor is not None and self._retained_floor <= sequence
+
+    def has_buffered_events(self) -> bool:
+        """Check if the buffer holds a tail of published events"""
+        return self._retained_floor is not None and bool(self._buffer)
+
+    def _raise_floor(self, event_id: str) -> None:
+        """Record that the event ``event_id`` is no longer buffered"""
+        sequence = extract_event_sequence(event_id)
+        if self._retained_floor is None or sequence > self._retained_floor:
+            self._retained_floor = sequence
+
+    def is_idle(self) -> bool:
+        """Check if the run is finished and nobody is subscribed anymore"""
+        return self.finished.is_set() and not self._cursors
 
     def is_finished(self) -> bool:
         """Check if this broker is finished"""
         return self.finished.is_set()
 
+    def _notify_if_idle(self) -> None:
+        """Invoke the ``on_idle`` callback once the broker became idle"""
+        if self.on_idle is not None and self.is_idle():
+            self.on_idle()
+
+    def _wake_subscribers(self) -> None:
+        """Resolve the futures of all parked subscribers"""
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def _wake_producers(self) -> None:
+        """Resolve the futures of producers blocked on a full buffer"""
+        for waiter in self._drain_waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._drain_waiters.clear()
+
+    def _is_over_capacity(self, incoming_size: int) -> bool:
+        """Check if appending an event of ``incoming_size`` exceeds a cap"""
+        if len(self._buffer) >= self.buffer_size:
+            return True
+        if self._bytes + incoming_size > self.max_bytes:
+            return True
+        return self._budget is not None and not self._budget.has_room(incoming_size)
+
+    def _min_cursor(self) -> int:
+        """Offset of the next event the slowest subscriber will read"""
+        return min(self._cursors.values(), default=self.next_offset)
+
+    def _evict_oldest(self) -> None:
+        """Drop the oldest buffered event"""
+        event_id, _, size = self._buffer.popleft()
+        self._raise_floor(event_id)
+        self._base_offset += 1
+        self._bytes -= size
+        if self._budget is not None:
+            self._budget.used -= size
+
+    async def _wait_for_drain(self) -> bool:
+        """Block until the slowest subscriber advances; False on timeout"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._drain_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.block_timeout)
+            return True
+        except TimeoutError:
+            logger.warning(
+                f"Producer for run {self.run_id} blocked for {self.block_timeout}s "
+                "on a full broker buffer, disconnecting slow subscribers"
+            )
+            return False
+        finally:
+            self._drain_waiters.discard(waiter)
+
+    def _disconnect_laggards(self) -> None:
+        """Disconnect subscribers that still need the oldest buffered event"""
+        for subscriber_id, cursor in list(self._cursors.items()):
+            if cursor <= self._base_offset:
+                del self._cursors[subscriber_id]
+                self._lagged.add(subscriber_id)
+                self.disconnected_subscribers += 1
+                logger.info(
+                    f"Disconnecting slow subscriber {subscriber_id} of run {self.run_id}"
+                )
+        self._wake_subscribers()
+
+    def release_buffer(self) -> None:
+        """Drop all buffered events and return their bytes to the budget"""
+        if self._budget is not None:
+            self._budget.used -= self._bytes
+        self._base_offset = self.next_offset
+        self._buffer.clear()
+        self._bytes = 0
+
     def is_empty(self) -> bool:
-        """Check if the queue is empty"""
-        return self.queue.empty()
+        """Check if no subscriber still has buffered events to drain"""
+        next_offset = self.next_offset
+        return all(cursor >= next_offset for cursor in self._cursors.values())
 
     def get_age(self) -> float:
         """Get the age of this broker in seconds"""
         return asyncio.get_event_loop().time() - self._created_at
 
+    def get_stats(self) -> dict[str, Any]:
+        """Report buffer occupancy of this broker for monitoring"""
+        return {
+            "run_id": self.run_id,
+            "buffered_events": len(self._buffer),
+            "buffered_bytes": self._bytes,
+            "max_events": self.buffer_size,
+            "max_bytes": self.max_bytes,
+            "policy": self.policy,
+            "subscribers": self.subscriber_count,
+            "max_subscriber_lag": self.max_subscriber_lag,
+            "dropped_events": self.dropped_events,
+            "disconnected_subscribers": self.disconnected_subscribers,
+            "retained_floor": self._retained_floor,
+            "finished": self.is_finished(),
+        }
+
+
+class RunStreamState:
+    """Streaming state of one run: its broker, event counter and subscribers.
+
+    The subscriber set is the broker's cursor table, so the state is idle
+    exactly when the run is terminal and every subscriber has left.
+    """
+
+    def __init__(self, run_id: str, broker: RunBroker):
+        self.run_id = run_id
+        self.broker = broker
+        # Highest event sequence published for the run
+        self.last_sequence = 0
+        # Monotonic deadline at which an idle state is dropped
+        self.expires_at: float | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        """Number of subscribers currently streaming the run"""
+        return self.broker.subscriber_count
+
+    def is_idle(self) -> bool:
+        """Check if the state only waits for expiry"""
+        return self.broker.is_idle()
+
+    def advance_sequence(self, sequence: int) -> int:
+        """Record a published sequence and return the highest one seen"""
+        if sequence > self.last_sequence:
+            self.last_sequence = sequence
+        return self.last_sequence
+
+    def next_sequence(self) -> int:
+        """Reserve the sequence following the last published one"""
+        self.last_sequence += 1
+        return self.last_sequence
+
 
 class BrokerManager(BaseBrokerManager):
-    """Manages multiple RunBroker instances"""
+    """Manages the stream states (and brokers) of active runs.
+
+    A state is scheduled for expiry in a deadline-ordered heap as soon as
+    its run is terminal and its last subscriber has left, and a single
+    background task sleeps until the earliest deadline. Resident states are
+    therefore proportional to concurrently streaming runs, not to the
+    number of runs ever executed.
+    """
 
-    def __init__(self) -> None:
-        self._brokers: dict[str, RunBroker] = {}
+    def __init__(self, state_ttl: float | None = None) -> None:
+        self._states: dict[str, RunStreamState] = {}
         self._cleanup_task: asyncio.Task | None = None
+        self._budget = BufferBudget()
+        self.state_ttl = DEFAULT_STATE_TTL if state_ttl is None else state_ttl
+        # (deadline, tiebreaker, state); entries of reactivated or removed
+        # states are skipped lazily when they reach the top
+        self._expiry_heap: list[tuple[float, int, RunStreamState]] = []
+        self._expiry_ids = itertools.count()
+        self._expiry_wakeup: asyncio.Event | None = None
+
+    def _create_broker(self, run_id: str) -> RunBroker:
+        """Instantiate the broker for a run"""
+        return RunBroker(run_id, budget=self._budget)
+
+    def get_or_create_state(self, run_id: str) -> RunStreamState:
+        """Get or create the stream state of a run"""
+        state = self._states.get(run_id)
+        if state is None:
+            broker = self._create_broker(run_id)
+            state = RunStreamState(run_id, broker)
+            broker.on_idle = lambda: self._schedule_expiry(state)
+            self._states[run_id] = state
+            logger.debug(f"Created new stream state for run {run_id}")
+        return state
+
+    def get_state(self, run_id: str) -> RunStreamState | None:
+        """Get an existing stream state or None"""
+        return self._states.get(run_id)
 
     def get_or_create_broker(self, run_id: str) -> RunBroker:
         """Get or create a broker for a run"""
-        if run_id not in self._brokers:
-            self._brokers[run_id] = RunBroker(run_id)
-            logger.debug(f"Created new broker for run {run_id}")
-        return self._brokers[run_id]
+        return self.get_or_create_state(run_id).broker
 
     def get_broker(self, run_id: str) -> RunBroker | None:
         """Get an existing broker or None"""
-        return self._brokers.get(run_id)
+        state = self._states.get(run_id)
+        return state.broker if state is not None else None
 
     def cleanup_broker(self, run_id: str) -> None:
         """Clean up a broker for a run"""
-        if run_id in self._brokers:
-            self._brokers[run_id].mark_finished()
-            # Don't immediately delete in case there are still consumers
+        state = self._states.get(run_id)
+        if state is not None:
+            # Expiry is scheduled once the remaining consumers have left
+            state.broker.mark_finished()
             logger.debug(f"Marked broker for run {run_id} for cleanup")
 
     def remove_broker(self, run_id: str) -> None:
         """Remove a broker completely"""
-        if run_id in self._brokers:
-            self._brokers[run_id].mark_finished()
-            del self._brokers[run_id]
+        state = self._states.pop(run_id, None)
+        if state is not None:
+            state.expires_at = None
+            state.broker.on_idle = None
+            state.broker.mark_finished()
+            state.broker.release_buffer()
             logger.debug(f"Removed broker for run {run_id}")
 
+    def _schedule_expiry(self, state: RunStreamState) -> None:
+        """Index an idle state by its expiry deadline"""
+        if self._states.get(state.run_id) is not state:
+            return
+        if self.state_ttl <= 0:
+            self.remove_broker(state.run_id)
+            return
+        state.expires_at = time.monotonic() + self.state_ttl
+        heapq.heappush(
+            self._expiry_heap, (state.expires_at, next(self._expiry_ids), state)
+        )
+        if self._expiry_wakeup is not None and self._expiry_heap[0][2] is state:
+            self._expiry_wakeup.set()
+
+    def _expire_due(self, now: float) -> int:
+        """Remove idle states whose deadline passed; return how many"""
+        expired = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            deadline, _, state = heapq.heappop(self._expiry_heap)
+            if (
+                state.expires_at != deadline
+                or self._states.get(state.run_id) is not state
+            ):
+                continue
+            if not state.is_idle():
+                # A subscriber rejoined; it reschedules expiry when it leaves
+                state.expires_at = None
+                continue
+            self.remove_broker(state.run_id)
+            expired += 1
+        return expired
+
+    def get_stats(self) -> dict[str, Any]:
+        """Report per-run and global buffer occupancy for monitoring"""
+        return {
+            "brokers": len(self._states),
+            "pending_expiry": sum(
+                1 for state in self._states.values() if state.expires_at is not None
+            ),
+            "total_bytes": self._budget.used,
+            "max_total_bytes": self._budget.max_bytes,
+            "runs": [state.broker.get_stats() for state in self._states.values()],
+        }
+
     async def start_cleanup_task(self) -> None:
-        """Start background cleanup task for old brokers"""
+        """Start background task expiring idle stream states"""
         if self._cleanup_task is None or self._cleanup_task.done():
-            self._cleanup_task = asyncio.create_task(self._cleanup_old_brokers())
+            self._expiry_wakeup = asyncio.Event()
+            self._cleanup_task = asyncio.create_task(self._expire_states())
 
     async def stop_cleanup_task(self) -> None:
         """Stop background cleanup task"""
@@ -120,28 +558,23 @@ class BrokerManager(BaseBrokerManager):
             self._cleanup_task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await self._cleanup_task
+        self._expiry_wakeup = None
 
-    async def _cleanup_old_brokers(self) -> None:
-        """Background task to clean up old finished brokers"""
+    async def _expire_states(self) -> None:
+        """Background task sleeping until the earliest expiry deadline"""
+        wakeup = self._expiry_wakeup
         while True:
             try:
-                await asyncio.sleep(300)  # Check every 5 minutes
+                wakeup.clear()
+                timeout = None
+                if self._expiry_heap:
+                    timeout = max(0.0, self._expiry_heap[0][0] - time.monotonic())
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(wakeup.wait(), timeout=timeout)
 
-                asyncio.get_event_loop().time()
-                to_remove = []
-
-                for run_id, broker in self._brokers.items():
-                    # Remove brokers that are finished and older than 1 hour
-                    if (
-                        broker.is_finished()
-                        and broker.is_empty()
-                        and broker.get_age() > 3600
-                    ):
-                        to_remove.append(run_id)
-
-                for run_id in to_remove:
-                    self.remove_broker(run_id)
-                    logger.info(f"Cleaned up old broker for run {run_id}")
+                expired = self._expire_due(time.monotonic())
+                if expired:
+                    logger.debug(f"Expired {expired} idle run stream states")
 
             except asyncio.CancelledError:
                 break
@@ -149,5 +582,21 @@ class BrokerManager(BaseBrokerManager):
                 logger.error(f"Error in broker cleanup task: {e}")
 
 
+def create_broker_manager() -> BrokerManager:
+    """Create the broker manager selected by ``BROKER_BACKEND``.
+
+    ``memory`` (default) keeps live events process-local; ``postgres`` also
+    shares them with other workers and replicas through LISTEN/NOTIFY.
+    """
+    backend = os.getenv("BROKER_BACKEND", "memory").lower()
+    if backend == "postgres":
+        from .pg_broker import PostgresBrokerManager
+
+        return PostgresBrokerManager()
+    if backend != "memory":
+        logger.warning(f"Unknown BROKER_BACKEND '{backend}', using 'memory'")
+    return BrokerManager()
+
+
 # Global broker manager instance
-broker_manager = BrokerManager()
+broker_manager = create_broker_manager()
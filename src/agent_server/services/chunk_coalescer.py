@@ -0,0 +1,177 @@
+"""Adaptive coalescing of ``messages`` token chunks into fewer events"""
+
+import asyncio
+import contextlib
+import contextvars
+import os
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+from langchain_core.messages import BaseMessageChunk
+
+# Base coalescing window in milliseconds; 0 disables coalescing
+DEFAULT_COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", "0"))
+# Window used when no subscriber is watching or subscribers fall behind
+DEFAULT_COALESCE_MAX_MS = float(
+    os.getenv("STREAM_COALESCE_MAX_MS", str(DEFAULT_COALESCE_MS * 4))
+)
+# Maximum number of token chunks merged into one event
+DEFAULT_COALESCE_MAX_CHUNKS = int(os.getenv("STREAM_COALESCE_MAX_CHUNKS", "64"))
+
+
+def coalescing_enabled() -> bool:
+    """Check if token chunk coalescing is configured"""
+    return DEFAULT_COALESCE_MS > 0
+
+
+def _split_message_chunk(raw_event: Any) -> tuple[Any, Any, Any] | None:
+    """Return (node_path, chunk, metadata) of a mergeable ``messages`` event"""
+    if not isinstance(raw_event, tuple):
+        return None
+    if len(raw_event) == 2:
+        node_path, (mode, payload) = None, raw_event
+    elif len(raw_event) == 3:
+        node_path, mode, payload = raw_event
+    else:
+        return None
+    if mode != "messages" or not isinstance(payload, tuple) or len(payload) != 2:
+        return None
+    chunk, metadata = payload
+    if not isinstance(chunk, BaseMessageChunk) or not chunk.id:
+        return None
+    return node_path, chunk, metadata
+
+
+class _PendingChunk:
+    """Token chunks of one message merged so far"""
+
+    def __init__(self, node_path: Any, chunk: Any, metadata: Any, deadline: float):
+        self.node_path = node_path
+        self.chunk = chunk
+        self.metadata = metadata
+        self.count = 1
+        self.deadline = deadline
+
+    def accepts(self, node_path: Any, chunk: Any) -> bool:
+        """Check if a chunk continues the pending message"""
+        return (
+            chunk.id == self.chunk.id
+            and type(chunk) is type(self.chunk)
+            and node_path == self.node_path
+        )
+
+    def add(self, chunk: Any) -> None:
+        self.chunk = self.chunk + chunk
+        self.count += 1
+
+    def to_event(self) -> tuple:
+        """Build the raw ``messages`` event of the merged chunk"""
+        payload = (self.chunk, self.metadata)
+        if self.node_path is None:
+            return "messages", payload
+        return self.node_path, "messages", payload
+
+
+class MessageChunkCoalescer:
+    """Merges consecutive token chunks of a message into a single event.
+
+    Chunks are held for at most the coalescing window or ``max_chunks``
+    chunks, and any other event flushes them first, so event order is
+    preserved. The window grows from ``window_ms`` towards ``max_window_ms``
+    with the ``pressure`` reported for the run (0 when subscribers keep up,
+    1 when they lag or nobody is watching): fast consumers get low latency,
+    slow ones get fewer, larger frames.
+    """
+
+    def __init__(
+        self,
+        window_ms: float | None = None,
+        max_window_ms: float | None = None,
+        max_chunks: int | None = None,
+        pressure: Callable[[], float] | None = None,
+    ):
+        self.window_ms = DEFAULT_COALESCE_MS if window_ms is None else window_ms
+        self.max_window_ms = max(
+            self.window_ms,
+            DEFAULT_COALESCE_MAX_MS if max_window_ms is None else max_window_ms,
+        )
+        self.max_chunks = max_chunks or DEFAULT_COALESCE_MAX_CHUNKS
+        self._pressure = pressure
+        self.chunks_in = 0
+        self.events_out = 0
+
+    def window(self) -> float:
+        """Current coalescing window in seconds"""
+        pressure = self._pressure() if self._pressure is not None else 0.0
+        pressure = min(max(pressure, 0.0), 1.0)
+        window_ms = self.window_ms + (self.max_window_ms - self.window_ms) * pressure
+        return window_ms / 1000
+
+    async def coalesce(self, events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Yield ``events`` with consecutive token chunks merged"""
+        loop = asyncio.get_running_loop()
+        iterator = aiter(events)
+        # Each step of the source runs in a task so a pending chunk can be
+        # flushed when its window elapses; sharing one context keeps the
+        # context variables of the source generator intact across steps.
+        context = contextvars.copy_context()
+        pending: _PendingChunk | None = None
+        next_event: asyncio.Task | None = None
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.create_task(anext(iterator), context=context)
+                if pending is not None:
+                    timeout = max(pending.deadline - loop.time(), 0)
+                    done, _ = await asyncio.wait({next_event}, timeout=timeout)
+                    if not done:
+                        yield self._flush(pending)
+                        pending = None
+                        continue
+
+                try:
+                    raw_event = await next_event
+                except StopAsyncIteration:
+                    break
+                finally:
+                    if next_event.done():
+                        next_event = None
+
+                message = _split_message_chunk(raw_event)
+                if message is None:
+                    if pending is not None:
+                        yield self._flush(pending)
+                        pending = None
+                    yield raw_event
+                    continue
+
+                self.chunks_in += 1
+                node_path, chunk, metadata = message
+                if pending is not None and pending.accepts(node_path, chunk):
+                    pending.add(chunk)
+                else:
+                    if pending is not None:
+                        yield self._flush(pending)
+                    pending = _PendingChunk(
+                        node_path, chunk, metadata, loop.time() + self.window()
+                    )
+
+                if pending.count >= self.max_chunks:
+                    yield self._flush(pending)
+                    pending = None
+
+            if pending is not None:
+                yield self._flush(pending)
+        finally:
+            if next_event is not None and not next_event.done():
+                next_event.cancel()
+                with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                    await next_event
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                with contextlib.suppress(Exception):
+                    await aclose()
+
+    def _flush(self, pending: _PendingChunk) -> tuple:
+        self.events_out += 1
+        return pending.to_event()
@@ -0,0 +1,231 @@
+"""Compaction of the stored event log of finished runs"""
+
+import asyncio
+import contextlib
+import json
+import os
+from typing import Any
+
+import structlog
+from langchain_core.messages import (
+    AIMessageChunk,
+    ChatMessageChunk,
+    FunctionMessageChunk,
+    HumanMessageChunk,
+    SystemMessageChunk,
+    ToolMessageChunk,
+)
+
+from ..core.event_codec import get_event_codec
+from ..core.sse import SSEEvent
+from ..utils import extract_event_sequence
+from .event_converter import EventConverter
+from .event_store import event_store
+from .event_writer import event_writer
+
+logger = structlog.getLogger(__name__)
+
+# Compact the stored events of runs once they finish
+EVENT_COMPACTION = os.getenv("EVENT_COMPACTION", "true").lower() == "true"
+# Seconds to wait after a run finishes; until then reconnects are usually
+# served from the broker's in-memory tail (see BROKER_STATE_TTL)
+DEFAULT_COMPACTION_DELAY = float(os.getenv("EVENT_COMPACTION_DELAY", "60"))
+
+# Key of a folded message event's stored data holding the group's first seq
+FOLDED_FROM = "folded_from"
+
+_CHUNK_TYPES = {
+    cls.__name__: cls
+    for cls in (
+        AIMessageChunk,
+        ChatMessageChunk,
+        FunctionMessageChunk,
+        HumanMessageChunk,
+        SystemMessageChunk,
+        ToolMessageChunk,
+    )
+}
+
+
+def folded_from(event: SSEEvent) -> int | None:
+    """The first sequence of the chunks a folded message event replaced"""
+    if isinstance(event.data, dict):
+        return event.data.get(FOLDED_FROM)
+    return None
+
+
+class _StoredEvent:
+    """A stored event with its content decoded from either storage format"""
+
+    def __init__(self, event: SSEEvent, seq: int, kind: str, data: dict[str, Any]):
+        self.event = event
+        self.seq = seq
+        self.kind = kind
+        self.data = data
+
+    @property
+    def binary(self) -> bool:
+        return self.event.payload is not None
+
+    def message_key(self) -> tuple | None:
+        """Identity of the message a foldable token chunk belongs to"""
+        if self.kind != "messages":
+            return None
+        chunk = self.data.get("message_chunk")
+        if not isinstance(chunk, dict) or chunk.get("type") not in _CHUNK_TYPES:
+            return None
+        if not chunk.get("id"):
+            return None
+        return chunk["id"], chunk["type"], json.dumps(self.data.get("node_path"))
+
+    def is_snapshot(self) -> bool:
+        """Check if this is a full state snapshot a later one supersedes"""
+        if self.kind != "values":
+            return False
+        chunk = self.data.get("chunk")
+        return not (isinstance(chunk, dict) and "__interrupt__" in chunk)
+
+
+class EventCompactor:
+    """Shrinks the event log of a finished run to what replay needs.
+
+    Consecutive token chunks of the same message are folded into one event
+    carrying the complete message, stored at the sequence of the group's
+    last chunk, and every state snapshot but the last (interrupts excluded)
+    is dropped. Remaining events keep their sequence numbers, so
+    ``Last-Event-ID`` resumes still work. A folded event records the first
+    sequence it replaced; a client resuming in the middle of the message
+    already has its start, so replay skips the event rather than sending
+    the tokens again, and the last state snapshot carries the message.
+    """
+
+    def __init__(self, delay: float | None = None):
+        self.delay = DEFAULT_COMPACTION_DELAY if delay is None else delay
+        self.converter = EventConverter()
+        self._tasks: set[asyncio.Task] = set()
+
+    def schedule(self, run_id: str) -> None:
+        """Compact a run's events in the background after the delay"""
+        if not EVENT_COMPACTION:
+            return
+        task = asyncio.create_task(self._compact_later(run_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self) -> None:
+        """Cancel compactions that have not run yet"""
+        for task in list(self._tasks):
+            task.cancel()
+        for task in list(self._tasks):
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _compact_later(self, run_id: str) -> None:
+        await asyncio.sleep(self.delay)
+        try:
+            await self.compact_run(run_id)
+        except Exception as e:
+            logger.error(f"Failed to compact events of run {run_id}: {e}")
+
+    async def compact_run(self, run_id: str) -> tuple[int, int]:
+        """Compact the stored events of a run, returning (before, after) counts"""
+        await event_writer.flush(run_id)
+        events = [
+            self._decode(event) async for event in event_store.iter_events(run_id)
+        ]
+        deleted, replacements = self.plan(events)
+        if deleted or replacements:
+            await event_store.rewrite_events(run_id, deleted, replacements)
+            logger.info(
+                f"Compacted events of run {run_id}: "
+                f"{len(events)} -> {len(events) - len(deleted)}"
+            )
+        return len(events), len(events) - len(deleted)
+
+    def plan(
+        self, events: list[_StoredEvent]
+    ) -> tuple[list[int], list[tuple[int, str | None, bytes | None]]]:
+        """Return the seqs to delete and the (seq, data, payload) to rewrite"""
+        deleted: list[int] = []
+        replacements: list[tuple[int, str | None, bytes | None]] = []
+
+        group: list[_StoredEvent] = []
+        for event in [*events, None]:
+            key = event.message_key() if event is not None else None
+            if group and key == group[0].message_key():
+                group.append(event)
+                continue
+            if len(group) > 1:
+                folded = self._fold(group)
+                if folded is not None:
+                    deleted.extend(e.seq for e in group[:-1])
+                    replacements.append(folded)
+            group = [event] if key is not None else []
+
+        snapshots = [e.seq for e in events if e.is_snapshot()]
+        deleted.extend(snapshots[:-1])
+        return sorted(deleted), replacements
+
+    def _fold(
+        self, group: list[_StoredEvent]
+    ) -> tuple[int, str | None, bytes | None] | None:
+        """Merge a group of token chunks into the content of its last event"""
+        try:
+            chunks = [
+                _CHUNK_TYPES[e.data["message_chunk"]["type"]].model_validate(
+                    e.data["message_chunk"]
+                )
+                for e in group
+            ]
+        except Exception as e:
+            logger.warning(f"Cannot fold message chunks, keeping them: {e}")
+            return None
+        merged = chunks[0]
+        for chunk in chunks[1:]:
+            merged = merged + chunk
+
+        last = group[-1]
+        node_path = group[0].data.get("node_path")
+        metadata = group[0].data.get("metadata")
+        payload = merged if metadata is None else (merged, metadata)
+        raw_event = (
+            (tuple(node_path), "messages", payload)
+            if node_path is not None
+            else ("messages", payload)
+        )
+        encoded = self.converter.encode_raw_event(last.event.id, raw_event)
+        if last.binary:
+            return (
+                last.seq,
+                json.dumps({FOLDED_FROM: group[0].seq}),
+                get_event_codec().encode(encoded.frame),
+            )
+        data = {**json.loads(encoded.stored_data), FOLDED_FROM: group[0].seq}
+        return last.seq, json.dumps(data, separators=(",", ":")), None
+
+    @staticmethod
+    def _decode(event: SSEEvent) -> _StoredEvent:
+        """Read a stored event's content in the JSONB storage shape"""
+        seq = extract_event_sequence(event.id)
+        if event.payload is None:
+            return _StoredEvent(event, seq, event.event, event.data or {})
+
+        lines = get_event_codec().decode(event.payload).split("\n")
+        kind = lines[0].removeprefix("event: ")
+        data_str = lines[1].removeprefix("data: ") if len(lines) > 1 else ""
+        data = json.loads(data_str) if data_str else None
+        if kind == "messages":
+            chunk, metadata = (
+                data if isinstance(data, list) and len(data) == 2 else (data, None)
+            )
+            return _StoredEvent(
+                event,
+                seq,
+                kind,
+                {"message_chunk": chunk, "metadata": metadata, "node_path": None},
+            )
+        return _StoredEvent(event, seq, kind, {"chunk": data})
+
+
+# Global event compactor instance
+event_compactor = EventCompactor()
@@ -2,7 +2,9 @@
 
 from typing import Any
 
+from ..core.event_codec import get_event_codec
 from ..core.sse import (
+    EncodedEvent,
     create_checkpoints_event,
     create_custom_event,
     create_debug_event,
@@ -16,7 +18,10 @@ from ..core.sse import (
     create_subgraphs_event,
     create_tasks_event,
     create_updates_event,
+    create_values_delta_event,
     create_values_event,
+    format_sse_frame,
+    serialize_json,
 )
 
 
@@ -25,11 +30,106 @@ class EventConverter:
 
     def convert_raw_to_sse(self, event_id: str, raw_event: Any) -> str | None:
         """Convert raw event to SSE format"""
+        return self.encode_raw_event(event_id, raw_event).frame
+
+    def encode_raw_event(self, event_id: str, raw_event: Any) -> EncodedEvent:
+        """Serialize a raw event once into its SSE frame and stored form.
+
+        The payload is dumped a single time; the SSE data and the run_events
+        JSON are composed from the same serialized fragments.
+        """
+        node_path = None
+        if isinstance(raw_event, tuple) and len(raw_event) == 3:
+            node_path = raw_event[0]
         stream_mode, payload = self._parse_raw_event(raw_event)
-        return self._create_sse_event(stream_mode, payload, event_id)
+
+        if stream_mode == "messages":
+            if isinstance(payload, tuple) and len(payload) == 2:
+                chunk_json = self._serialize_payload(payload[0])
+                metadata_json = self._serialize_payload(payload[1])
+                data_str = f"[{chunk_json},{metadata_json}]"
+            else:
+                chunk_json = self._serialize_payload(payload)
+                metadata_json = "null"
+                data_str = "" if payload is None else chunk_json
+            stored_data = (
+                f'{{"type":"messages_stream","message_chunk":{chunk_json},'
+                f'"metadata":{metadata_json},"node_path":{serialize_json(node_path)}}}'
+            )
+            return EncodedEvent(
+                event_id,
+                stream_mode,
+                format_sse_frame("messages", data_str, event_id),
+                "messages",
+                stored_data,
+            )
+
+        if stream_mode in ("values", "updates"):
+            payload_json = self._serialize_payload(payload)
+            # Interrupt updates are sent as values, other updates as updates
+            sse_event = (
+                "updates"
+                if stream_mode == "updates"
+                and not (isinstance(payload, dict) and "__interrupt__" in payload)
+                else "values"
+            )
+            data_str = "" if payload is None else payload_json
+            # Stored under the SSE event name so replay (and compaction) can
+            # tell state snapshots from node updates
+            stored_type = f"execution_{sse_event}"
+            return EncodedEvent(
+                event_id,
+                stream_mode,
+                format_sse_frame(sse_event, data_str, event_id),
+                sse_event,
+                f'{{"type":"{stored_type}","chunk":{payload_json}}}',
+            )
+
+        if stream_mode == "values-delta":
+            delta_json = self._serialize_payload(payload)
+            return EncodedEvent(
+                event_id,
+                stream_mode,
+                format_sse_frame("values-delta", delta_json, event_id),
+                "values-delta",
+                f'{{"type":"values_delta","delta":{delta_json}}}',
+            )
+
+        if stream_mode == "end":
+            end_data = payload if isinstance(payload, dict) else {}
+            stored_data = serialize_json(
+                {
+                    "type": "run_complete",
+                    "status": end_data.get("status", "completed"),
+                    "final_output": end_data.get("final_output"),
+                }
+            )
+            return EncodedEvent(
+                event_id, stream_mode, create_end_event(event_id), "end", stored_data
+            )
+
+        # Other stream modes are only streamed live, not stored
+        return EncodedEvent(
+            event_id,
+            stream_mode,
+            self._create_sse_event(stream_mode, payload, event_id),
+        )
+
+    def _serialize_payload(self, payload: Any) -> str:
+        """Serialize a payload, falling back to its string form"""
+        try:
+            return serialize_json(payload)
+        except Exception:
+            # Fallback to stringifying as a last resort to avoid crashing the run
+            return serialize_json({"raw": str(payload)})
 
     def convert_stored_to_sse(self, stored_event, run_id: str = None) -> str | None:
         """Convert stored event to SSE format"""
+        payload = getattr(stored_event, "payload", None)
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            # Binary format: the frame was stored pre-encoded
+            return get_event_codec().decode(payload)
+
         event_type = stored_event.event
         data = stored_event.data
         event_id = stored_event.id
@@ -45,6 +145,10 @@ class EventConverter:
             return create_messages_event(message_data, event_id=event_id)
         elif event_type == "values":
             return create_values_event(data.get("chunk"), event_id)
+        elif event_type == "updates":
+            return create_updates_event(data.get("chunk"), event_id)
+        elif event_type == "values-delta":
+            return create_values_delta_event(data.get("delta"), event_id)
         elif event_type == "metadata":
             return create_metadata_event(run_id, event_id)
         elif event_type == "state":
@@ -84,6 +188,8 @@ class EventConverter:
             return create_messages_event(payload, event_id=event_id)
         elif stream_mode == "values":
             return create_values_event(payload, event_id)
+        elif stream_mode == "values-delta":
+            return create_values_delta_event(payload, event_id)
         elif stream_mode == "updates":
             # Convert interrupt updates to values, otherwise keep as updates
             if isinstance(payload, dict) and "__interrupt__" in payload:
@@ -0,0 +1,106 @@
+"""Policy deciding which events of a run are persisted for replay"""
+
+import os
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+
+from ..core.sse import EncodedEvent
+
+logger = structlog.getLogger(__name__)
+
+# Run config key holding the policy; set it in an assistant's config for
+# assistant-wide defaults and in a run request's config to override them
+POLICY_CONFIG_KEY = "event_persistence"
+
+# Defaults for runs whose config carries no policy
+EVENT_PERSISTENCE = os.getenv("EVENT_PERSISTENCE", "true").lower() == "true"
+EVENT_PERSISTED_MODES = [
+    mode.strip()
+    for mode in os.getenv(
+        "EVENT_PERSISTED_MODES", "messages,values,updates,values-delta"
+    ).split(",")
+    if mode.strip()
+]
+
+
+@dataclass(frozen=True, slots=True)
+class EventPersistencePolicy:
+    """Which stream modes of a run are stored, and for how long.
+
+    ``retention_hours`` overrides the server-wide ``EVENT_RETENTION_HOURS``
+    for the run, shorter or longer; the expiry is stored on the run.
+    """
+
+    enabled: bool = True
+    stream_modes: frozenset[str] = frozenset(EVENT_PERSISTED_MODES)
+    retention_hours: float | None = None
+
+    def persists(self, encoded: EncodedEvent | None) -> bool:
+        """Check if an encoded event should be written to the event store"""
+        return (
+            self.enabled
+            and encoded is not None
+            and encoded.stored_data is not None
+            and encoded.mode in self.stream_modes
+        )
+
+
+DEFAULT_POLICY = EventPersistencePolicy(enabled=EVENT_PERSISTENCE)
+DISABLED_POLICY = EventPersistencePolicy(enabled=False)
+
+
+def resolve_persistence_policy(config: dict[str, Any] | None) -> EventPersistencePolicy:
+    """Build the policy of a run from its (assistant-merged) config.
+
+    The config value is either a boolean or an object with any of
+    ``enabled``, ``stream_modes`` and ``retention_hours``; missing fields
+    keep the server defaults and invalid values are ignored with a warning.
+    """
+    value = (config or {}).get(POLICY_CONFIG_KEY)
+    if value is None:
+        return DEFAULT_POLICY
+    if isinstance(value, bool):
+        return EventPersistencePolicy(enabled=value) if value else DISABLED_POLICY
+    if not isinstance(value, dict):
+        logger.warning(f"Ignoring invalid {POLICY_CONFIG_KEY} config: {value!r}")
+        return DEFAULT_POLICY
+
+    enabled = value.get("enabled", DEFAULT_POLICY.enabled)
+    if not isinstance(enabled, bool):
+        logger.warning(f"Ignoring invalid {POLICY_CONFIG_KEY}.enabled: {enabled!r}")
+        enabled = DEFAULT_POLICY.enabled
+
+    stream_modes = value.get("stream_modes")
+    if stream_modes is None:
+        modes = DEFAULT_POLICY.stream_modes
+    elif isinstance(stream_modes, list) and all(
+        isinstance(m, str) for m in stream_modes
+    ):
+        # messages-tuple is streamed (and stored) as messages
+        modes = frozenset(
+            "messages" if m == "messages-tuple" else m for m in stream_modes
+        )
+    else:
+        logger.warning(
+            f"Ignoring invalid {POLICY_CONFIG_KEY}.stream_modes: {stream_modes!r}"
+        )
+        modes = DEFAULT_POLICY.stream_modes
+
+    retention_hours = value.get("retention_hours")
+    if retention_hours is not None and (
+        isinstance(retention_hours, bool)
+        or not isinstance(retention_hours, (int, float))
+        or retention_hours < 0
+    ):
+        logger.warning(
+            f"Ignoring invalid {POLICY_CONFIG_KEY}.retention_hours: {retention_hours!r}"
+        )
+        retention_hours = None
+
+    return EventPersistencePolicy(
+        enabled=enabled,
+        stream_modes=modes,
+        retention_hours=retention_hours,
+    )
@@ -2,19 +2,39 @@
 
 import asyncio
 import contextlib
-import json
-from datetime import UTC, datetime
+import os
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
 
 import structlog
 from sqlalchemy import bindparam, text
 from sqlalchemy.dialects.postgresql import JSONB
 
 from ..core.database import db_manager
-from ..core.serializers import GeneralSerializer
-from ..core.sse import SSEEvent
+from ..core.event_codec import get_event_codec
+from ..core.serializers import GeneralSerializer, get_json_codec
+from ..core.serializers.offload import serialize_offloaded
+from ..core.sse import EncodedEvent, SSEEvent
 
 logger = structlog.get_logger(__name__)
 
+# Number of events fetched per keyset page during replay
+REPLAY_PAGE_SIZE = int(os.getenv("EVENT_REPLAY_PAGE_SIZE", "500"))
+# Hours of events kept for replay; older hourly partitions are dropped
+EVENT_RETENTION_HOURS = float(os.getenv("EVENT_RETENTION_HOURS", "1"))
+# Hourly partitions created ahead of the current hour
+EVENT_PARTITIONS_AHEAD = int(os.getenv("EVENT_PARTITIONS_AHEAD", "3"))
+
+PARTITION_PREFIX = "run_events_p"
+DEFAULT_PARTITION = "run_events_default"
+PARTITION_SPAN = timedelta(hours=1)
+
+# Events of runs whose own retention outlasts the server-wide one
+RETAINED_EVENTS = (
+    "EXISTS (SELECT 1 FROM runs r WHERE r.run_id = {table}.run_id "
+    "AND r.events_expire_at > :now)"
+)
+
 
 class EventStore:
     """Postgres-backed event store for SSE replay functionality"""
@@ -37,19 +57,19 @@ class EventStore:
     async def store_event(self, run_id: str, event: SSEEvent) -> None:
         """Persist an event with sequence extracted from id suffix.
 
-        We expect event.id format: f"{run_id}_event_{seq}".
+        We expect event.id format: f"{run_id}_event_{seq}". Events already
+        stored under the same (run_id, seq) are skipped, so retries are safe.
         """
-        try:
-            seq = int(str(event.id).split("_event_")[-1])
-        except Exception:
-            seq = 0
+        seq = self._event_seq(event.id)
         engine = db_manager.get_engine()
         async with engine.begin() as conn:
             stmt = text(
                 """
                 INSERT INTO run_events (id, run_id, seq, event, data, created_at)
-                VALUES (:id, :run_id, :seq, :event, :data, NOW())
-                ON CONFLICT (id) DO NOTHING
+                SELECT :id, :run_id, :seq, :event, :data, NOW()
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM run_events WHERE run_id = :run_id AND seq = :seq
+                )
                 """
             ).bindparams(bindparam("data", type_=JSONB))
             await conn.execute(
@@ -63,6 +83,137 @@ class EventStore:
                 },
             )
 
+    async def store_encoded_event(self, run_id: str, event: EncodedEvent) -> None:
+        """Persist an encoded event, reusing its serialized form verbatim."""
+        data, payload = self._stored_columns(event)
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    """
+                    INSERT INTO run_events
+                        (id, run_id, seq, event, data, payload, created_at)
+                    SELECT :id, :run_id, :seq, :event, CAST(:data AS JSONB),
+                           CAST(:payload AS BYTEA), NOW()
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM run_events WHERE run_id = :run_id AND seq = :seq
+                    )
+                    """
+                ),
+                {
+                    "id": event.id,
+                    "run_id": run_id,
+                    "seq": self._event_seq(event.id),
+                    "event": event.stored_event,
+                    "data": data,
+                    "payload": payload,
+                },
+            )
+
+    async def store_encoded_events(
+        self, events: list[tuple[str, EncodedEvent]]
+    ) -> None:
+        """Persist a batch of (run_id, encoded event) with one multi-row INSERT."""
+        if not events:
+            return
+        columns = [self._stored_columns(event) for _, event in events]
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    """
+                    INSERT INTO run_events
+                        (id, run_id, seq, event, data, payload, created_at)
+                    SELECT id, run_id, seq, event, CAST(data AS JSONB), payload, NOW()
+                    FROM unnest(
+                        CAST(:ids AS TEXT[]),
+                        CAST(:run_ids AS TEXT[]),
+                        CAST(:seqs AS INTEGER[]),
+                        CAST(:events AS TEXT[]),
+                        CAST(:data AS TEXT[]),
+                        CAST(:payloads AS BYTEA[])
+                    ) AS batch(id, run_id, seq, event, data, payload)
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM run_events e
+                        WHERE e.run_id = batch.run_id AND e.seq = batch.seq
+                    )
+                    """
+                ),
+                {
+                    "ids": [event.id for _, event in events],
+                    "run_ids": [run_id for run_id, _ in events],
+                    "seqs": [self._event_seq(event.id) for _, event in events],
+                    "events": [event.stored_event for _, event in events],
+                    "data": [data for data, _ in columns],
+                    "payloads": [payload for _, payload in columns],
+                },
+            )
+
+    @staticmethod
+    def _stored_columns(event: EncodedEvent) -> tuple[str | None, bytes | None]:
+        """Return the (data, payload) column values for an encoded event.
+
+        In the binary storage format the SSE frame is stored compressed and
+        replayed verbatim, so Postgres never parses it as JSON.
+        """
+        codec = get_event_codec()
+        if codec.binary and event.frame is not None:
+            return None, codec.encode(event.frame)
+        return event.stored_data, None
+
+    async def rewrite_events(
+        self,
+        run_id: str,
+        deleted_seqs: list[int],
+        replacements: list[tuple[int, str | None, bytes | None]],
+    ) -> None:
+        """Delete events and replace the content of others in one transaction.
+
+        Replacements are (seq, JSON data, binary payload) and keep their seq,
+        so sequence numbers of the remaining events are unchanged.
+        """
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            if deleted_seqs:
+                await conn.execute(
+                    text(
+                        """
+                        DELETE FROM run_events
+                        WHERE run_id = :run_id AND seq = ANY(CAST(:seqs AS INTEGER[]))
+                        """
+                    ),
+                    {"run_id": run_id, "seqs": deleted_seqs},
+                )
+            for seq, data, payload in replacements:
+                await conn.execute(
+                    text(
+                        """
+                        UPDATE run_events
+                        SET data = CAST(:data AS JSONB), payload = CAST(:payload AS BYTEA)
+                        WHERE run_id = :run_id AND seq = :seq
+                        """
+                    ),
+                    {"run_id": run_id, "seq": seq, "data": data, "payload": payload},
+                )
+
+    @staticmethod
+    def _row_to_event(r) -> SSEEvent:
+        return SSEEvent(
+            id=r.id,
+            event=r.event,
+            data=r.data,
+            timestamp=r.created_at,
+            payload=bytes(r.payload) if r.payload is not None else None,
+        )
+
+    @staticmethod
+    def _event_seq(event_id: str) -> int:
+        """Extract the sequence from an event id, 0 if malformed"""
+        try:
+            return int(str(event_id).split("_event_")[-1])
+        except Exception:
+            return 0
+
     async def get_events_since(self, run_id: str, last_event_id: str) -> list[SSEEvent]:
         """Fetch all events for run after last_event_id sequence."""
         try:
@@ -74,7 +225,7 @@ class EventStore:
             rs = await conn.execute(
                 text(
                     """
-                    SELECT id, event, data, created_at
+                    SELECT id, event, data, payload, created_at
                     FROM run_events
                     WHERE run_id = :run_id AND seq > :last_seq
                     ORDER BY seq ASC
@@ -83,10 +234,71 @@ class EventStore:
                 {"run_id": run_id, "last_seq": last_seq},
             )
             rows = rs.fetchall()
-        return [
-            SSEEvent(id=r.id, event=r.event, data=r.data, timestamp=r.created_at)
-            for r in rows
-        ]
+        return [self._row_to_event(r) for r in rows]
+
+    async def iter_events(
+        self,
+        run_id: str,
+        after_seq: int = -1,
+        before_seq: int | None = None,
+        page_size: int | None = None,
+    ) -> AsyncIterator[SSEEvent]:
+        """Stream events with after_seq < seq < before_seq in sequence order.
+
+        Rows are read in keyset pages on (run_id, seq), each in its own short
+        transaction, so memory stays bounded by the page size, the first
+        events are available immediately, and no connection is held while a
+        slow client consumes them.
+        """
+        page_size = page_size or REPLAY_PAGE_SIZE
+        upper_bound = "" if before_seq is None else "AND seq < :before_seq"
+        stmt = text(
+            f"""
+            SELECT id, seq, event, data, payload, created_at
+            FROM run_events
+            WHERE run_id = :run_id AND seq > :after_seq {upper_bound}
+            ORDER BY seq ASC
+            LIMIT :limit
+            """
+        )
+        engine = db_manager.get_engine()
+        while True:
+            async with engine.begin() as conn:
+                rs = await conn.execute(
+                    stmt,
+                    {
+                        "run_id": run_id,
+                        "after_seq": after_seq,
+                        "before_seq": before_seq,
+                        "limit": page_size,
+                    },
+                )
+                rows = rs.fetchall()
+            for r in rows:
+                yield self._row_to_event(r)
+            if len(rows) < page_size:
+                return
+            after_seq = rows[-1].seq
+
+    async def get_event(self, event_id: str) -> SSEEvent | None:
+        """Fetch a single stored event by id, through the (run_id, seq) index."""
+        run_id = str(event_id).rsplit("_event_", 1)[0]
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            rs = await conn.execute(
+                text(
+                    """
+                    SELECT id, event, data, payload, created_at
+                    FROM run_events
+                    WHERE run_id = :run_id AND seq = :seq AND id = :id
+                    """
+                ),
+                {"run_id": run_id, "seq": self._event_seq(event_id), "id": event_id},
+            )
+            r = rs.fetchone()
+        if r is None:
+            return None
+        return self._row_to_event(r)
 
     async def get_all_events(self, run_id: str) -> list[SSEEvent]:
         engine = db_manager.get_engine()
@@ -94,7 +306,7 @@ class EventStore:
             rs = await conn.execute(
                 text(
                     """
-                    SELECT id, event, data, created_at
+                    SELECT id, event, data, payload, created_at
                     FROM run_events
                     WHERE run_id = :run_id
                     ORDER BY seq ASC
@@ -103,10 +315,7 @@ class EventStore:
                 {"run_id": run_id},
             )
             rows = rs.fetchall()
-        return [
-            SSEEvent(id=r.id, event=r.event, data=r.data, timestamp=r.created_at)
-            for r in rows
-        ]
+        return [self._row_to_event(r) for r in rows]
 
     async def cleanup_events(self, run_id: str) -> None:
         engine = db_manager.get_engine()
@@ -116,6 +325,50 @@ class EventStore:
                 {"run_id": run_id},
             )
 
+    async def expire_run(self, run_id: str, retention_hours: float) -> None:
+        """Keep a run's events for ``retention_hours`` from now.
+
+        The expiry is stored on the run, so it survives restarts and applies
+        in every process. A shorter retention than EVENT_RETENTION_HOURS
+        deletes the events early; a longer one keeps them when their
+        partition is dropped.
+        """
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "UPDATE runs SET events_expire_at = "
+                    "NOW() + make_interval(secs => :secs) WHERE run_id = :run_id"
+                ),
+                {"secs": retention_hours * 3600, "run_id": run_id},
+            )
+
+    async def _cleanup_expired_runs(self, now: datetime | None = None) -> list[str]:
+        """Delete the events of runs whose own retention has passed"""
+        now = now or datetime.now(UTC)
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            rs = await conn.execute(
+                text(
+                    """
+                    WITH expired AS (
+                        UPDATE runs SET events_expire_at = NULL
+                        WHERE events_expire_at <= :now
+                        RETURNING run_id
+                    ), deleted AS (
+                        DELETE FROM run_events
+                        WHERE run_id IN (SELECT run_id FROM expired)
+                    )
+                    SELECT run_id FROM expired
+                    """
+                ),
+                {"now": now},
+            )
+            expired = [row[0] for row in rs.fetchall()]
+        if expired:
+            logger.info(f"Deleted events of {len(expired)} expired runs")
+        return expired
+
     async def get_run_info(self, run_id: str) -> dict | None:
         engine = db_manager.get_engine()
         async with engine.begin() as conn:
@@ -158,22 +411,176 @@ class EventStore:
     async def _cleanup_loop(self) -> None:
         while True:
             try:
-                await asyncio.sleep(self.CLEANUP_INTERVAL)
                 await self._cleanup_old_runs()
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in event store cleanup: {e}")
+            try:
+                await asyncio.sleep(self.CLEANUP_INTERVAL)
+            except asyncio.CancelledError:
+                break
 
     async def _cleanup_old_runs(self) -> None:
-        # Retain events for 1 hour by default
+        await self._cleanup_expired_runs()
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            partitioned = await self._is_partitioned(conn)
+            if not partitioned:
+                await conn.execute(
+                    text(
+                        "DELETE FROM run_events "
+                        "WHERE created_at < :now - make_interval(secs => :secs) "
+                        f"AND NOT {RETAINED_EVENTS.format(table='run_events')}"
+                    ),
+                    {"now": datetime.now(UTC), "secs": EVENT_RETENTION_HOURS * 3600},
+                )
+                return
+        await self.ensure_partitions()
+        await self.drop_expired_partitions()
+
+    @staticmethod
+    async def _is_partitioned(conn) -> bool:
+        rs = await conn.execute(
+            text(
+                """
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_partitioned_table pt
+                    JOIN pg_class c ON c.oid = pt.partrelid
+                    WHERE c.relname = 'run_events'
+                      AND pg_table_is_visible(c.oid)
+                )
+                """
+            )
+        )
+        return bool(rs.scalar())
+
+    @staticmethod
+    async def _partition_names(conn) -> list[str]:
+        rs = await conn.execute(
+            text(
+                """
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = 'run_events'
+                """
+            )
+        )
+        return [row[0] for row in rs.fetchall()]
+
+    @staticmethod
+    def _partition_name(start: datetime) -> str:
+        return f"{PARTITION_PREFIX}{start:%Y%m%d%H}"
+
+    @staticmethod
+    def _partition_start(name: str) -> datetime | None:
+        if not name.startswith(PARTITION_PREFIX):
+            return None
+        try:
+            start = datetime.strptime(name[len(PARTITION_PREFIX) :], "%Y%m%d%H")
+        except ValueError:
+            return None
+        return start.replace(tzinfo=UTC)
+
+    async def ensure_partitions(self, now: datetime | None = None) -> list[str]:
+        """Create the hourly partitions for the current and upcoming hours.
+
+        Rows that already landed in the default partition for an hour are
+        moved into its new partition before it is attached.
+        """
+        now = now or datetime.now(UTC)
+        current = now.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
         engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            existing = set(await self._partition_names(conn))
+
+        created = []
+        for offset in range(EVENT_PARTITIONS_AHEAD + 1):
+            start = current + offset * PARTITION_SPAN
+            name = self._partition_name(start)
+            if name in existing:
+                continue
+            bounds = {"start": start, "end": start + PARTITION_SPAN}
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(f"CREATE TABLE {name} (LIKE run_events INCLUDING DEFAULTS)")
+                )
+                await conn.execute(
+                    text(
+                        f"""
+                        WITH moved AS (
+                            DELETE FROM {DEFAULT_PARTITION}
+                            WHERE created_at >= :start AND created_at < :end
+                            RETURNING *
+                        )
+                        INSERT INTO {name} SELECT * FROM moved
+                        """
+                    ),
+                    bounds,
+                )
+                await conn.execute(
+                    text(
+                        f"ALTER TABLE run_events ATTACH PARTITION {name} "
+                        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') "
+                        f"TO ('{bounds['end'].isoformat()}')"
+                    )
+                )
+            created.append(name)
+        if created:
+            logger.info(f"Created run_events partitions: {', '.join(created)}")
+        return created
+
+    async def drop_expired_partitions(self, now: datetime | None = None) -> list[str]:
+        """Detach and drop hourly partitions older than the retention window.
+
+        Dropping a whole partition avoids the bloat, vacuum work and lock
+        contention of deleting expired rows one by one. Events of runs kept
+        longer are copied out first; with their hour detached they land in
+        the default partition until their run expires.
+        """
+        now = now or datetime.now(UTC)
+        cutoff = now - timedelta(hours=EVENT_RETENTION_HOURS)
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            names = sorted(await self._partition_names(conn))
+
+        dropped = []
+        for name in names:
+            start = self._partition_start(name)
+            if start is None or start + PARTITION_SPAN > cutoff:
+                continue
+            try:
+                async with engine.begin() as conn:
+                    # Give up rather than queue inserts behind the detach
+                    await conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+                    await conn.execute(
+                        text(f"ALTER TABLE run_events DETACH PARTITION {name}")
+                    )
+                    await conn.execute(
+                        text(
+                            f"INSERT INTO run_events SELECT * FROM {name} "
+                            f"WHERE {RETAINED_EVENTS.format(table=name)}"
+                        ),
+                        {"now": now},
+                    )
+                    await conn.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+            except Exception as e:
+                logger.warning(f"Failed to drop run_events partition {name}: {e}")
+
+        # Stragglers outside any hourly partition are few; delete them by row
         async with engine.begin() as conn:
             await conn.execute(
                 text(
-                    "DELETE FROM run_events WHERE created_at < NOW() - INTERVAL '1 hour'"
-                )
+                    f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff "
+                    f"AND NOT {RETAINED_EVENTS.format(table=DEFAULT_PARTITION)}"
+                ),
+                {"cutoff": cutoff, "now": now},
             )
+        if dropped:
+            logger.info(f"Dropped expired run_events partitions: {', '.join(dropped)}")
+        return dropped
 
 
 # Global event store instance
@@ -188,7 +595,11 @@ async def store_sse_event(
 
     # Ensure JSONB-safe data by serializing complex objects
     try:
-        safe_data = json.loads(json.dumps(data, default=serializer.serialize))
+        codec = get_json_codec()
+        safe_data = await serialize_offloaded(
+            lambda: codec.loads(codec.dumps(data, default=serializer.serialize)),
+            payload=data,
+        )
     except Exception:
         # Fallback to stringifying as a last resort to avoid crashing the run
         safe_data = {"raw": str(data)}
@@ -0,0 +1,255 @@
+"""Write-behind batching of run events into the event store"""
+
+import asyncio
+import contextlib
+import os
+from collections import deque
+
+import structlog
+from sqlalchemy.exc import DBAPIError
+
+from ..core.sse import EncodedEvent
+from .event_store import event_store
+
+logger = structlog.getLogger(__name__)
+
+# Persist events from a background writer instead of one INSERT per event
+EVENT_WRITE_BEHIND = os.getenv("EVENT_WRITE_BEHIND", "true").lower() == "true"
+# Maximum number of events written by one multi-row INSERT
+DEFAULT_BATCH_SIZE = int(os.getenv("EVENT_WRITER_BATCH_SIZE", "256"))
+# How long a partial batch waits for more events before it is written
+DEFAULT_FLUSH_MS = float(os.getenv("EVENT_WRITER_FLUSH_MS", "50"))
+# Queued events at which producers block until the database catches up
+DEFAULT_MAX_PENDING = int(os.getenv("EVENT_WRITER_MAX_PENDING", "10000"))
+# How long a flush barrier waits for pending events to be written
+DEFAULT_FLUSH_TIMEOUT = float(os.getenv("EVENT_WRITER_FLUSH_TIMEOUT", "30"))
+# Failed writes of a batch before it is split to find rows the database rejects
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("EVENT_WRITER_MAX_ATTEMPTS", "3"))
+
+RETRY_MAX_DELAY = 5.0
+# SQLSTATE classes of errors caused by the rows themselves: data exceptions
+# (e.g. \u0000 in JSONB), integrity violations and exceeded limits
+REJECTED_ROW_CLASSES = frozenset({"22", "23", "54"})
+
+Batch = list[tuple[int, str, EncodedEvent]]
+
+
+def _rejects_rows(error: Exception) -> bool:
+    """Check if a write failed because of its rows rather than the database"""
+    if isinstance(error, DBAPIError):
+        sqlstate = getattr(error.orig, "sqlstate", None) or ""
+        return sqlstate[:2] in REJECTED_ROW_CLASSES
+    # Errors raised while building the rows (e.g. encoding them); anything
+    # else, like a lost connection, is retried
+    return isinstance(error, ValueError | TypeError)
+
+
+class EventWriter:
+    """Per-process write-behind queue for run events.
+
+    Events are queued in publish order and written by a single background
+    task in batches of up to ``batch_size`` rows, or after ``flush_ms`` when
+    fewer are pending. A failed batch is retried before anything queued
+    after it and inserts ignore rows already present, so every run's events
+    are persisted in order at least once. A batch still failing after
+    ``max_attempts`` is written in halves down to single rows, and rows the
+    database rejects (poison rows) are logged and dropped so they can't
+    block every event queued behind them. Producers block once
+    ``max_pending`` events are queued, and ``flush`` is a barrier that waits
+    until a run's queued events are durable.
+    """
+
+    def __init__(
+        self,
+        batch_size: int | None = None,
+        flush_ms: float | None = None,
+        max_pending: int | None = None,
+        flush_timeout: float | None = None,
+        max_attempts: int | None = None,
+    ) -> None:
+        self.batch_size = max(1, batch_size or DEFAULT_BATCH_SIZE)
+        self.flush_ms = DEFAULT_FLUSH_MS if flush_ms is None else flush_ms
+        self.max_pending = max(self.batch_size, max_pending or DEFAULT_MAX_PENDING)
+        self.flush_timeout = (
+            DEFAULT_FLUSH_TIMEOUT if flush_timeout is None else flush_timeout
+        )
+        self.max_attempts = max(1, max_attempts or DEFAULT_MAX_ATTEMPTS)
+        # Queued (ticket, run_id, event); tickets increase in enqueue order
+        self._queue: deque[tuple[int, str, EncodedEvent]] = deque()
+        self._last_ticket = 0
+        # Every event with a ticket up to this one has been written
+        self._written_ticket = 0
+        # Highest ticket a flush barrier is waiting for
+        self._flush_ticket = 0
+        # Last queued ticket of each run with events still pending
+        self._run_tickets: dict[str, int] = {}
+        self._changed: asyncio.Condition | None = None
+        self._task: asyncio.Task | None = None
+        self.batches_written = 0
+        self.events_written = 0
+        self.write_errors = 0
+        self.events_dropped = 0
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Start the background writer task"""
+        if not EVENT_WRITE_BEHIND or self.is_running():
+            return
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        """Write all pending events, then stop the writer task"""
+        if not self.is_running():
+            return
+        await self.flush()
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def enqueue(self, run_id: str, event: EncodedEvent) -> None:
+        """Queue an event for persistence, writing it inline if not running"""
+        if not self.is_running():
+            await event_store.store_encoded_event(run_id, event)
+            return
+
+        async with self._changed:
+            if len(self._queue) >= self.max_pending:
+                # Backpressure: hold the producer until the database catches up
+                await self._changed.wait_for(
+                    lambda: len(self._queue) < self.max_pending
+                )
+            self._last_ticket += 1
+            self._queue.append((self._last_ticket, run_id, event))
+            self._run_tickets[run_id] = self._last_ticket
+            self._changed.notify_all()
+
+    async def flush(self, run_id: str | None = None) -> bool:
+        """Wait until queued events (of one run, or all) are persisted.
+
+        Returns False if they were not written within ``flush_timeout``.
+        """
+        if not self.is_running():
+            return True
+        target = self._last_ticket if run_id is None else self._run_tickets.get(run_id)
+        if not target or target <= self._written_ticket:
+            return True
+
+        async def written() -> None:
+            async with self._changed:
+                self._flush_ticket = max(self._flush_ticket, target)
+                self._changed.notify_all()
+                await self._changed.wait_for(lambda: self._written_ticket >= target)
+
+        try:
+            await asyncio.wait_for(written(), self.flush_timeout)
+            return True
+        except TimeoutError:
+            logger.warning(
+                f"Timed out after {self.flush_timeout}s waiting for events of "
+                f"run {run_id or '*'} to be persisted"
+            )
+            return False
+
+    def get_stats(self) -> dict[str, int]:
+        """Queue depth and write counters, for monitoring"""
+        return {
+            "pending_events": len(self._queue),
+            "pending_runs": len(self._run_tickets),
+            "batches_written": self.batches_written,
+            "events_written": self.events_written,
+            "write_errors": self.write_errors,
+            "events_dropped": self.events_dropped,
+        }
+
+    def _batch_ready(self) -> bool:
+        return (
+            len(self._queue) >= self.batch_size
+            or self._flush_ticket > self._written_ticket
+        )
+
+    async def _write_isolating(self, batch: Batch) -> int:
+        """Write a batch in ever smaller parts, dropping rejected rows.
+
+        Returns how many rows were dropped. Transient errors propagate so
+        the batch is retried as a whole.
+        """
+        try:
+            await event_store.store_encoded_events(
+                [(run_id, event) for _, run_id, event in batch]
+            )
+            return 0
+        except Exception as e:
+            if not _rejects_rows(e):
+                raise
+            if len(batch) == 1:
+                _, run_id, event = batch[0]
+                logger.error(
+                    f"Dropping event {event.id} of run {run_id} rejected by "
+                    f"the database: {e}"
+                )
+                return 1
+        half = len(batch) // 2
+        return await self._write_isolating(batch[:half]) + await self._write_isolating(
+            batch[half:]
+        )
+
+    async def _write_loop(self) -> None:
+        delay = 0.1
+        attempts = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: bool(self._queue))
+                if not self._batch_ready():
+                    # Linger so a burst of events shares one INSERT
+                    with contextlib.suppress(TimeoutError):
+                        await asyncio.wait_for(
+                            self._changed.wait_for(self._batch_ready),
+                            self.flush_ms / 1000,
+                        )
+                batch = [
+                    self._queue[i]
+                    for i in range(min(self.batch_size, len(self._queue)))
+                ]
+
+            dropped = 0
+            try:
+                if attempts < self.max_attempts:
+                    await event_store.store_encoded_events(
+                        [(run_id, event) for _, run_id, event in batch]
+                    )
+                else:
+                    # Keeps failing: find and drop the rows that can't be written
+                    dropped = await self._write_isolating(batch)
+            except Exception as e:
+                # Retry the same batch so later events never overtake it
+                attempts += 1
+                self.write_errors += 1
+                logger.error(
+                    f"Failed to persist {len(batch)} run events, retrying in "
+                    f"{delay:.1f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+                continue
+            attempts = 0
+            delay = 0.1
+
+            async with self._changed:
+                for _ in batch:
+                    self._queue.popleft()
+                self._written_ticket = batch[-1][0]
+                for ticket, run_id, _ in batch:
+                    if self._run_tickets.get(run_id) == ticket:
+                        del self._run_tickets[run_id]
+                self.batches_written += 1
+                self.events_written += len(batch) - dropped
+                self.events_dropped += dropped
+                self._changed.notify_all()
+
+
+# Global event writer instance
+event_writer = EventWriter()
@@ -0,0 +1,411 @@
+"""Cross-process event broker backed by Postgres LISTEN/NOTIFY"""
+
+import asyncio
+import contextlib
+import dataclasses
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any
+from uuid import uuid4
+
+import asyncpg
+import structlog
+from sqlalchemy import text
+
+from ..core.database import db_manager
+from ..core.sse import EncodedEvent, SSEEvent
+from ..utils import extract_event_sequence
+from .broker import BrokerManager, RunBroker, RunStreamState
+from .event_converter import EventConverter
+from .event_store import event_store
+
+logger = structlog.getLogger(__name__)
+converter = EventConverter()
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_BYTES = 7900
+# Runs finished elsewhere remembered for late local subscribers (bounds memory)
+MAX_FINISHED_RUNS = 10_000
+
+
+def event_to_wire(event_id: str, payload: Any) -> dict[str, Any]:
+    """Convert a broker payload into the JSON form sent with NOTIFY.
+
+    Receivers only stream events live, so only the SSE frame is sent.
+    """
+    if not isinstance(payload, EncodedEvent):
+        payload = converter.encode_raw_event(event_id, payload)
+    return {"m": payload.mode, "f": payload.frame}
+
+
+def _split_frame(frame: str, budget: int) -> list[str]:
+    """Split a frame into pieces whose JSON string form fits ``budget`` bytes"""
+    pieces = []
+    start = 0
+    while start < len(frame):
+        size = budget
+        # JSON escapes (ASCII only) may expand a piece; halve until it fits
+        while size > 1 and len(json.dumps(frame[start : start + size])) > budget:
+            size //= 2
+        pieces.append(frame[start : start + size])
+        start += size
+    return pieces
+
+
+def event_from_wire(event_id: str, data: dict[str, Any]) -> EncodedEvent:
+    """Rebuild a broker payload received with NOTIFY"""
+    return EncodedEvent(event_id, data["m"], data["f"])
+
+
+def stored_event_to_encoded(stored_event: SSEEvent) -> EncodedEvent:
+    """Rebuild a broker payload from its persisted run_events form"""
+    return EncodedEvent(
+        stored_event.id,
+        stored_event.event,
+        converter.convert_stored_to_sse(stored_event),
+    )
+
+
+class PostgresRunBroker(RunBroker):
+    """Run broker that also publishes its events to other processes"""
+
+    def __init__(self, run_id: str, manager: "PostgresBrokerManager", **kwargs: Any):
+        super().__init__(run_id, **kwargs)
+        self._manager = manager
+        # Sequence of the latest event published with a stored form
+        self._stored_through = 0
+
+    async def put(self, event_id: str, payload: Any) -> None:
+        """Publish an event to other processes and local subscribers"""
+        if not self.finished.is_set():
+            self._manager.publish_event(
+                self.run_id, event_id, payload, stored_before=self._stored_through
+            )
+        if isinstance(payload, EncodedEvent) and payload.stored_data is not None:
+            self._stored_through = extract_event_sequence(event_id)
+        await super().put(event_id, payload)
+
+    def mark_finished(self) -> None:
+        """Mark this broker as finished here and in other processes"""
+        if not self.finished.is_set():
+            self._manager.publish_finished(self.run_id)
+        super().mark_finished()
+
+    async def put_local(self, event_id: str, payload: Any) -> None:
+        """Deliver an event received from another process to local subscribers"""
+        await self._append(event_id, payload, on_end=self.mark_finished_local)
+
+    def mark_finished_local(self) -> None:
+        """Apply a completion received from another process"""
+        RunBroker.mark_finished(self)
+
+
+class PostgresBrokerManager(BrokerManager):
+    """Broker manager sharing live run events across workers and replicas.
+
+    Every process keeps the in-memory fan-out brokers of ``BrokerManager``
+    and mirrors them through a Postgres channel: local events are sent with
+    ``pg_notify`` by a single publisher task (preserving order), and a
+    dedicated LISTEN connection feeds events of other processes into the
+    brokers that exist locally, i.e. runs someone streams here; the others
+    are dropped, since a later subscriber replays them from the store.
+    Notifications are delivered by one task per run, in order, so a slow
+    run doesn't hold up the others. Events too large for a notification are
+    sent by reference and read back from ``run_events`` when they are
+    persisted, and split over several notifications when they are not.
+    """
+
+    def __init__(self, channel: str | None = None) -> None:
+        super().__init__()
+        self.channel = channel or os.getenv("BROKER_PG_CHANNEL", "aegra_run_events")
+        # How long a receiver waits for a referenced event to be persisted
+        self.reference_timeout = float(os.getenv("BROKER_PG_REF_TIMEOUT", "5"))
+        self.origin = uuid4().hex
+        self._outbox: asyncio.Queue[str] = asyncio.Queue()
+        self._inbox: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        # Notifications waiting per run, and the task delivering each run's
+        self._backlogs: dict[str, deque[dict[str, Any]]] = {}
+        self._deliveries: dict[str, asyncio.Task] = {}
+        # Pieces received so far of the split event a run is sending
+        self._pieces: dict[str, list[str]] = {}
+        # Runs finished elsewhere (monotonic time), for late local subscribers
+        self._finished_runs: OrderedDict[str, float] = OrderedDict()
+        self._dropped_total = 0
+
+    def _create_broker(self, run_id: str) -> PostgresRunBroker:
+        return PostgresRunBroker(run_id, self, budget=self._budget)
+
+    def get_or_create_state(self, run_id: str) -> RunStreamState:
+        """Get or create a run's stream state, finished if it ended elsewhere"""
+        created = self.get_state(run_id) is None
+        state = super().get_or_create_state(run_id)
+        if created and self._finished_elsewhere(run_id):
+            # Its completion was dropped while nobody here streamed it
+            state.broker.mark_finished_local()
+        return state
+
+    def _finished_elsewhere(self, run_id: str) -> bool:
+        finished_at = self._finished_runs.get(run_id)
+        return (
+            finished_at is not None and time.monotonic() - finished_at < self.state_ttl
+        )
+
+    def _remember_finished(self, run_id: str) -> None:
+        now = time.monotonic()
+        self._finished_runs[run_id] = now
+        self._finished_runs.move_to_end(run_id)
+        while self._finished_runs:
+            oldest, finished_at = next(iter(self._finished_runs.items()))
+            if (
+                now - finished_at < self.state_ttl
+                and len(self._finished_runs) <= MAX_FINISHED_RUNS
+            ):
+                break
+            del self._finished_runs[oldest]
+
+    def publish_event(
+        self,
+        run_id: str,
+        event_id: str,
+        payload: Any,
+        stored_before: int | None = None,
+    ) -> None:
+        """Queue an event notification for other processes.
+
+        ``stored_before`` is the latest event of the run persisted before
+        this one, which receivers replaying a gap must find in the store.
+        """
+        message: dict[str, Any] = {"o": self.origin, "r": run_id, "e": event_id}
+        if stored_before is not None:
+            message["s"] = stored_before
+        try:
+            if not isinstance(payload, EncodedEvent):
+                payload = converter.encode_raw_event(event_id, payload)
+            encoded = json.dumps(
+                {**message, "p": event_to_wire(event_id, payload)},
+                separators=(",", ":"),
+            )
+        except Exception as e:
+            logger.warning(f"Failed to encode event {event_id} for NOTIFY: {e}")
+            encoded = None
+        if encoded is not None and len(encoded.encode()) <= MAX_NOTIFY_BYTES:
+            self._outbox.put_nowait(encoded)
+        elif encoded is None or payload.stored_data is not None:
+            # Persisted: receivers load the payload from run_events instead
+            self._outbox.put_nowait(
+                json.dumps({**message, "ref": True}, separators=(",", ":"))
+            )
+        else:
+            # Never persisted, so it can only be sent inline, in pieces
+            self._publish_pieces(message, payload)
+
+    def _publish_pieces(self, message: dict[str, Any], event: EncodedEvent) -> None:
+        header = {**message, "m": event.mode, "i": 0, "n": 0}
+        overhead = len(json.dumps({**header, "c": ""}, separators=(",", ":")))
+        # Room for the piece counters' digits
+        pieces = _split_frame(event.frame or "", MAX_NOTIFY_BYTES - overhead - 20)
+        for index, piece in enumerate(pieces):
+            self._outbox.put_nowait(
+                json.dumps(
+                    {**header, "i": index, "n": len(pieces), "c": piece},
+                    separators=(",", ":"),
+                )
+            )
+
+    def publish_finished(self, run_id: str) -> None:
+        """Queue a run completion notification for other processes"""
+        self._outbox.put_nowait(
+            json.dumps(
+                {"o": self.origin, "r": run_id, "f": True}, separators=(",", ":")
+            )
+        )
+
+    async def start_cleanup_task(self) -> None:
+        """Start cleanup plus the NOTIFY publisher and LISTEN receiver tasks"""
+        await super().start_cleanup_task()
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._publish_loop()),
+                asyncio.create_task(self._listen_loop()),
+                asyncio.create_task(self._dispatch_loop()),
+            ]
+
+    async def stop_cleanup_task(self) -> None:
+        """Stop cleanup and the LISTEN/NOTIFY and delivery tasks"""
+        await super().stop_cleanup_task()
+        tasks = [*self._tasks, *self._deliveries.values()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    async def _publish_loop(self) -> None:
+        """Send queued notifications in order, batching per transaction"""
+        while True:
+            batch = [await self._outbox.get()]
+            while not self._outbox.empty() and len(batch) < 100:
+                batch.append(self._outbox.get_nowait())
+            try:
+                engine = db_manager.get_engine()
+                async with engine.begin() as conn:
+                    for message in batch:
+                        await conn.execute(
+                            text("SELECT pg_notify(:channel, :payload)"),
+                            {"channel": self.channel, "payload": message},
+                        )
+            except Exception as e:
+                logger.error(
+                    f"Failed to publish {len(batch)} broker notifications: {e}"
+                )
+
+    async def _listen_loop(self) -> None:
+        """Keep a dedicated LISTEN connection open, reconnecting on loss"""
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(db_manager.get_dsn())
+                closed = asyncio.get_running_loop().create_future()
+                conn.add_termination_listener(
+                    lambda _conn, closed=closed: (
+                        closed.done() or closed.set_result(None)
+                    )
+                )
+                await conn.add_listener(self.channel, self._on_notification)
+                logger.info(f"Listening for broker events on channel {self.channel}")
+                await closed
+                logger.warning("Broker LISTEN connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broker LISTEN connection failed: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    with contextlib.suppress(Exception):
+                        await conn.close()
+            await asyncio.sleep(1)
+
+    def _on_notification(
+        self, _conn: Any, _pid: int, _channel: str, payload: str
+    ) -> None:
+        self._inbox.put_nowait(payload)
+
+    async def _dispatch_loop(self) -> None:
+        """Deliver notifications from other processes to local brokers in order"""
+        while True:
+            payload = await self._inbox.get()
+            try:
+                await self._dispatch(payload)
+            except Exception as e:
+                logger.error(f"Failed to dispatch broker notification: {e}")
+
+    async def _dispatch(self, payload: str) -> None:
+        """Hand a notification to its run's delivery task"""
+        message = json.loads(payload)
+        if message.get("o") == self.origin:
+            return
+
+        run_id = message["r"]
+        if message.get("f"):
+            self._remember_finished(run_id)
+        if self.get_broker(run_id) is None:
+            # Nobody streams the run here; later subscribers replay the store
+            self._dropped_total += 1
+            return
+        backlog = self._backlogs.get(run_id)
+        if backlog is None:
+            backlog = self._backlogs[run_id] = deque()
+            self._deliveries[run_id] = asyncio.create_task(
+                self._deliver(run_id, backlog)
+            )
+        backlog.append(message)
+
+    async def _deliver(self, run_id: str, backlog: deque[dict[str, Any]]) -> None:
+        """Deliver a run's notifications in order until its backlog is empty"""
+        try:
+            while backlog:
+                message = backlog.popleft()
+                try:
+                    await self._deliver_message(run_id, message)
+                except Exception as e:
+                    logger.error(
+                        f"Failed to deliver broker notification of run {run_id}: {e}"
+                    )
+        finally:
+            del self._backlogs[run_id]
+            del self._deliveries[run_id]
+
+    async def _deliver_message(self, run_id: str, message: dict[str, Any]) -> None:
+        broker = self.get_broker(run_id)
+        if broker is None:
+            return
+        if message.get("f"):
+            self._pieces.pop(run_id, None)
+            broker.mark_finished_local()
+            return
+
+        event_id = message["e"]
+        if "c" in message:
+            event = self._join_pieces(run_id, event_id, message)
+            if event is None:
+                return
+        elif message.get("ref"):
+            event = await self._resolve_reference(event_id)
+            if event is None:
+                logger.warning(
+                    f"Referenced event {event_id} of run {run_id} was not persisted "
+                    f"within {self.reference_timeout}s, skipping"
+                )
+                return
+        else:
+            event = event_from_wire(event_id, message["p"])
+        if "s" in message:
+            event = dataclasses.replace(event, stored_before=message["s"])
+        await broker.put_local(event_id, event)
+
+    def _join_pieces(
+        self, run_id: str, event_id: str, message: dict[str, Any]
+    ) -> EncodedEvent | None:
+        """Collect the pieces of a split event, returning it once complete"""
+        if message["i"] == 0:
+            self._pieces[run_id] = []
+        pieces = self._pieces.get(run_id)
+        if pieces is None or len(pieces) != message["i"]:
+            # Its first pieces were sent before anyone here streamed the run
+            self._pieces.pop(run_id, None)
+            return None
+        pieces.append(message["c"])
+        if len(pieces) < message["n"]:
+            return None
+        del self._pieces[run_id]
+        return EncodedEvent(event_id, message["m"], "".join(pieces))
+
+    def get_stats(self) -> dict[str, Any]:
+        """Broker occupancy plus notifications dropped and being delivered"""
+        return {
+            **super().get_stats(),
+            "notifications_dropped": self._dropped_total,
+            "runs_delivering": len(self._deliveries),
+        }
+
+    async def _resolve_reference(self, event_id: str) -> EncodedEvent | None:
+        """Load a referenced event from run_events.
+
+        The publishing process persists each event right after broadcasting
+        it, so the row may briefly lag behind the notification.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.reference_timeout
+        delay = 0.01
+        while True:
+            stored = await event_store.get_event(event_id)
+            if stored is not None:
+                return stored_event_to_encoded(stored)
+            if loop.time() >= deadline:
+                return None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
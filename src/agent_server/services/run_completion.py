@@ -0,0 +1,176 @@
+"""Notifications of runs reaching a terminal status, across processes"""
+
+import asyncio
+import contextlib
+import json
+import os
+from collections import Counter
+from typing import Any
+
+import asyncpg
+import structlog
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.database import db_manager
+from ..core.orm import Run as RunORM
+from ..core.orm import _get_session_maker
+
+logger = structlog.getLogger(__name__)
+
+# NOTIFY channel announcing runs that reached a terminal status
+RUN_COMPLETION_CHANNEL = os.getenv("RUN_COMPLETION_CHANNEL", "aegra_run_done")
+# Seconds GET .../runs/{run_id}/join waits before returning the current output
+RUN_JOIN_TIMEOUT = float(os.getenv("RUN_JOIN_TIMEOUT", "30"))
+# Seconds POST .../runs/wait waits before returning the current output
+RUN_WAIT_TIMEOUT = float(os.getenv("RUN_WAIT_TIMEOUT", "300"))
+
+TERMINAL_STATUSES = frozenset({"completed", "failed", "cancelled", "interrupted"})
+
+
+class RunCompletion:
+    """Lets any process await a run reaching a terminal status.
+
+    Waiters in this process share one future per run. The terminal status is
+    announced with NOTIFY in the transaction that stores it, so every process
+    LISTENing on the channel resolves its futures as soon as it commits, no
+    matter which process executed the run. Waiters register before reading
+    the run's status, and waiters are re-checked against the database after
+    the LISTEN connection is (re)established, so no completion is missed.
+    """
+
+    def __init__(self, channel: str | None = None) -> None:
+        self.channel = channel or RUN_COMPLETION_CHANNEL
+        self._futures: dict[str, asyncio.Future[str]] = {}
+        self._waiters: Counter[str] = Counter()
+        self._listener: asyncio.Task | None = None
+        self._notified_total = 0
+
+    async def start(self) -> None:
+        """Start listening for completions announced by any process"""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen_loop())
+
+    async def stop(self) -> None:
+        """Stop listening; waiters fall back to their timeouts"""
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+
+    async def notify(self, session: AsyncSession, run_id: str, status: str) -> None:
+        """Announce a terminal status once the session's transaction commits"""
+        if status in TERMINAL_STATUSES:
+            await session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {
+                    "channel": self.channel,
+                    "payload": json.dumps({"run_id": run_id, "status": status}),
+                },
+            )
+
+    def resolve(self, run_id: str, status: str) -> None:
+        """Wake this process's waiters for a run that reached ``status``"""
+        if status not in TERMINAL_STATUSES:
+            return
+        future = self._futures.get(run_id)
+        if future is not None and not future.done():
+            future.set_result(status)
+
+    async def wait(self, run_id: str, timeout: float) -> str | None:
+        """Wait up to ``timeout`` seconds for a run's terminal status.
+
+        Returns the status, or None if the run is still active (or gone) when
+        the timeout expires. The run itself is never cancelled.
+        """
+        future = self._futures.get(run_id)
+        if future is None or future.done():
+            future = asyncio.get_running_loop().create_future()
+            self._futures[run_id] = future
+        self._waiters[run_id] += 1
+        try:
+            # Registered first, so a run ending right after this read still wakes us
+            status = await self._fetch_status(run_id)
+            if status is None or status in TERMINAL_STATUSES:
+                return status
+            await asyncio.wait({future}, timeout=timeout)
+            return future.result() if future.done() else None
+        finally:
+            self._waiters[run_id] -= 1
+            if not self._waiters[run_id]:
+                del self._waiters[run_id]
+                if self._futures.get(run_id) is future:
+                    del self._futures[run_id]
+
+    async def _fetch_status(self, run_id: str) -> str | None:
+        maker = _get_session_maker()
+        async with maker() as session:
+            return await session.scalar(
+                select(RunORM.status).where(RunORM.run_id == run_id)
+            )
+
+    async def _resolve_from_db(self) -> None:
+        """Resolve waiters whose runs ended while no notification could arrive"""
+        run_ids = list(self._futures)
+        if not run_ids:
+            return
+        maker = _get_session_maker()
+        async with maker() as session:
+            result = await session.execute(
+                select(RunORM.run_id, RunORM.status).where(RunORM.run_id.in_(run_ids))
+            )
+            for run_id, status in result.all():
+                self.resolve(run_id, status)
+
+    def _on_notification(
+        self, _conn: Any, _pid: int, _channel: str, payload: str
+    ) -> None:
+        try:
+            message = json.loads(payload)
+            run_id, status = message["run_id"], message["status"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed run completion: {payload!r}")
+            return
+        self._notified_total += 1
+        self.resolve(run_id, status)
+
+    async def _listen_loop(self) -> None:
+        """Keep a dedicated LISTEN connection open, reconnecting on loss"""
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(db_manager.get_dsn())
+                closed = asyncio.get_running_loop().create_future()
+                conn.add_termination_listener(
+                    lambda _conn, closed=closed: (
+                        closed.done() or closed.set_result(None)
+                    )
+                )
+                await conn.add_listener(self.channel, self._on_notification)
+                # Runs that ended while disconnected were not announced to us
+                await self._resolve_from_db()
+                await closed
+                logger.warning("Run completion LISTEN connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Run completion LISTEN connection failed: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    with contextlib.suppress(Exception):
+                        await conn.close()
+            await asyncio.sleep(1)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Runs being waited on and completion notifications received"""
+        return {
+            "listening": self._listener is not None and not self._listener.done(),
+            "awaited_runs": len(self._futures),
+            "waiters": sum(self._waiters.values()),
+            "notified_total": self._notified_total,
+        }
+
+
+# Global run completion instance
+run_completion = RunCompletion()
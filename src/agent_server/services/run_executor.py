@@ -0,0 +1,414 @@
+"""Bounded, fair execution of background runs with admission control"""
+
+import asyncio
+import os
+import time
+from collections import Counter, deque
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+import structlog
+
+logger = structlog.getLogger(__name__)
+
+# Runs executing concurrently in this process
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("RUN_MAX_CONCURRENCY", "32"))
+# Runs waiting for a slot before new ones are rejected with 429
+DEFAULT_MAX_QUEUE = int(os.getenv("RUN_MAX_QUEUE", "256"))
+
+
+def _parse_limits(value: str, name: str) -> dict[str, float]:
+    """Parse ``key=number`` pairs separated by commas"""
+    limits: dict[str, float] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, _, number = item.rpartition("=")
+        try:
+            if not key.strip():
+                raise ValueError(item)
+            limits[key.strip()] = float(number)
+        except ValueError:
+            logger.warning(f"Ignoring invalid {name} entry: {item!r}")
+    return limits
+
+
+@dataclass(frozen=True, slots=True)
+class SchedulingPolicy:
+    """Per-user and per-assistant concurrency quotas and per-user weights.
+
+    A quota of 0 means unlimited. Assistant quotas are keyed by assistant
+    id or graph id. A user's weight sets its share of the execution slots
+    relative to other users with queued runs.
+    """
+
+    user_limit: int = 0
+    user_limits: Mapping[str, int] = field(default_factory=dict)
+    assistant_limit: int = 0
+    assistant_limits: Mapping[str, int] = field(default_factory=dict)
+    weights: Mapping[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> "SchedulingPolicy":
+        """Build the policy from the RUN_* quota and weight settings"""
+        return cls(
+            user_limit=int(os.getenv("RUN_USER_MAX_CONCURRENCY", "0")),
+            user_limits={
+                key: int(limit)
+                for key, limit in _parse_limits(
+                    os.getenv("RUN_USER_QUOTAS", ""), "RUN_USER_QUOTAS"
+                ).items()
+            },
+            assistant_limit=int(os.getenv("RUN_ASSISTANT_MAX_CONCURRENCY", "0")),
+            assistant_limits={
+                key: int(limit)
+                for key, limit in _parse_limits(
+                    os.getenv("RUN_ASSISTANT_QUOTAS", ""), "RUN_ASSISTANT_QUOTAS"
+                ).items()
+            },
+            weights={
+                key: weight
+                for key, weight in _parse_limits(
+                    os.getenv("RUN_USER_WEIGHTS", ""), "RUN_USER_WEIGHTS"
+                ).items()
+                if weight > 0
+            },
+        )
+
+    def user_quota(self, user_id: str | None) -> int:
+        return self.user_limits.get(user_id or "", self.user_limit)
+
+    def assistant_quota_key(
+        self, assistant_id: str | None, graph_id: str | None
+    ) -> str:
+        """The key a run's assistant quota is counted under.
+
+        Runs of every assistant of a graph with a graph id quota share it.
+        """
+        if (
+            assistant_id not in self.assistant_limits
+            and graph_id in self.assistant_limits
+        ):
+            return graph_id
+        return assistant_id or ""
+
+    def assistant_quota(self, assistant_id: str | None, graph_id: str | None) -> int:
+        return self.assistant_limits.get(
+            self.assistant_quota_key(assistant_id, graph_id), self.assistant_limit
+        )
+
+    def weight(self, user_id: str | None) -> float:
+        return self.weights.get(user_id or "", 1.0)
+
+
+class RunQueueFullError(Exception):
+    """Raised when a run cannot be admitted because the queue is full"""
+
+    def __init__(self, queued: int, max_queue: int, retry_after: int):
+        super().__init__(
+            f"Run queue is full ({queued}/{max_queue} runs waiting), retry later"
+        )
+        self.retry_after = retry_after
+
+
+class _QueuedRun:
+    """A submitted run waiting for (or holding) an execution slot"""
+
+    __slots__ = (
+        "run_id",
+        "user_id",
+        "assistant_id",
+        "graph_id",
+        "admitted",
+        "enqueued_at",
+    )
+
+    def __init__(
+        self,
+        run_id: str,
+        user_id: str,
+        assistant_id: str | None = None,
+        graph_id: str | None = None,
+    ):
+        self.run_id = run_id
+        self.user_id = user_id
+        self.assistant_id = assistant_id
+        self.graph_id = graph_id
+        self.admitted: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class _TenantStats:
+    """Queue wait times of one user's runs"""
+
+    __slots__ = ("admitted", "wait_total", "wait_max")
+
+    def __init__(self) -> None:
+        self.admitted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class RunExecutor:
+    """Runs at most ``max_concurrency`` runs at once, queueing the rest.
+
+    Every submitted run gets its task immediately, so it can be awaited and
+    cancelled as before, but its coroutine is only created once a slot is
+    free; until then the run stays ``pending``. Callers check
+    ``ensure_capacity`` before creating a run so a full queue is rejected
+    before anything is persisted.
+
+    Queued runs wait in one FIFO queue per user. Free slots go to the user
+    with the lowest virtual start time (start-time fair queueing), which
+    advances by ``1 / weight`` per admitted run, so busy users share slots
+    in proportion to their weights and a user cannot bank credit while idle.
+    When no run is left, the clock moves to the latest finish tag. Idle users
+    are forgotten, stats included, once the clock passes their finish tag,
+    which then no longer affects their start time.
+    Runs over their user's or assistant's quota are skipped until a run of
+    that user or assistant finishes.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        max_queue: int | None = None,
+        policy: SchedulingPolicy | None = None,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency or DEFAULT_MAX_CONCURRENCY)
+        self.max_queue = DEFAULT_MAX_QUEUE if max_queue is None else max_queue
+        self.policy = policy or SchedulingPolicy.from_env()
+        self._queues: dict[str, deque[_QueuedRun]] = {}
+        self._queued: dict[str, asyncio.Task] = {}
+        self._running = 0
+        self._running_users: Counter[str] = Counter()
+        self._running_assistants: Counter[str] = Counter()
+        # Start-time fair queueing: per-user finish tags and the virtual clock
+        self._finish: dict[str, float] = {}
+        self._clock = 0.0
+        self._tenants: dict[str, _TenantStats] = {}
+        self._admitted_total = 0
+        self._rejected_total = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._queued)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def ensure_capacity(self) -> None:
+        """Raise RunQueueFullError if a new run would exceed the queue limit"""
+        if self.queued < self.max_queue or (
+            self._running < self.max_concurrency and not self.queued
+        ):
+            return
+        self._rejected_total += 1
+        raise RunQueueFullError(self.queued, self.max_queue, self._retry_after())
+
+    def submit(
+        self,
+        run_id: str,
+        run: Callable[[], Awaitable[Any]],
+        user_id: str = "",
+        assistant_id: str | None = None,
+        graph_id: str | None = None,
+    ) -> asyncio.Task:
+        """Schedule a run, creating its coroutine once it gets a slot"""
+        entry = _QueuedRun(run_id, user_id, assistant_id, graph_id)
+        task = asyncio.create_task(self._execute(entry, run))
+        self._queues.setdefault(user_id, deque()).append(entry)
+        self._queued[run_id] = task
+        self._dispatch()
+        if not entry.admitted.done():
+            logger.info(
+                f"Run {run_id} queued for execution "
+                f"({self.queued} queued, {self._running} running)"
+            )
+        return task
+
+    def cancel_queued(self, run_id: str) -> bool:
+        """Cancel a run that has not started yet, returning whether it was queued"""
+        task = self._queued.get(run_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def _execute(
+        self, entry: _QueuedRun, run: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        try:
+            await entry.admitted
+        except asyncio.CancelledError:
+            self._queued.pop(entry.run_id, None)
+            if entry.admitted.done() and not entry.admitted.cancelled():
+                # Admitted, but cancelled before it could start
+                self._release(entry)
+            raise
+        try:
+            return await run()
+        finally:
+            self._release(entry)
+
+    def _eligible(self, entry: _QueuedRun) -> bool:
+        """Check if a run is within its user's and assistant's quotas"""
+        user_quota = self.policy.user_quota(entry.user_id)
+        if user_quota and self._running_users[entry.user_id] >= user_quota:
+            return False
+        assistant_quota = self.policy.assistant_quota(
+            entry.assistant_id, entry.graph_id
+        )
+        return not (
+            assistant_quota
+            and self._running_assistants[self._assistant_key(entry)] >= assistant_quota
+        )
+
+    def _assistant_key(self, entry: _QueuedRun) -> str:
+        return self.policy.assistant_quota_key(entry.assistant_id, entry.graph_id)
+
+    def _next(self) -> tuple[float, _QueuedRun] | None:
+        """The eligible run with the lowest virtual start time, and that time"""
+        best: tuple[float, float, _QueuedRun] | None = None
+        for user_id, queue in list(self._queues.items()):
+            while queue and queue[0].admitted.done():
+                # Cancelled while queued
+                queue.popleft()
+            if not queue:
+                del self._queues[user_id]
+                continue
+            entry = next(
+                (e for e in queue if not e.admitted.done() and self._eligible(e)), None
+            )
+            if entry is None:
+                continue
+            start = max(self._finish.get(user_id, 0.0), self._clock)
+            if best is None or (start, entry.enqueued_at) < best[:2]:
+                best = (start, entry.enqueued_at, entry)
+        return None if best is None else (best[0], best[2])
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued runs in fair order"""
+        while self._running < self.max_concurrency:
+            picked = self._next()
+            if picked is None:
+                break
+            start, entry = picked
+            self._queues[entry.user_id].remove(entry)
+            self._clock = start
+            self._finish[entry.user_id] = start + 1 / self.policy.weight(entry.user_id)
+            self._admit(entry)
+        if not self._running and not self._queued and self._finish:
+            # A busy period ended: the clock moves past every finish tag
+            self._clock = max(self._clock, *self._finish.values())
+        self._forget_idle_users()
+
+    def _forget_idle_users(self) -> None:
+        """Drop the state of users with no runs whose finish tag has passed"""
+        idle = [
+            user_id
+            for user_id, finish in self._finish.items()
+            if finish <= self._clock
+            and user_id not in self._queues
+            and not self._running_users[user_id]
+        ]
+        for user_id in idle:
+            del self._finish[user_id]
+            self._tenants.pop(user_id, None)
+
+    def _admit(self, entry: _QueuedRun) -> None:
+        wait = time.monotonic() - entry.enqueued_at
+        self._running += 1
+        self._running_users[entry.user_id] += 1
+        self._running_assistants[self._assistant_key(entry)] += 1
+        self._admitted_total += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        tenant = self._tenants.setdefault(entry.user_id, _TenantStats())
+        tenant.admitted += 1
+        tenant.wait_total += wait
+        tenant.wait_max = max(tenant.wait_max, wait)
+        self._queued.pop(entry.run_id, None)
+        entry.admitted.set_result(None)
+        if wait >= 1.0:
+            logger.info(f"Run {entry.run_id} waited {wait:.1f}s for an execution slot")
+
+    def _release(self, entry: _QueuedRun) -> None:
+        self._running -= 1
+        self._running_users[entry.user_id] -= 1
+        if not self._running_users[entry.user_id]:
+            del self._running_users[entry.user_id]
+        assistant = self._assistant_key(entry)
+        self._running_assistants[assistant] -= 1
+        if not self._running_assistants[assistant]:
+            del self._running_assistants[assistant]
+        self._dispatch()
+
+    def _retry_after(self) -> int:
+        """Seconds a rejected client should wait, from the observed queue wait"""
+        average = self._wait_total / self._admitted_total if self._admitted_total else 0
+        return max(1, round(average))
+
+    def _tenant_stats(self, now: float) -> dict[str, dict[str, Any]]:
+        """Queue depth, running runs and queue wait times per user"""
+        waiting: dict[str, list[_QueuedRun]] = {
+            user_id: [e for e in queue if not e.admitted.done()]
+            for user_id, queue in self._queues.items()
+        }
+        users = set(self._tenants) | set(self._running_users) | set(waiting)
+        stats = {}
+        for user_id in sorted(users):
+            tenant = self._tenants.get(user_id) or _TenantStats()
+            queued = waiting.get(user_id, [])
+            stats[user_id] = {
+                "running": self._running_users[user_id],
+                "queued": len(queued),
+                "oldest_queued_seconds": round(now - queued[0].enqueued_at, 3)
+                if queued
+                else 0.0,
+                "admitted_total": tenant.admitted,
+                "avg_wait_seconds": round(tenant.wait_total / tenant.admitted, 3)
+                if tenant.admitted
+                else 0.0,
+                "max_wait_seconds": round(tenant.wait_max, 3),
+            }
+        return stats
+
+    def get_stats(self) -> dict[str, Any]:
+        """Concurrency, queue depth and queue wait times, overall and per user"""
+        now = time.monotonic()
+        waiting = [
+            e for queue in self._queues.values() for e in queue if not e.admitted.done()
+        ]
+        oldest = min((e.enqueued_at for e in waiting), default=None)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "oldest_queued_seconds": round(now - oldest, 3)
+            if oldest is not None
+            else 0.0,
+            "admitted_total": self._admitted_total,
+            "rejected_total": self._rejected_total,
+            "avg_wait_seconds": round(self._wait_total / self._admitted_total, 3)
+            if self._admitted_total
+            else 0.0,
+            "max_wait_seconds": round(self._wait_max, 3),
+            "users": self._tenant_stats(now),
+            # Keyed by assistant id, or graph id for runs under a graph quota
+            "assistants": {
+                key: {"running": running}
+                for key, running in sorted(self._running_assistants.items())
+                if key
+            },
+        }
+
+
+# Global run executor instance
+run_executor = RunExecutor()
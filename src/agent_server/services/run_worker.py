@@ -0,0 +1,513 @@
+"""Out-of-process run execution by workers claiming runs from Postgres"""
+
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import socket
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import asyncpg
+import structlog
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    and_,
+    case,
+    func,
+    literal,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.database import db_manager
+from ..core.orm import Assistant as AssistantORM
+from ..core.orm import Run as RunORM
+from ..core.orm import _get_session_maker
+from .run_executor import SchedulingPolicy
+
+logger = structlog.getLogger(__name__)
+
+# Where background runs execute: `inline` in the API process, or `worker` in
+# run_worker.py processes that claim them from the runs table
+RUN_EXECUTION = os.getenv("RUN_EXECUTION", "inline").lower()
+RUN_WORKER_CHANNEL = os.getenv("RUN_WORKER_CHANNEL", "aegra_runs")
+# Runs executing at once per worker process
+RUN_WORKER_CONCURRENCY = int(os.getenv("RUN_WORKER_CONCURRENCY", "8"))
+# Seconds between claim attempts when no NOTIFY wake-up arrives
+RUN_WORKER_POLL_INTERVAL = float(os.getenv("RUN_WORKER_POLL_INTERVAL", "5"))
+# Seconds a stopping worker lets its runs finish before cancelling them
+RUN_WORKER_DRAIN_TIMEOUT = float(os.getenv("RUN_WORKER_DRAIN_TIMEOUT", "30"))
+# Seconds a claim holds without renewal; runs of dead workers are reclaimed after
+RUN_WORKER_LEASE = float(os.getenv("RUN_WORKER_LEASE", "30"))
+
+
+def executes_in_workers() -> bool:
+    """Check if runs are left to worker processes instead of executed inline"""
+    return RUN_EXECUTION == "worker"
+
+
+async def notify_workers(session: AsyncSession) -> None:
+    """Wake idle workers once the session's transaction commits"""
+    if executes_in_workers():
+        await session.execute(
+            text("SELECT pg_notify(:channel, '')"), {"channel": RUN_WORKER_CHANNEL}
+        )
+
+
+def _lookup(
+    mapping: dict[str, float], default: float, *columns: ColumnElement
+) -> ColumnElement:
+    """SQL expression mapping the first matching column value to its setting"""
+    whens = [
+        (column == key, value) for column in columns for key, value in mapping.items()
+    ]
+    return case(*whens, else_=default) if whens else literal(default)
+
+
+def _assistant_quota_key(policy: SchedulingPolicy) -> ColumnElement:
+    """SQL form of ``policy.assistant_quota_key`` over runs joined to assistants"""
+    keys = list(policy.assistant_limits)
+    if not keys:
+        return RunORM.assistant_id
+    return case(
+        (RunORM.assistant_id.in_(keys), RunORM.assistant_id),
+        (AssistantORM.graph_id.in_(keys), AssistantORM.graph_id),
+        else_=RunORM.assistant_id,
+    )
+
+
+def _lease_expired() -> ColumnElement[bool]:
+    """Running runs whose worker stopped renewing its claim (inline runs have none)"""
+    return and_(RunORM.status == "running", RunORM.lease_expires_at < func.now())
+
+
+def _lease_held() -> ColumnElement[bool]:
+    """Running runs still owned by a live worker, or executing inline"""
+    return and_(
+        RunORM.status == "running",
+        or_(RunORM.lease_expires_at.is_(None), RunORM.lease_expires_at >= func.now()),
+    )
+
+
+def _claimable_status() -> ColumnElement[bool]:
+    """Runs a worker may claim: pending ones and those of dead workers"""
+    return or_(RunORM.status == "pending", _lease_expired())
+
+
+async def pending_run_stats() -> dict[str, Any]:
+    """Pending runs and the age of the oldest one, per user"""
+    maker = _get_session_maker()
+    async with maker() as session:
+        result = await session.execute(
+            select(
+                RunORM.user_id,
+                func.count(),
+                func.extract("epoch", func.now() - func.min(RunORM.created_at)),
+            )
+            .where(RunORM.status == "pending")
+            .group_by(RunORM.user_id)
+        )
+        rows = result.all()
+    return {
+        user_id: {"pending": count, "oldest_pending_seconds": round(float(age), 3)}
+        for user_id, count, age in sorted(rows)
+    }
+
+
+async def request_cancel(run_id: str) -> None:
+    """Ask the worker executing a run to cancel it"""
+    if not executes_in_workers():
+        return
+    try:
+        engine = db_manager.get_engine()
+        async with engine.begin() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {
+                    "channel": RUN_WORKER_CHANNEL,
+                    "payload": json.dumps({"cancel": run_id}),
+                },
+            )
+    except Exception as e:
+        logger.error(f"Failed to send cancellation of run {run_id} to workers: {e}")
+
+
+class RunWorker:
+    """Claims pending runs from the runs table and executes them.
+
+    Any number of workers share the table: runs are claimed with
+    ``FOR UPDATE SKIP LOCKED``, so each run goes to exactly one worker. A
+    worker holds at most ``concurrency`` runs at once. It is woken by a
+    NOTIFY when runs are created and polls as a fallback.
+
+    A claim is a lease the worker renews while the run executes. When a
+    worker crashes or is killed, its runs stay "running" until the lease
+    expires; they then stop counting as running and are claimed (and
+    executed again) by another worker.
+
+    Claims follow the same scheduling policy as the in-process executor,
+    counted across all workers: users are served in proportion to their
+    weights, by how many runs they already have running or ahead in line,
+    and runs beyond a user's or assistant's quota are left pending.
+    """
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        poll_interval: float | None = None,
+        channel: str | None = None,
+        policy: SchedulingPolicy | None = None,
+        lease: float | None = None,
+    ) -> None:
+        self.concurrency = max(1, concurrency or RUN_WORKER_CONCURRENCY)
+        self.policy = policy or SchedulingPolicy.from_env()
+        self.poll_interval = poll_interval or RUN_WORKER_POLL_INTERVAL
+        self.channel = channel or RUN_WORKER_CHANNEL
+        self.lease = timedelta(seconds=lease or RUN_WORKER_LEASE)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._reclaimed: set[str] = set()
+        self._claimed_total = 0
+        self._reclaimed_total = 0
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    def claimable(self, limit: int) -> Select:
+        """Up to ``limit`` claimable runs, in fair order and within quotas.
+
+        A run's slot is its rank among its user's claimable runs plus the
+        user's running runs; slots divided by the user's weight order the
+        claims. The same slot per assistant quota key (the assistant, or its
+        graph under a graph id quota) is checked against the quota. Runs whose
+        lease expired are claimable and no longer count as running.
+        """
+        policy = self.policy
+        assistant_key = _assistant_quota_key(policy)
+
+        def running(key: ColumnElement) -> Any:
+            return (
+                select(key.label("key"), func.count().label("count"))
+                .select_from(RunORM)
+                .outerjoin(
+                    AssistantORM, AssistantORM.assistant_id == RunORM.assistant_id
+                )
+                .where(_lease_held())
+                .group_by(key)
+                .subquery()
+            )
+
+        user_running = running(RunORM.user_id)
+        assistant_running = running(assistant_key)
+        ranked = (
+            select(
+                RunORM.run_id,
+                RunORM.user_id,
+                RunORM.assistant_id,
+                RunORM.created_at,
+                AssistantORM.graph_id,
+                (
+                    func.row_number().over(
+                        partition_by=RunORM.user_id, order_by=RunORM.created_at
+                    )
+                    + func.coalesce(user_running.c.count, 0)
+                ).label("user_slot"),
+                (
+                    func.row_number().over(
+                        partition_by=assistant_key, order_by=RunORM.created_at
+                    )
+                    + func.coalesce(assistant_running.c.count, 0)
+                ).label("assistant_slot"),
+            )
+            .outerjoin(AssistantORM, AssistantORM.assistant_id == RunORM.assistant_id)
+            .outerjoin(user_running, user_running.c.key == RunORM.user_id)
+            .outerjoin(assistant_running, assistant_running.c.key == assistant_key)
+            .where(_claimable_status())
+            .subquery()
+        )
+
+        conditions = []
+        if policy.user_limit or policy.user_limits:
+            quota = _lookup(policy.user_limits, policy.user_limit, ranked.c.user_id)
+            conditions.append(or_(quota == 0, ranked.c.user_slot <= quota))
+        if policy.assistant_limit or policy.assistant_limits:
+            quota = _lookup(
+                policy.assistant_limits,
+                policy.assistant_limit,
+                ranked.c.assistant_id,
+                ranked.c.graph_id,
+            )
+            conditions.append(or_(quota == 0, ranked.c.assistant_slot <= quota))
+        weight = _lookup(policy.weights, 1.0, ranked.c.user_id)
+
+        return (
+            select(RunORM.run_id)
+            .join(ranked, ranked.c.run_id == RunORM.run_id)
+            # Rechecked on the locked row, so a run another worker claimed
+            # since this statement's snapshot is not claimed twice
+            .where(_claimable_status(), *conditions)
+            .order_by(ranked.c.user_slot / weight, ranked.c.created_at)
+            .limit(limit)
+            .with_for_update(of=RunORM, skip_locked=True)
+        )
+
+    async def claim(self, limit: int) -> list[RunORM]:
+        """Atomically mark up to ``limit`` claimable runs as running under our lease"""
+        claimable = (
+            self.claimable(limit)
+            .add_columns(RunORM.claimed_by.label("previous_claim"))
+            .cte("claimable")
+        )
+        maker = _get_session_maker()
+        async with maker() as session:
+            result = await session.execute(
+                update(RunORM)
+                .where(RunORM.run_id == claimable.c.run_id)
+                .values(
+                    status="running",
+                    claimed_by=self.worker_id,
+                    lease_expires_at=func.now() + self.lease,
+                    updated_at=datetime.now(UTC),
+                )
+                .returning(RunORM, claimable.c.previous_claim)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            await session.commit()
+        for run_orm, previous_claim in rows:
+            if previous_claim is not None:
+                logger.warning(
+                    f"Reclaimed run {run_orm.run_id} from worker {previous_claim} "
+                    "whose lease expired"
+                )
+                self._reclaimed.add(run_orm.run_id)
+        return sorted((row[0] for row in rows), key=lambda run: run.created_at)
+
+    async def renew(self) -> None:
+        """Extend the leases of the runs this worker is executing"""
+        run_ids = list(self._tasks)
+        if not run_ids:
+            return
+        maker = _get_session_maker()
+        async with maker() as session:
+            result = await session.scalars(
+                update(RunORM)
+                .where(
+                    RunORM.run_id.in_(run_ids),
+                    RunORM.claimed_by == self.worker_id,
+                    RunORM.status == "running",
+                )
+                .values(lease_expires_at=func.now() + self.lease)
+                .returning(RunORM.run_id)
+                .execution_options(synchronize_session=False)
+            )
+            renewed = set(result.all())
+            await session.commit()
+        for run_id in run_ids:
+            if run_id not in renewed and run_id in self._tasks:
+                # Ended meanwhile, or the lease lapsed and another worker took it
+                logger.debug(f"Lease of run {run_id} was not renewed")
+
+    async def release(self) -> None:
+        """Expire this worker's leases so runs it leaves behind are reclaimed"""
+        maker = _get_session_maker()
+        async with maker() as session:
+            await session.execute(
+                update(RunORM)
+                .where(RunORM.claimed_by == self.worker_id, RunORM.status == "running")
+                .values(lease_expires_at=func.now())
+            )
+            await session.commit()
+
+    async def _heartbeat_loop(self) -> None:
+        """Renew leases well before they expire"""
+        interval = self.lease.total_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.renew()
+            except Exception as e:
+                logger.error(f"Failed to renew run leases: {e}")
+
+    async def run(self) -> None:
+        """Claim and execute runs until stopped"""
+        listener = asyncio.create_task(self._listen_loop())
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"Run worker started with {self.concurrency} slots")
+        try:
+            while not self._stopping:
+                self._wakeup.clear()
+                free = self.concurrency - self.running
+                if free > 0:
+                    try:
+                        for run_orm in await self.claim(free):
+                            self._start(run_orm)
+                    except Exception as e:
+                        logger.error(f"Failed to claim pending runs: {e}")
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        finally:
+            listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await listener
+            # Leases stay renewed while stop() drains the runs
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            heartbeat.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await heartbeat
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """Stop claiming, give running runs time to finish, then cancel them"""
+        self._stopping = True
+        self._wakeup.set()
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        timeout = RUN_WORKER_DRAIN_TIMEOUT if timeout is None else timeout
+        logger.info(f"Waiting up to {timeout}s for {len(tasks)} runs to finish")
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _execute(self, run_orm: RunORM, reclaimed: bool) -> None:
+        # Lazy imports to avoid cycles
+        from ..api.runs import execute_stored_run
+        from .event_store import event_store
+
+        if reclaimed:
+            # Executed again from the start: drop the abandoned attempt's events
+            await event_store.cleanup_events(run_orm.run_id)
+        await execute_stored_run(run_orm)
+
+    def _start(self, run_orm: RunORM) -> None:
+        # Lazy import to avoid cycles
+        from ..api.runs import active_runs
+
+        run_id = run_orm.run_id
+        reclaimed = run_id in self._reclaimed
+        self._reclaimed.discard(run_id)
+        self._claimed_total += 1
+        self._reclaimed_total += reclaimed
+        task = asyncio.create_task(self._execute(run_orm, reclaimed))
+        self._tasks[run_id] = task
+        active_runs[run_id] = task
+        task.add_done_callback(lambda t, run_id=run_id: self._finished(run_id, t))
+        logger.info(f"Worker claimed run {run_id} on thread {run_orm.thread_id}")
+
+    def _finished(self, run_id: str, task: asyncio.Task) -> None:
+        self._tasks.pop(run_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Run {run_id} failed in worker: {task.exception()}")
+        # A slot is free again
+        self._wakeup.set()
+
+    def _on_notification(
+        self, _conn: Any, _pid: int, _channel: str, payload: str
+    ) -> None:
+        if not payload:
+            self._wakeup.set()
+            return
+        try:
+            run_id = json.loads(payload).get("cancel")
+        except (ValueError, AttributeError):
+            logger.warning(f"Ignoring malformed run worker notification: {payload}")
+            return
+        task = self._tasks.get(run_id)
+        if task is not None and not task.done():
+            logger.info(f"Cancelling run {run_id} on request")
+            task.cancel()
+
+    async def _listen_loop(self) -> None:
+        """Keep a dedicated LISTEN connection open, reconnecting on loss"""
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(db_manager.get_dsn())
+                closed = asyncio.get_running_loop().create_future()
+                conn.add_termination_listener(
+                    lambda _conn, closed=closed: (
+                        closed.done() or closed.set_result(None)
+                    )
+                )
+                await conn.add_listener(self.channel, self._on_notification)
+                # Runs created while disconnected were not announced
+                self._wakeup.set()
+                await closed
+                logger.warning("Run worker LISTEN connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Run worker LISTEN connection failed: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    with contextlib.suppress(Exception):
+                        await conn.close()
+            await asyncio.sleep(1)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Worker slots and claim counters"""
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "claimed_total": self._claimed_total,
+            "reclaimed_total": self._reclaimed_total,
+        }
+
+
+async def serve(worker: RunWorker | None = None) -> None:
+    """Run a worker process until SIGINT/SIGTERM, with the services runs use"""
+    from ..core.serializers.offload import shutdown_serialization_pool
+    from ..observability.base import get_observability_manager
+    from ..observability.langfuse_integration import _langfuse_provider
+    from .broker import broker_manager
+    from .event_compactor import event_compactor
+    from .event_writer import event_writer
+    from .langgraph_service import get_langgraph_service
+    from .pg_broker import PostgresBrokerManager
+
+    if not isinstance(broker_manager, PostgresBrokerManager):
+        logger.warning(
+            "BROKER_BACKEND is not 'postgres': events of runs executed by this "
+            "worker can only be replayed from the store, not streamed live"
+        )
+
+    worker = worker or RunWorker()
+    await db_manager.initialize()
+    get_observability_manager().register_provider(_langfuse_provider)
+    await get_langgraph_service().initialize()
+    await event_writer.start()
+    await broker_manager.start_cleanup_task()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = asyncio.create_task(worker.run())
+    stopper = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait({runner, stopper}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopper.cancel()
+        await worker.stop()
+        await runner
+        try:
+            await worker.release()
+        except Exception as e:
+            logger.error(f"Failed to release run leases: {e}")
+        await event_compactor.stop()
+        await event_writer.stop()
+        await broker_manager.stop_cleanup_task()
+        shutdown_serialization_pool()
+        await db_manager.close()
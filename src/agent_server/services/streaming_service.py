@@ -1,26 +1,39 @@
 """Streaming service for orchestrating SSE streaming"""
 
 import asyncio
+import dataclasses
+import os
 from collections.abc import AsyncIterator
 from typing import Any
 
 import structlog
 
-from ..core.sse import create_error_event, create_metadata_event
+from ..core.serializers.offload import serialize_offloaded
+from ..core.sse import EncodedEvent, create_error_event, create_metadata_event
 from ..models import Run
 from ..utils import extract_event_sequence, generate_event_id
-from .broker import broker_manager
+from .broker import RunBroker, SubscriberLaggedError, broker_manager
+from .chunk_coalescer import MessageChunkCoalescer, coalescing_enabled
+from .event_compactor import folded_from
 from .event_converter import EventConverter
-from .event_store import event_store, store_sse_event
+from .event_persistence import DEFAULT_POLICY, EventPersistencePolicy
+from .event_store import event_store
+from .event_writer import event_writer
 
 logger = structlog.getLogger(__name__)
 
+# How long a replay waits for events another process persists to appear
+STORE_LAG_TIMEOUT = float(os.getenv("BROKER_PG_REF_TIMEOUT", "5"))
+
+
+class StoredEventsLagError(Exception):
+    """Events another process persisted did not reach the store in time"""
+
 
 class StreamingService:
     """Service to handle SSE streaming orchestration with LangGraph compatibility"""
 
     def __init__(self):
-        self.event_counters: dict[str, int] = {}
         self.event_converter = EventConverter()
 
     def _process_interrupt_updates(
@@ -49,15 +62,31 @@ class StreamingService:
 
     def _next_event_counter(self, run_id: str, event_id: str) -> int:
         """Update and return the next event counter for a run"""
+        state = broker_manager.get_or_create_state(run_id)
         try:
-            idx = self._extract_event_sequence(event_id)
-            current = self.event_counters.get(run_id, 0)
-            if idx > current:
-                self.event_counters[run_id] = idx
-                return idx
+            return state.advance_sequence(self._extract_event_sequence(event_id))
         except Exception as e:
             logger.warning(f"Event counter update failed: {e}")
-        return self.event_counters.get(run_id, 0)
+        return state.last_sequence
+
+    def coalesce_messages(
+        self, run_id: str, events: AsyncIterator[Any]
+    ) -> AsyncIterator[Any]:
+        """Wrap a graph event stream with token chunk coalescing if enabled"""
+        if not coalescing_enabled():
+            return events
+        broker = broker_manager.get_or_create_broker(run_id)
+        coalescer = MessageChunkCoalescer(
+            pressure=lambda: self._drain_pressure(broker, coalescer.max_chunks)
+        )
+        return coalescer.coalesce(events)
+
+    def _drain_pressure(self, broker: RunBroker, lag_scale: int) -> float:
+        """How far live subscribers lag behind, from 0 (caught up) to 1"""
+        if broker.subscriber_count == 0:
+            # Nobody is watching live, only the stored events matter
+            return 1.0
+        return min(broker.max_subscriber_lag / lag_scale, 1.0)
 
     async def put_to_broker(
         self,
@@ -65,8 +94,15 @@ class StreamingService:
         event_id: str,
         raw_event: Any,
         only_interrupt_updates: bool = False,
-    ):
-        """Put an event into the run's broker queue for live consumers"""
+        policy: EventPersistencePolicy = DEFAULT_POLICY,
+    ) -> EncodedEvent | None:
+        """Encode an event once and put it into the run's broker for live consumers.
+
+        Returns the encoded event so it can be persisted without serializing
+        it again, or None if the event is skipped. Events the run's policy
+        doesn't persist lose their stored form, so brokers neither hold it
+        nor point other processes at a row that never exists.
+        """
         broker = broker_manager.get_or_create_broker(run_id)
         self._next_event_counter(run_id, event_id)
 
@@ -74,9 +110,39 @@ class StreamingService:
             raw_event, only_interrupt_updates
         )
         if should_skip:
+            return None
+        # Large state snapshots are encoded off the event loop, by the
+        # converter so that a serialization process can take the call
+        try:
+            encoded = await serialize_offloaded(
+                self.event_converter.encode_raw_event,
+                event_id,
+                processed_event,
+                payload=processed_event,
+            )
+        except Exception as e:
+            logger.error(f"Failed to encode event {event_id} of run {run_id}: {e}")
+            return None
+        if encoded.stored_data is not None and not policy.persists(encoded):
+            encoded = dataclasses.replace(encoded, stored_event=None, stored_data=None)
+
+        await broker.put(event_id, encoded)
+        return encoded
+
+    async def store_encoded_event(
+        self,
+        run_id: str,
+        encoded: EncodedEvent | None,
+        policy: EventPersistencePolicy = DEFAULT_POLICY,
+    ) -> None:
+        """Persist an encoded event for replay if the run's policy stores it"""
+        if not policy.persists(encoded):
             return
+        await event_writer.enqueue(run_id, encoded)
 
-        await broker.put(event_id, processed_event)
+    async def flush_events(self, run_id: str) -> bool:
+        """Wait until the queued events of a run are persisted"""
+        return await event_writer.flush(run_id)
 
     async def store_event_from_raw(
         self,
@@ -84,87 +150,64 @@ class StreamingService:
         event_id: str,
         raw_event: Any,
         only_interrupt_updates: bool = False,
+        policy: EventPersistencePolicy = DEFAULT_POLICY,
     ):
         """Convert raw event to stored format and store it"""
+        if not policy.enabled:
+            return
+        encoded = self._encode_event(
+            run_id, event_id, raw_event, only_interrupt_updates
+        )
+        await self.store_encoded_event(run_id, encoded, policy)
+
+    def _encode_event(
+        self,
+        run_id: str,
+        event_id: str,
+        raw_event: Any,
+        only_interrupt_updates: bool,
+    ) -> EncodedEvent | None:
+        """Apply interrupt filtering and serialize a raw event"""
         processed_event, should_skip = self._process_interrupt_updates(
             raw_event, only_interrupt_updates
         )
         if should_skip:
-            return
-
-        # Parse the processed event
-        node_path = None
-        stream_mode_label = None
-        event_payload = None
+            return None
 
-        if isinstance(processed_event, tuple):
-            if len(processed_event) == 2:
-                stream_mode_label, event_payload = processed_event
-            elif len(processed_event) == 3:
-                node_path, stream_mode_label, event_payload = processed_event
-        else:
-            stream_mode_label = "values"
-            event_payload = processed_event
-
-        # Store based on stream mode
-        if stream_mode_label == "messages":
-            await store_sse_event(
-                run_id,
-                event_id,
-                "messages",
-                {
-                    "type": "messages_stream",
-                    "message_chunk": event_payload[0]
-                    if isinstance(event_payload, tuple) and len(event_payload) >= 1
-                    else event_payload,
-                    "metadata": event_payload[1]
-                    if isinstance(event_payload, tuple) and len(event_payload) >= 2
-                    else None,
-                    "node_path": node_path,
-                },
-            )
-        elif stream_mode_label == "values" or stream_mode_label == "updates":
-            await store_sse_event(
-                run_id,
-                event_id,
-                "values",
-                {"type": "execution_values", "chunk": event_payload},
-            )
-        elif stream_mode_label == "end":
-            await store_sse_event(
-                run_id,
-                event_id,
-                "end",
-                {
-                    "type": "run_complete",
-                    "status": event_payload.get("status", "completed"),
-                    "final_output": event_payload.get("final_output"),
-                },
-            )
-        # Add other stream modes as needed
+        try:
+            return self.event_converter.encode_raw_event(event_id, processed_event)
+        except Exception as e:
+            logger.error(f"Failed to encode event {event_id} of run {run_id}: {e}")
+            return None
 
     async def signal_run_cancelled(self, run_id: str):
         """Signal that a run was cancelled"""
-        counter = self.event_counters.get(run_id, 0) + 1
-        self.event_counters[run_id] = counter
-        event_id = generate_event_id(run_id, counter)
+        state = broker_manager.get_or_create_state(run_id)
+        event_id = generate_event_id(run_id, state.next_sequence())
 
-        broker = broker_manager.get_or_create_broker(run_id)
+        broker = state.broker
         if broker:
-            await broker.put(event_id, ("end", {"status": "cancelled"}))
+            await broker.put(
+                event_id,
+                self.event_converter.encode_raw_event(
+                    event_id, ("end", {"status": "cancelled"})
+                ),
+            )
 
         broker_manager.cleanup_broker(run_id)
 
     async def signal_run_error(self, run_id: str, error_message: str):
         """Signal that a run encountered an error"""
-        counter = self.event_counters.get(run_id, 0) + 1
-        self.event_counters[run_id] = counter
-        event_id = generate_event_id(run_id, counter)
+        state = broker_manager.get_or_create_state(run_id)
+        event_id = generate_event_id(run_id, state.next_sequence())
 
-        broker = broker_manager.get_or_create_broker(run_id)
+        broker = state.broker
         if broker:
             await broker.put(
-                event_id, ("end", {"status": "failed", "error": error_message})
+                event_id,
+                self.event_converter.encode_raw_event(
+                    event_id, ("end", {"status": "failed", "error": error_message})
+                ),
             )
 
         broker_manager.cleanup_broker(run_id)
@@ -188,13 +231,19 @@ class StreamingService:
                 metadata_event = create_metadata_event(run_id, event_id)
                 yield metadata_event
 
-            # Replay stored events first
             last_sent_sequence = 0
             if last_event_id:
                 last_sent_sequence = self._extract_event_sequence(last_event_id)
 
-            async for sse_event in self._replay_stored_events(run_id, last_event_id):
-                yield sse_event
+            # Events still buffered in memory are served by the live stream,
+            # which reads only the part no longer buffered from the store
+            broker = broker_manager.get_broker(run_id)
+            if broker is None or not broker.has_buffered_events():
+                async for seq, sse_event in self._replay_stored_range(
+                    run_id, last_sent_sequence
+                ):
+                    yield sse_event
+                    last_sent_sequence = seq
 
             # Stream live events if run is still active
             async for sse_event in self._stream_live_events(run, last_sent_sequence):
@@ -209,46 +258,110 @@ class StreamingService:
             logger.error(f"Error in stream_run_execution for run {run_id}: {e}")
             yield create_error_event(str(e))
 
-    async def _replay_stored_events(
-        self, run_id: str, last_event_id: str | None
-    ) -> AsyncIterator[str]:
-        """Replay stored events"""
-        if last_event_id:
-            stored_events = await event_store.get_events_since(run_id, last_event_id)
-        else:
-            stored_events = await event_store.get_all_events(run_id)
-
-        for ev in stored_events:
-            sse_event = self._stored_event_to_sse(run_id, ev)
-            if sse_event:
-                yield sse_event
-
     async def _stream_live_events(
         self, run: Run, last_sent_sequence: int
     ) -> AsyncIterator[str]:
         """Stream live events from broker"""
         run_id = run.run_id
-        broker = broker_manager.get_or_create_broker(run_id)
-
-        # If run finished and broker is done, nothing to stream
-        if (
-            run.status in ["completed", "failed", "cancelled", "interrupted"]
-            and broker.is_finished()
-        ):
-            return
+        if run.status in ["completed", "failed", "cancelled", "interrupted"]:
+            # Don't recreate stream state that already expired for a finished
+            # run; a retained one still serves its buffered tail
+            broker = broker_manager.get_broker(run_id)
+            if broker is None:
+                return
+        else:
+            broker = broker_manager.get_or_create_broker(run_id)
 
         # Stream live events
-        if broker:
-            async for event_id, raw_event in broker.aiter():
-                # Skip duplicates that were already replayed
-                current_sequence = self._extract_event_sequence(event_id)
-                if current_sequence <= last_sent_sequence:
-                    continue
+        check_gap = True
+        while broker:
+            try:
+                async for event_id, raw_event in broker.aiter():
+                    # Skip duplicates that were already replayed
+                    current_sequence = self._extract_event_sequence(event_id)
+                    if current_sequence <= last_sent_sequence:
+                        continue
+
+                    if check_gap:
+                        check_gap = False
+                        if not broker.retains_after(last_sent_sequence):
+                            # Read only what is no longer buffered from the store
+                            async for seq, sse_event in self._replay_stored_range(
+                                run_id,
+                                last_sent_sequence,
+                                current_sequence,
+                                stored_through=getattr(
+                                    raw_event, "stored_before", None
+                                ),
+                            ):
+                                yield sse_event
+                                last_sent_sequence = seq
+
+                    sse_event = await self._convert_raw_to_sse(event_id, raw_event)
+                    if sse_event:
+                        yield sse_event
+                        last_sent_sequence = current_sequence
+                if check_gap:
+                    # No live event came: the run ended (e.g. in another
+                    # process) before this subscriber joined; read its tail
+                    async for seq, sse_event in self._replay_stored_range(
+                        run_id, last_sent_sequence
+                    ):
+                        yield sse_event
+                        last_sent_sequence = seq
+                return
+            except SubscriberLaggedError:
+                logger.info(
+                    f"Live stream of run {run_id} fell behind the broker buffer, "
+                    f"resuming from event store after sequence {last_sent_sequence}"
+                )
+                check_gap = True
+                async for seq, sse_event in self._replay_stored_range(
+                    run_id, last_sent_sequence
+                ):
+                    yield sse_event
+                    last_sent_sequence = seq
 
-                sse_event = await self._convert_raw_to_sse(event_id, raw_event)
+    async def _replay_stored_range(
+        self,
+        run_id: str,
+        after_sequence: int,
+        before_sequence: int | None = None,
+        stored_through: int | None = None,
+    ) -> AsyncIterator[tuple[int, str]]:
+        """Replay stored events in (after, before) as (sequence, sse) pairs.
+
+        Flushing only drains this process's writer; events persisted by
+        another process up to ``stored_through`` may still be on their way,
+        so the store is polled until they appear instead of skipping them.
+        """
+        await event_writer.flush(run_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STORE_LAG_TIMEOUT
+        delay = 0.01
+        while True:
+            async for ev in event_store.iter_events(
+                run_id, after_sequence, before_sequence
+            ):
+                first = folded_from(ev)
+                resumed_inside = first is not None and first <= after_sequence
+                after_sequence = self._extract_event_sequence(ev.id)
+                if resumed_inside:
+                    # The client has the start of this compacted message
+                    continue
+                sse_event = self._stored_event_to_sse(run_id, ev)
                 if sse_event:
-                    yield sse_event
-                    last_sent_sequence = current_sequence
+                    yield after_sequence, sse_event
+            if stored_through is None or after_sequence >= stored_through:
+                return
+            if loop.time() >= deadline:
+                raise StoredEventsLagError(
+                    f"Events of run {run_id} up to sequence {stored_through} "
+                    f"were not persisted within {STORE_LAG_TIMEOUT}s; "
+                    f"stream stopped after sequence {after_sequence}"
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
 
     def _cancel_background_task(self, run_id: str):
         """Cancel background task on disconnect"""
@@ -265,6 +378,9 @@ class StreamingService:
 
     async def _convert_raw_to_sse(self, event_id: str, raw_event: Any) -> str | None:
         """Convert a raw event from broker to SSE format"""
+        if isinstance(raw_event, EncodedEvent):
+            # Already serialized once at publish time; shared by all subscribers
+            return raw_event.frame
         return self.event_converter.convert_raw_to_sse(event_id, raw_event)
 
     async def interrupt_run(self, run_id: str) -> bool:
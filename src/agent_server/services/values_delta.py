@@ -0,0 +1,102 @@
+"""Delta encoding of ``values`` events for the ``values-delta`` stream mode"""
+
+import os
+from typing import Any
+
+from ..core.serializers import get_json_codec
+from ..core.sse import serialize_json
+
+VALUES_DELTA_MODE = "values-delta"
+
+# Send a full snapshot every N events so clients can resync
+DEFAULT_SNAPSHOT_EVERY = int(os.getenv("STREAM_VALUES_DELTA_SNAPSHOT_EVERY", "20"))
+
+
+def _escape_pointer(key: str) -> str:
+    """Escape a key for use as a JSON pointer token (RFC 6901)"""
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def make_json_patch(old: Any, new: Any, path: str = "") -> list[dict[str, Any]]:
+    """Compute an RFC 6902 JSON patch transforming ``old`` into ``new``.
+
+    Dicts are diffed key by key and lists element by element; growing or
+    shrinking a list at its end (e.g. appending messages) yields add/remove
+    operations for the changed tail only.
+    """
+    if type(old) is type(new) and old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: list[dict[str, Any]] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape_pointer(key)}"})
+        for key, value in new.items():
+            key_path = f"{path}/{_escape_pointer(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": key_path, "value": value})
+            else:
+                ops.extend(make_json_patch(old[key], value, key_path))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        ops = []
+        for index in range(common):
+            ops.extend(make_json_patch(old[index], new[index], f"{path}/{index}"))
+        # Remove from the end first so indexes stay valid
+        for index in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{index}"})
+        for index in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        return ops
+
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+class ValuesDeltaEncoder:
+    """Turns successive ``values`` events of a run into snapshots and patches.
+
+    The first event (per subgraph namespace) and every ``snapshot_every``-th
+    event carry the full state as ``{"snapshot": state}``; the others carry
+    ``{"patch": [...]}`` against the previous event of the same namespace.
+    A snapshot is also sent whenever the patch would not be smaller.
+    """
+
+    def __init__(self, snapshot_every: int | None = None):
+        self.snapshot_every = max(1, snapshot_every or DEFAULT_SNAPSHOT_EVERY)
+        # Last JSON state and events since the last snapshot, per node path
+        self._previous: dict[Any, Any] = {}
+        self._since_snapshot: dict[Any, int] = {}
+
+    def encode(self, raw_event: Any) -> Any:
+        """Convert a raw ``values`` event into a ``values-delta`` event"""
+        if isinstance(raw_event, tuple) and len(raw_event) == 2:
+            node_path, (mode, state) = None, raw_event
+        elif isinstance(raw_event, tuple) and len(raw_event) == 3:
+            node_path, mode, state = raw_event
+        else:
+            node_path, mode, state = None, "values", raw_event
+        if mode != "values":
+            return raw_event
+
+        state_text = serialize_json(state)
+        state_json = get_json_codec().loads(state_text)
+        previous = self._previous.get(node_path)
+        count = self._since_snapshot.get(node_path, 0) + 1
+        self._previous[node_path] = state_json
+
+        delta = None
+        if previous is not None and count < self.snapshot_every:
+            patch = make_json_patch(previous, state_json)
+            if len(serialize_json(patch)) < len(state_text):
+                delta = {"patch": patch}
+        if delta is None:
+            delta = {"snapshot": state_json}
+            count = 0
+        self._since_snapshot[node_path] = count
+
+        if node_path is None:
+            return VALUES_DELTA_MODE, delta
+        return node_path, VALUES_DELTA_MODE, delta
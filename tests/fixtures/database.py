@@ -36,6 +36,16 @@ class DummySessionBase:
 
         return Result()
 
+    async def execute(self, _stmt):
+        class Result:
+            def one_or_none(self_inner):
+                return None
+
+            def all(self_inner):
+                return []
+
+        return Result()
+
 
 def override_get_session_dep(
     session_factory: Callable[[], DummySessionBase],
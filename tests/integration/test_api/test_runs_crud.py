@@ -549,15 +549,13 @@ class TestWaitForRun:
         app = create_test_app(include_runs=True, include_threads=False)
 
         class Session(DummySessionBase):
-            async def scalar(self, _stmt):
-                # Return None for assistant lookup (thread validation is skipped in wait endpoint)
-                return None
-
             async def execute(self, _stmt):
-                pass
+                # The thread exists, the assistant does not
+                class Result:
+                    def one_or_none(self_inner):
+                        return ("idle", {}, None, None)
 
-            async def commit(self):
-                pass
+                return Result()
 
         override_session_dependency(app, Session)
         client = make_client(app)
@@ -656,8 +654,12 @@ class TestWaitForRun:
         thread = _thread_row(status="idle")
 
         class Session(DummySessionBase):
-            async def scalar(self, _stmt):
-                return thread
+            async def execute(self, _stmt):
+                class Result:
+                    def one_or_none(self_inner):
+                        return (thread.status, {}, _assistant_row(), None)
+
+                return Result()
 
         override_session_dependency(app, Session)
         client = make_client(app)
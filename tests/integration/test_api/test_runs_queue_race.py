@@ -0,0 +1,194 @@
+"""Integration tests for handing a thread to its queued runs"""
+
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from agent_server.api.runs import (
+    _create_run_record,
+    cancel_run_endpoint,
+    start_next_queued_run,
+    update_run_status,
+)
+from agent_server.core.orm import Assistant as AssistantORM
+from agent_server.core.orm import Run as RunORM
+from agent_server.core.orm import Thread as ThreadORM
+from agent_server.models import RunCreate, User
+
+
+@pytest.fixture
+async def session_maker():
+    """Session maker against DATABASE_URL or skip"""
+    load_dotenv()
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("Database not available for integration tests")
+
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+    try:
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+    except Exception:
+        await engine.dispose()
+        pytest.skip("Database not available for integration tests")
+
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def busy_thread(session_maker):
+    """A thread with an assistant and one running run, removed afterwards"""
+    assistant_id, thread_id, run_id = str(uuid4()), str(uuid4()), str(uuid4())
+    async with session_maker() as session:
+        await session.execute(
+            insert(AssistantORM).values(
+                assistant_id=assistant_id,
+                name="race",
+                graph_id="test-graph",
+                user_id="test-user",
+            )
+        )
+        await session.execute(
+            insert(ThreadORM).values(
+                thread_id=thread_id, status="busy", user_id="test-user"
+            )
+        )
+        await session.execute(
+            insert(RunORM).values(
+                run_id=run_id,
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+                status="running",
+                user_id="test-user",
+            )
+        )
+        await session.commit()
+
+    yield assistant_id, thread_id, run_id
+
+    async with session_maker() as session:
+        await session.execute(delete(ThreadORM).where(ThreadORM.thread_id == thread_id))
+        await session.execute(
+            delete(AssistantORM).where(AssistantORM.assistant_id == assistant_id)
+        )
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_queued_run_starts_when_active_run_ends_during_creation(
+    session_maker, busy_thread
+):
+    """Test a run ending between the creation read and commit starts the queued run"""
+    assistant_id, thread_id, active_run_id = busy_thread
+    new_run_id = str(uuid4())
+    request = RunCreate(
+        assistant_id=assistant_id, input={}, multitask_strategy="enqueue"
+    )
+    executor = MagicMock()
+    handoff: list[asyncio.Task] = []
+
+    async def finish_active_run():
+        # What the active run's task does as it ends
+        await update_run_status(active_run_id, "completed", output={})
+        return await start_next_queued_run(thread_id)
+
+    with (
+        patch("agent_server.api.runs._get_session_maker", return_value=session_maker),
+        patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
+        patch("agent_server.api.runs.resolve_assistant_id", return_value=assistant_id),
+        patch("agent_server.api.runs.run_executor", executor),
+        patch("agent_server.api.runs.executes_in_workers", return_value=False),
+    ):
+        mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
+        async with session_maker() as session:
+            execute = session.execute
+
+            async def execute_then_finish(statement, *args, **kwargs):
+                result = await execute(statement, *args, **kwargs)
+                if not handoff:
+                    # The active run ends right after the creation read
+                    handoff.append(asyncio.create_task(finish_active_run()))
+                    await asyncio.sleep(0.3)
+                return result
+
+            session.execute = execute_then_finish
+            new_run = await _create_run_record(
+                session, thread_id, new_run_id, request, User(identity="test-user")
+            )
+
+        assert new_run.enqueued
+        assert await asyncio.wait_for(handoff[0], timeout=5) == new_run_id
+
+    assert executor.submit.call_args.args[0] == new_run_id
+    async with session_maker() as session:
+        status = await session.scalar(
+            select(RunORM.status).where(RunORM.run_id == new_run_id)
+        )
+    assert status == "pending"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("in_workers", [False, True], ids=["inline", "worker"])
+async def test_cancelling_unstarted_run_starts_the_next_queued_run(
+    session_maker, busy_thread, in_workers
+):
+    """Test a run cancelled before it executes hands the thread to the next one"""
+    assistant_id, thread_id, active_run_id = busy_thread
+    queued_run_id = str(uuid4())
+    async with session_maker() as session:
+        # The active run has not started executing yet
+        await session.execute(
+            update(RunORM)
+            .where(RunORM.run_id == active_run_id)
+            .values(status="pending")
+        )
+        await session.execute(
+            insert(RunORM).values(
+                run_id=queued_run_id,
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+                status="queued",
+                user_id="test-user",
+            )
+        )
+        await session.commit()
+
+    executor = MagicMock()
+    # Inline, the run is still waiting for an execution slot
+    executor.cancel_queued.side_effect = lambda run_id: (
+        not in_workers and run_id == active_run_id
+    )
+    with (
+        patch("agent_server.api.runs._get_session_maker", return_value=session_maker),
+        patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
+        patch("agent_server.api.runs.run_executor", executor),
+        patch("agent_server.api.runs.executes_in_workers", return_value=in_workers),
+        patch("agent_server.api.runs.streaming_service.cancel_run", AsyncMock()),
+    ):
+        mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
+        async with session_maker() as session:
+            cancelled = await cancel_run_endpoint(
+                thread_id,
+                active_run_id,
+                wait=0,
+                action="cancel",
+                user=User(identity="test-user"),
+                session=session,
+            )
+
+    assert cancelled.status == "cancelled"
+    async with session_maker() as session:
+        status = await session.scalar(
+            select(RunORM.status).where(RunORM.run_id == queued_run_id)
+        )
+    assert status == "pending"
+    if in_workers:
+        executor.submit.assert_not_called()
+    else:
+        assert executor.submit.call_args.args[0] == queued_run_id
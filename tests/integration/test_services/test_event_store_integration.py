@@ -1,6 +1,7 @@
 """Integration tests for EventStore service with real database"""
 
 import asyncio
+import json
 from datetime import UTC, datetime
 
 import pytest
@@ -160,6 +161,110 @@ class TestEventStoreIntegration:
         assert events[0].event == event.event
         assert events[0].data == event.data
 
+    @pytest.mark.asyncio
+    async def test_store_encoded_event_replays_same_frame(self, event_store):
+        """Test that an encoded event is stored as-is and replays identically"""
+        from src.agent_server.services.event_converter import EventConverter
+
+        converter = EventConverter()
+        run_id = "integration-test-run-encoded"
+        encoded = converter.encode_raw_event(
+            f"{run_id}_event_1", ("messages", ({"content": "hi"}, {"node": "a"}))
+        )
+
+        await event_store.store_encoded_event(run_id, encoded)
+
+        events = await event_store.get_all_events(run_id)
+        assert len(events) == 1
+        assert events[0].data["message_chunk"] == {"content": "hi"}
+        assert converter.convert_stored_to_sse(events[0]) == encoded.frame
+
+    @pytest.mark.asyncio
+    async def test_store_encoded_events_batch(self, event_store):
+        """Test a batch insert spanning runs keeps order and ignores duplicates"""
+        from src.agent_server.services.event_converter import EventConverter
+
+        converter = EventConverter()
+        batch = [
+            (
+                run_id,
+                converter.encode_raw_event(
+                    f"{run_id}_event_{i}", ("values", {"sequence": i})
+                ),
+            )
+            for i in range(1, 4)
+            for run_id in ("integration-batch-a", "integration-batch-b")
+        ]
+
+        await event_store.store_encoded_events(batch)
+        # Retried batches are idempotent
+        await event_store.store_encoded_events(batch[:2])
+
+        for run_id in ("integration-batch-a", "integration-batch-b"):
+            events = await event_store.get_all_events(run_id)
+            assert [e.data["chunk"]["sequence"] for e in events] == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_rewrite_events_deletes_and_replaces(self, event_store):
+        """Test a compaction rewrite keeps the remaining seqs in order"""
+        run_id = "integration-rewrite"
+        for i in range(4):
+            await event_store.store_event(
+                run_id,
+                SSEEvent(
+                    id=f"{run_id}_event_{i}",
+                    event="values",
+                    data={"type": "execution_values", "chunk": {"n": i}},
+                ),
+            )
+
+        await event_store.rewrite_events(
+            run_id,
+            [0, 1],
+            [(3, json.dumps({"type": "execution_values", "chunk": {"n": 99}}), None)],
+        )
+
+        events = await event_store.get_all_events(run_id)
+        assert [e.id for e in events] == [f"{run_id}_event_2", f"{run_id}_event_3"]
+        assert [e.data["chunk"]["n"] for e in events] == [2, 99]
+
+    @pytest.mark.asyncio
+    async def test_binary_and_jsonb_events_replay_alike(self, event_store):
+        """Test a run stored partly in each format replays the original frames"""
+        from unittest.mock import patch
+
+        pytest.importorskip("zstandard")
+        from src.agent_server.core.event_codec import EventPayloadCodec
+        from src.agent_server.services.event_converter import EventConverter
+
+        converter = EventConverter()
+        run_id = "integration-test-run-binary"
+        encoded = [
+            converter.encode_raw_event(
+                f"{run_id}_event_{i}", ("values", {"sequence": i, "text": "ñ" * 50})
+            )
+            for i in range(1, 5)
+        ]
+
+        await event_store.store_encoded_events([(run_id, e) for e in encoded[:2]])
+        with patch(
+            "src.agent_server.services.event_store.get_event_codec",
+            return_value=EventPayloadCodec("zstd"),
+        ):
+            await event_store.store_encoded_events([(run_id, e) for e in encoded[2:]])
+
+        events = await event_store.get_all_events(run_id)
+        assert [e.payload is not None for e in events] == [False, False, True, True]
+        assert events[2].data is None
+        frames = [converter.convert_stored_to_sse(e) for e in events]
+        # Binary rows replay verbatim; JSONB normalizes key order
+        assert frames[2:] == [e.frame for e in encoded[2:]]
+        for frame, original in zip(frames[:2], encoded[:2], strict=True):
+            assert frame.split("\n")[0] == original.frame.split("\n")[0]
+            assert json.loads(frame.split("\n")[1][6:]) == json.loads(
+                original.frame.split("\n")[1][6:]
+            )
+
     @pytest.mark.asyncio
     async def test_store_multiple_events_sequence(self, event_store):
         """Test storing multiple events with proper sequencing"""
@@ -218,6 +323,34 @@ class TestEventStoreIntegration:
         assert events_since[0].data["sequence"] == 4
         assert events_since[1].data["sequence"] == 5
 
+    @pytest.mark.asyncio
+    async def test_iter_events_pages_through_range(self, event_store):
+        """Test iter_events replays a bounded range across several pages"""
+        run_id = "integration-test-run-003b"
+
+        for i in range(1, 8):
+            event = SSEEvent(
+                id=f"{run_id}_event_{i}",
+                event=f"event_{i}",
+                data={"sequence": i},
+                timestamp=datetime.now(UTC),
+            )
+            await event_store.store_event(run_id, event)
+
+        replayed = [
+            event.data["sequence"]
+            async for event in event_store.iter_events(run_id, page_size=2)
+        ]
+        assert replayed == [1, 2, 3, 4, 5, 6, 7]
+
+        bounded = [
+            event.data["sequence"]
+            async for event in event_store.iter_events(
+                run_id, after_seq=2, before_seq=6, page_size=2
+            )
+        ]
+        assert bounded == [3, 4, 5]
+
     @pytest.mark.asyncio
     async def test_get_events_since_empty_result(self, event_store):
         """Test get_events_since when no events exist after last_event_id"""
@@ -0,0 +1,63 @@
+"""Integration tests for the Postgres LISTEN/NOTIFY broker with a real database"""
+
+import asyncio
+import os
+
+import pytest
+from dotenv import load_dotenv
+
+from src.agent_server.core.database import DatabaseManager
+from src.agent_server.services.pg_broker import PostgresBrokerManager
+
+
+@pytest.fixture
+async def database():
+    """Initialize a DatabaseManager against DATABASE_URL or skip"""
+    load_dotenv()
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("Database not available for integration tests")
+
+    manager = DatabaseManager()
+    await manager.initialize()
+    try:
+        async with manager.get_engine().begin() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+    except Exception:
+        await manager.close()
+        pytest.skip("Database not available for integration tests")
+
+    yield manager
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_events_cross_process_boundaries(database, monkeypatch):
+    """Test that events published by one manager reach another one"""
+    monkeypatch.setattr("src.agent_server.services.pg_broker.db_manager", database)
+    channel = "aegra_test_run_events"
+    publisher = PostgresBrokerManager(channel=channel)
+    receiver = PostgresBrokerManager(channel=channel)
+    await receiver.start_cleanup_task()
+    await publisher.start_cleanup_task()
+    try:
+        # Wait for the LISTEN connection to be established
+        await asyncio.sleep(0.5)
+
+        # Events only reach processes where someone streams the run
+        subscriber = receiver.get_or_create_broker("run-1")
+        broker = publisher.get_or_create_broker("run-1")
+        await broker.put("run-1_event_1", ("values", {"x": 1}))
+        await broker.put("run-1_event_2", ("messages", ({"content": "hi"}, {})))
+        broker.mark_finished()
+
+        async def receive():
+            return [event async for event in subscriber.aiter()]
+
+        events = await asyncio.wait_for(receive(), timeout=5.0)
+    finally:
+        await publisher.stop_cleanup_task()
+        await receiver.stop_cleanup_task()
+
+    assert [event_id for event_id, _ in events] == ["run-1_event_1", "run-1_event_2"]
+    assert 'data: {"x":1}' in events[0][1].frame
+    assert events[1][1].mode == "messages"
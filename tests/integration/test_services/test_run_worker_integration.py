@@ -0,0 +1,210 @@
+"""Integration tests for run workers claiming runs from a real database"""
+
+import asyncio
+import os
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.agent_server.core.orm import Assistant as AssistantORM
+from src.agent_server.core.orm import Run as RunORM
+from src.agent_server.core.orm import Thread as ThreadORM
+from src.agent_server.services.run_executor import SchedulingPolicy
+from src.agent_server.services.run_worker import RunWorker
+
+pytestmark = pytest.mark.integration
+
+
+@pytest.fixture
+async def session_maker():
+    """Session maker for the workers against DATABASE_URL, or skip"""
+    load_dotenv()
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("Database not available for integration tests")
+
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+    try:
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+    except Exception:
+        await engine.dispose()
+        pytest.skip("Database not available for integration tests")
+
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    with patch(
+        "src.agent_server.services.run_worker._get_session_maker", return_value=maker
+    ):
+        yield maker
+    await engine.dispose()
+
+
+@pytest.fixture
+async def thread(session_maker):
+    """An assistant and a thread to create runs on, removed afterwards"""
+    assistant_id, thread_id = str(uuid4()), str(uuid4())
+    async with session_maker() as session:
+        await session.execute(
+            insert(AssistantORM).values(
+                assistant_id=assistant_id,
+                name="claims",
+                graph_id="test-graph",
+                user_id="test-user",
+            )
+        )
+        await session.execute(
+            insert(ThreadORM).values(thread_id=thread_id, user_id="test-user")
+        )
+        await session.commit()
+
+    yield assistant_id, thread_id
+
+    async with session_maker() as session:
+        await session.execute(delete(ThreadORM).where(ThreadORM.thread_id == thread_id))
+        await session.execute(
+            delete(AssistantORM).where(AssistantORM.assistant_id == assistant_id)
+        )
+        await session.commit()
+
+
+async def _add_runs(session_maker, thread, count: int, **values) -> list[str]:
+    assistant_id, thread_id = thread
+    run_ids = [str(uuid4()) for _ in range(count)]
+    async with session_maker() as session:
+        for run_id in run_ids:
+            await session.execute(
+                insert(RunORM).values(
+                    run_id=run_id,
+                    thread_id=thread_id,
+                    assistant_id=assistant_id,
+                    user_id=f"user-{run_id}",
+                    **{"status": "pending", **values},
+                )
+            )
+        await session.commit()
+    return run_ids
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_hand_each_run_to_one_worker(session_maker, thread):
+    """Test workers claiming at the same time never claim a run twice"""
+    run_ids = await _add_runs(session_maker, thread, 24)
+    workers = [RunWorker(policy=SchedulingPolicy()) for _ in range(4)]
+
+    claims: dict[str, list[str]] = {worker.worker_id: [] for worker in workers}
+    for _ in range(4):
+        rounds = await asyncio.gather(*(worker.claim(3) for worker in workers))
+        for worker, runs in zip(workers, rounds, strict=True):
+            claims[worker.worker_id] += [run.run_id for run in runs]
+
+    claimed = [run_id for ids in claims.values() for run_id in ids if run_id in run_ids]
+    assert sorted(claimed) == sorted(run_ids)
+    async with session_maker() as session:
+        owners = dict(
+            (
+                await session.execute(
+                    select(RunORM.run_id, RunORM.claimed_by).where(
+                        RunORM.run_id.in_(run_ids)
+                    )
+                )
+            ).all()
+        )
+    for worker_id, ids in claims.items():
+        assert all(owners[run_id] == worker_id for run_id in ids if run_id in owners)
+
+
+@pytest.mark.asyncio
+async def test_expired_leases_are_reclaimed(session_maker, thread):
+    """Test a dead worker's runs are claimed again while live claims are left alone"""
+    now = datetime.now(UTC)
+    (dead,) = await _add_runs(
+        session_maker,
+        thread,
+        1,
+        status="running",
+        claimed_by="dead-worker",
+        lease_expires_at=now - timedelta(seconds=1),
+    )
+    (alive,) = await _add_runs(
+        session_maker,
+        thread,
+        1,
+        status="running",
+        claimed_by="live-worker",
+        lease_expires_at=now + timedelta(minutes=5),
+    )
+    worker = RunWorker(policy=SchedulingPolicy(), lease=60)
+
+    claimed = [run.run_id for run in await worker.claim(10)]
+    assert dead in claimed
+    assert alive not in claimed
+    assert dead in worker._reclaimed
+
+    # The heartbeat pushes the lease of runs this worker executes forward
+    worker._tasks[dead] = asyncio.get_running_loop().create_future()
+    async with session_maker() as session:
+        claimed_lease = await session.scalar(
+            select(RunORM.lease_expires_at).where(RunORM.run_id == dead)
+        )
+    await asyncio.sleep(0.01)
+    await worker.renew()
+    async with session_maker() as session:
+        run = await session.scalar(select(RunORM).where(RunORM.run_id == dead))
+    assert run.claimed_by == worker.worker_id
+    assert run.lease_expires_at > claimed_lease
+
+    # A stopping worker gives up its leases at once
+    await worker.release()
+    assert [run.run_id for run in await worker.claim(10)] == [dead]
+
+
+@pytest.mark.asyncio
+async def test_graph_quota_counts_all_its_assistants(session_maker, thread):
+    """Test a graph id quota holds back runs of another assistant of the graph"""
+    graph_id = f"graph-{uuid4()}"
+    other = str(uuid4())
+    async with session_maker() as session:
+        await session.execute(
+            update(AssistantORM)
+            .where(AssistantORM.assistant_id == thread[0])
+            .values(graph_id=graph_id)
+        )
+        await session.execute(
+            insert(AssistantORM).values(
+                assistant_id=other,
+                name="quota",
+                graph_id=graph_id,
+                config={"variant": "other"},
+                user_id="test-user",
+            )
+        )
+        await session.commit()
+    try:
+        (running,) = await _add_runs(session_maker, thread, 1, status="running")
+        (waiting,) = await _add_runs(
+            session_maker, (other, thread[1]), 1, created_at=datetime(2000, 1, 1)
+        )
+        worker = RunWorker(policy=SchedulingPolicy(assistant_limits={graph_id: 1}))
+
+        assert waiting not in [run.run_id for run in await worker.claim(50)]
+
+        await worker.release()
+        async with session_maker() as session:
+            await session.execute(
+                update(RunORM)
+                .where(RunORM.run_id == running)
+                .values(status="completed")
+            )
+            await session.commit()
+        assert waiting in [run.run_id for run in await worker.claim(50)]
+    finally:
+        async with session_maker() as session:
+            await session.execute(delete(RunORM).where(RunORM.assistant_id == other))
+            await session.execute(
+                delete(AssistantORM).where(AssistantORM.assistant_id == other)
+            )
+            await session.commit()
@@ -0,0 +1,93 @@
+"""Unit tests for the single-transaction run creation path."""
+
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from agent_server.api.runs import create_run
+from agent_server.core.orm import Assistant as AssistantORM
+from agent_server.models import User
+
+
+def _assistant_row() -> AssistantORM:
+    return AssistantORM(
+        assistant_id="test-assistant",
+        graph_id="test-graph",
+        config={},
+        context={},
+        metadata_dict={"team": "assistant", "owner": "assistant"},
+        created_at=datetime.now(UTC),
+        updated_at=datetime.now(UTC),
+    )
+
+
+class TestCreateRunRecord:
+    """Test that a run is created with one read, one write and one commit."""
+
+    @pytest.mark.asyncio
+    async def test_run_insert_carries_thread_update(self):
+        """Test the thread update rides on the run insert and metadata is handed on."""
+        request = MagicMock()
+        request.assistant_id = "test-assistant"
+        request.input = {"message": "hi"}
+        request.command = None
+        request.config = {}
+        request.context = None
+        request.checkpoint = None
+        request.stream_mode = "values"
+        request.interrupt_before = None
+        request.interrupt_after = None
+        request.multitask_strategy = None
+        request.stream_subgraphs = False
+
+        session = AsyncMock()
+        creation_read = MagicMock()
+        creation_read.one_or_none.return_value = (
+            "idle",
+            {"owner": "thread"},
+            _assistant_row(),
+            None,
+        )
+        session.execute.side_effect = [creation_read, MagicMock()]
+        executor = MagicMock()
+
+        with (
+            patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
+            patch(
+                "agent_server.api.runs.resolve_assistant_id",
+                return_value="test-assistant",
+            ),
+            patch("agent_server.api.runs.uuid4", return_value="run-1"),
+            patch("agent_server.api.runs.run_executor", executor),
+            patch(
+                "agent_server.api.runs.execute_run_async", new_callable=AsyncMock
+            ) as mock_execute,
+            patch("agent_server.api.runs.active_runs", {}),
+        ):
+            mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
+            run = await create_run(
+                "test-thread", request, User(identity="test-user"), session
+            )
+
+            _, run_factory = executor.submit.call_args.args
+            await run_factory()
+
+        assert run.status == "pending"
+        assert session.execute.await_count == 2
+        session.commit.assert_awaited_once()
+        insert_run = str(
+            session.execute.call_args_list[1]
+            .args[0]
+            .compile(dialect=postgresql.dialect())
+        )
+        assert insert_run.startswith("WITH busy_thread AS")
+        assert "INSERT INTO runs" in insert_run
+        # Thread metadata wins over the assistant's, and the executor gets it
+        assert mock_execute.call_args.kwargs["metadata"] == {
+            "team": "assistant",
+            "owner": "thread",
+            "assistant_id": "test-assistant",
+            "graph_id": "test-graph",
+        }
@@ -0,0 +1,194 @@
+"""Unit tests for multitask_strategy='enqueue' and the per-thread run queue."""
+
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from agent_server.api.runs import (
+    _handle_multitask_strategy,
+    start_next_queued_run,
+    wait_for_run,
+)
+from agent_server.core.orm import Assistant as AssistantORM
+from agent_server.core.orm import Run as RunORM
+from agent_server.models import User
+from agent_server.services.run_completion import RUN_WAIT_TIMEOUT
+
+
+def _run_row(run_id: str, status: str, kwargs: dict | None = None) -> RunORM:
+    return RunORM(
+        run_id=run_id,
+        thread_id="test-thread",
+        assistant_id="test-assistant",
+        status=status,
+        input={"message": "hi"},
+        config={},
+        context={},
+        kwargs=kwargs,
+        user_id="test-user",
+        created_at=datetime.now(UTC),
+        updated_at=datetime.now(UTC),
+        output=None,
+        error_message=None,
+    )
+
+
+def _assistant_row() -> AssistantORM:
+    return AssistantORM(
+        assistant_id="test-assistant",
+        graph_id="test-graph",
+        config={},
+        context={},
+        created_at=datetime.now(UTC),
+        updated_at=datetime.now(UTC),
+    )
+
+
+def _session_maker(session: AsyncMock) -> MagicMock:
+    """A session maker whose sessions are the given mock"""
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=session)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return MagicMock(return_value=context)
+
+
+class TestEnqueueStrategy:
+    """Test that enqueued runs wait in the thread's queue."""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_only_queues_behind_an_active_run(self):
+        """Test the strategy queues the run only when the thread is occupied."""
+        assert await _handle_multitask_strategy("test-thread", "enqueue", "run-1")
+        assert not await _handle_multitask_strategy("test-thread", "enqueue", None)
+
+    @pytest.mark.asyncio
+    async def test_wait_for_run_enqueued_is_persisted_but_not_started(self):
+        """Test a queued run is stored as 'queued' and awaited until it ends."""
+        request = MagicMock()
+        request.assistant_id = "test-assistant"
+        request.input = {"message": "hi"}
+        request.command = None
+        request.config = {}
+        request.context = None
+        request.checkpoint = None
+        request.stream_mode = "values"
+        request.interrupt_before = None
+        request.interrupt_after = None
+        request.multitask_strategy = "enqueue"
+        request.stream_subgraphs = False
+
+        session = AsyncMock()
+        creation_read = MagicMock()
+        creation_read.one_or_none.return_value = (
+            "busy",
+            {},
+            _assistant_row(),
+            "run-1",
+        )
+        session.execute.side_effect = [creation_read, MagicMock()]
+        session.scalars.return_value = MagicMock(all=MagicMock(return_value=["run-2"]))
+        session.scalar.return_value = _run_row("run-2", "completed")
+        executor = MagicMock()
+
+        with (
+            patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
+            patch(
+                "agent_server.api.runs.resolve_assistant_id",
+                return_value="test-assistant",
+            ),
+            patch("agent_server.api.runs.uuid4", return_value="run-2"),
+            patch("agent_server.api.runs.run_executor", executor),
+            patch(
+                "agent_server.api.runs.run_completion.wait",
+                new_callable=AsyncMock,
+                return_value="completed",
+            ) as mock_wait_end,
+        ):
+            mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
+            await wait_for_run(
+                "test-thread", request, User(identity="test-user"), session
+            )
+
+        insert_run = (
+            session.execute.call_args_list[1]
+            .args[0]
+            .compile(dialect=postgresql.dialect())
+        )
+        assert insert_run.params["status"] == "queued"
+        assert insert_run.params["kwargs"]["stream_mode"] == "values"
+        assert insert_run.params["kwargs"]["user"]["identity"] == "test-user"
+        # The thread is left as it is for the run ahead of this one
+        assert "UPDATE thread" not in str(insert_run)
+        session.commit.assert_awaited_once()
+        executor.submit.assert_not_called()
+        mock_wait_end.assert_awaited_once_with("run-2", RUN_WAIT_TIMEOUT)
+
+
+class TestStartNextQueuedRun:
+    """Test the hand-off from a finished run to the next queued one."""
+
+    @pytest.mark.asyncio
+    async def test_starts_oldest_queued_run_with_stored_kwargs(self):
+        """Test the claimed run is submitted with its stored arguments."""
+        session = AsyncMock()
+        queued = _run_row(
+            "run-2",
+            "pending",
+            kwargs={"stream_mode": "updates", "user": {"identity": "test-user"}},
+        )
+        session.scalar.side_effect = [None, queued, _assistant_row()]
+        executor = MagicMock()
+        active: dict = {}
+
+        with (
+            patch(
+                "agent_server.api.runs._get_session_maker",
+                return_value=_session_maker(session),
+            ),
+            patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
+            patch(
+                "agent_server.api.runs.set_thread_status", new_callable=AsyncMock
+            ) as mock_set_status,
+            patch(
+                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
+            ),
+            patch(
+                "agent_server.api.runs.execute_run_async", new_callable=AsyncMock
+            ) as mock_execute,
+            patch("agent_server.api.runs.run_executor", executor),
+            patch("agent_server.api.runs.active_runs", active),
+        ):
+            mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
+            assert await start_next_queued_run("test-thread") == "run-2"
+
+            run_id, run_factory = executor.submit.call_args.args
+            await run_factory()
+
+        assert run_id == "run-2"
+        assert active["run-2"] is executor.submit.return_value
+        mock_set_status.assert_awaited_once_with(session, "test-thread", "busy")
+        args = mock_execute.call_args.args
+        assert args[:3] == ("run-2", "test-thread", "test-graph")
+        assert args[4].identity == "test-user"
+        assert args[7] == "updates"
+
+    @pytest.mark.asyncio
+    async def test_nothing_starts_while_thread_has_an_active_run(self):
+        """Test a thread with a running run keeps its queue waiting."""
+        session = AsyncMock()
+        session.scalar.side_effect = ["run-1"]
+        executor = MagicMock()
+
+        with (
+            patch(
+                "agent_server.api.runs._get_session_maker",
+                return_value=_session_maker(session),
+            ),
+            patch("agent_server.api.runs.run_executor", executor),
+        ):
+            assert await start_next_queued_run("test-thread") is None
+
+        executor.submit.assert_not_called()
+        session.commit.assert_awaited_once()
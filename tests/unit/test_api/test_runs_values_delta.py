@@ -0,0 +1,102 @@
+"""Unit tests for values-delta events emitted by background run execution."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from agent_server.api.runs import execute_run_async
+from agent_server.core.serializers.offload import serialize_offloaded
+from agent_server.models import User
+
+# Long enough for a patch to be smaller than the state
+FIRST = "a" * 100
+
+
+async def _run_with_modes(stream_mode: list[str]) -> list[tuple[str, object]]:
+    """Execute a two-step run and return the (event id, event) pairs emitted"""
+
+    async def astream(*args, **kwargs):
+        yield ("values", {"items": [FIRST]})
+        yield ("updates", {"node": {"items": [FIRST, "b"]}})
+        yield ("values", {"items": [FIRST, "b"]})
+
+    graph = MagicMock()
+    graph.astream = astream
+    streaming = MagicMock()
+    streaming.coalesce_messages = lambda run_id, events: events
+    streaming.put_to_broker = AsyncMock(side_effect=lambda *args, **kwargs: args)
+    for method in ("store_encoded_event", "flush_events", "cleanup_run"):
+        setattr(streaming, method, AsyncMock())
+
+    with (
+        patch("agent_server.api.runs.update_run_status", new_callable=AsyncMock),
+        patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
+        patch("agent_server.api.runs.start_next_queued_run", new_callable=AsyncMock),
+        patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
+        patch("agent_server.api.runs.create_run_config", return_value={}),
+        patch("agent_server.api.runs.streaming_service", streaming),
+        patch("agent_server.api.runs.event_compactor"),
+    ):
+        mock_lg_service.return_value.get_graph = AsyncMock(return_value=graph)
+        await execute_run_async(
+            "run-1",
+            "thread-1",
+            "test-graph",
+            {},
+            User(identity="test-user"),
+            stream_mode=stream_mode,
+            session=AsyncMock(),
+            metadata={},
+        )
+
+    return [call.args[1:3] for call in streaming.put_to_broker.call_args_list]
+
+
+class TestValuesDeltaStream:
+    """Test values-delta converts values only when values itself is not wanted."""
+
+    @pytest.mark.asyncio
+    async def test_delta_replaces_values_when_values_not_requested(self):
+        """Test values events are sent as deltas alone"""
+        events = await _run_with_modes(["values-delta"])
+
+        modes = [event[0] for _, event in events]
+        assert modes == ["values-delta", "updates", "values-delta"]
+        assert events[0][1] == ("values-delta", {"snapshot": {"items": [FIRST]}})
+
+    @pytest.mark.asyncio
+    async def test_delta_follows_values_when_both_requested(self):
+        """Test each values event is sent as is, followed by its delta"""
+        events = await _run_with_modes(["values", "values-delta"])
+
+        assert [event_id for event_id, _ in events] == [
+            f"run-1_event_{n}" for n in range(1, 6)
+        ]
+        assert [event for _, event in events] == [
+            ("values", {"items": [FIRST]}),
+            ("values-delta", {"snapshot": {"items": [FIRST]}}),
+            ("updates", {"node": {"items": [FIRST, "b"]}}),
+            ("values", {"items": [FIRST, "b"]}),
+            (
+                "values-delta",
+                {"patch": [{"op": "add", "path": "/items/1", "value": "b"}]},
+            ),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_large_states_are_diffed_off_the_event_loop(self):
+        """Test offloaded delta encoding keeps the encoder's previous state"""
+        inline = await _run_with_modes(["values-delta"])
+        with (
+            patch(
+                "agent_server.core.serializers.offload.SERIALIZE_OFFLOAD_THRESHOLD", 1
+            ),
+            patch(
+                "agent_server.api.runs.serialize_offloaded", wraps=serialize_offloaded
+            ) as offloaded,
+        ):
+            events = await _run_with_modes(["values-delta"])
+
+        assert events == inline
+        assert offloaded.call_count == 3
+        assert all(call.kwargs == {"stateful": True} for call in offloaded.mock_calls)
@@ -1,6 +1,5 @@
 """Unit tests for wait_for_run endpoint exception paths and edge cases."""
 
-import asyncio
 from datetime import UTC, datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
@@ -14,6 +13,13 @@ from agent_server.core.orm import Run as RunORM
 from agent_server.models import User
 
 
+def _creation_read(session: AsyncMock, assistant: AssistantORM) -> None:
+    """Make the run-creation query find an idle thread and the assistant."""
+    result = MagicMock()
+    result.one_or_none.return_value = ("idle", {}, assistant, None)
+    session.execute.return_value = result
+
+
 class TestWaitForRunExceptionPaths:
     """Test exception handling and edge cases in wait_for_run endpoint."""
 
@@ -68,48 +74,45 @@ class TestWaitForRunExceptionPaths:
             error_message=None,
         )
 
-        # Configure session.scalar to return assistant then run
-        session.scalar.side_effect = [assistant, run_orm]
+        # Creation reads the thread and assistant, then the run is re-read
+        _creation_read(session, assistant)
+        session.scalar.return_value = run_orm
         session.refresh = AsyncMock()
 
         # Mock dependencies
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
 
-            # Make wait_for raise TimeoutError
-            mock_wait_for.side_effect = TimeoutError()
+            # The run is still going when the timeout expires
+            mock_await_run_end.return_value = False
 
             # Mock the task
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             # Call the endpoint
             result = await wait_for_run(thread_id, request, user, session)
+            assert mock_executor.submit.call_args.args[0] == run_id
 
             # Verify timeout was handled and partial output returned
             assert result == {"partial": "output"}
-            assert mock_wait_for.called
+            assert mock_await_run_end.called
 
     @pytest.mark.asyncio
     async def test_wait_for_run_cancelled(self):
-        """Test that CancelledError is handled gracefully."""
+        """Test that a run cancelled while waited on returns its empty output."""
         thread_id = "test-thread-123"
         run_id = str(uuid4())
         user = User(identity="test-user", scopes=[])
@@ -153,40 +156,37 @@ class TestWaitForRunExceptionPaths:
             error_message=None,
         )
 
-        session.scalar.side_effect = [assistant, run_orm]
+        _creation_read(session, assistant)
+        session.scalar.return_value = run_orm
         session.refresh = AsyncMock()
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
-            mock_wait_for.side_effect = asyncio.CancelledError()
+            mock_await_run_end.return_value = True
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             result = await wait_for_run(thread_id, request, user, session)
+            assert mock_executor.submit.call_args.args[0] == run_id
 
             assert result == {}
-            assert mock_wait_for.called
+            assert mock_await_run_end.called
 
     @pytest.mark.asyncio
     async def test_wait_for_run_generic_exception(self):
-        """Test that generic Exception is handled gracefully."""
+        """Test that a run failing with an exception returns its empty output."""
         thread_id = "test-thread-123"
         run_id = str(uuid4())
         user = User(identity="test-user", scopes=[])
@@ -230,36 +230,33 @@ class TestWaitForRunExceptionPaths:
             error_message="Something went wrong",
         )
 
-        session.scalar.side_effect = [assistant, run_orm]
+        _creation_read(session, assistant)
+        session.scalar.return_value = run_orm
         session.refresh = AsyncMock()
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
-            mock_wait_for.side_effect = Exception("Test exception")
+            mock_await_run_end.return_value = True
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             result = await wait_for_run(thread_id, request, user, session)
+            assert mock_executor.submit.call_args.args[0] == run_id
 
             assert result == {}
-            assert mock_wait_for.called
+            assert mock_await_run_end.called
 
     @pytest.mark.asyncio
     async def test_wait_for_run_disappeared(self):
@@ -293,37 +290,34 @@ class TestWaitForRunExceptionPaths:
         )
 
         # First call returns assistant, second call returns None (run disappeared)
-        session.scalar.side_effect = [assistant, None]
+        _creation_read(session, assistant)
+        session.scalar.return_value = None
         session.refresh = AsyncMock()
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
-            mock_wait_for.return_value = None  # Task completes normally
+            mock_await_run_end.return_value = True  # Run ends normally
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             with pytest.raises(HTTPException) as exc_info:
                 await wait_for_run(thread_id, request, user, session)
 
             assert exc_info.value.status_code == 500
             assert "disappeared during execution" in exc_info.value.detail
+            assert mock_executor.submit.call_args.args[0] == run_id
 
     @pytest.mark.asyncio
     async def test_wait_for_run_failed_status(self):
@@ -371,34 +365,31 @@ class TestWaitForRunExceptionPaths:
             error_message="Graph execution error",
         )
 
-        session.scalar.side_effect = [assistant, run_orm]
+        _creation_read(session, assistant)
+        session.scalar.return_value = run_orm
         session.refresh = AsyncMock()
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
             patch("agent_server.api.runs.logger") as mock_logger,
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
-            mock_wait_for.return_value = None
+            mock_await_run_end.return_value = True
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             result = await wait_for_run(thread_id, request, user, session)
+            assert mock_executor.submit.call_args.args[0] == run_id
 
             # Verify output returned and error logged
             assert result == {"error": "execution failed"}
@@ -450,33 +441,30 @@ class TestWaitForRunExceptionPaths:
             error_message=None,
         )
 
-        session.scalar.side_effect = [assistant, run_orm]
+        _creation_read(session, assistant)
+        session.scalar.return_value = run_orm
         session.refresh = AsyncMock()
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
-            mock_wait_for.return_value = None
+            mock_await_run_end.return_value = True
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             result = await wait_for_run(thread_id, request, user, session)
+            assert mock_executor.submit.call_args.args[0] == run_id
 
             assert result == {"partial": "result", "__interrupt__": [{"value": "test"}]}
 
@@ -526,33 +514,30 @@ class TestWaitForRunExceptionPaths:
             error_message=None,
         )
 
-        session.scalar.side_effect = [assistant, run_orm]
+        _creation_read(session, assistant)
+        session.scalar.return_value = run_orm
         session.refresh = AsyncMock()
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
-            mock_wait_for.return_value = None
+            mock_await_run_end.return_value = True
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             result = await wait_for_run(thread_id, request, user, session)
+            assert mock_executor.submit.call_args.args[0] == run_id
 
             assert result == {}
 
@@ -586,21 +571,14 @@ class TestWaitForRunExceptionPaths:
             updated_at=datetime.now(UTC),
         )
 
-        session.scalar.return_value = assistant
+        _creation_read(session, assistant)
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
         ):
             # Graph list doesn't include assistant's graph
             mock_lg_service.return_value.list_graphs.return_value = ["other-graph"]
@@ -658,33 +636,30 @@ class TestWaitForRunExceptionPaths:
             error_message=None,
         )
 
-        session.scalar.side_effect = [assistant, run_orm]
+        _creation_read(session, assistant)
+        session.scalar.return_value = run_orm
         session.refresh = AsyncMock()
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
-            mock_wait_for.return_value = None
+            mock_await_run_end.return_value = True
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             result = await wait_for_run(thread_id, request, user, session)
+            assert mock_executor.submit.call_args.args[0] == run_id
 
             assert result == {"result": "success"}
 
@@ -734,32 +709,56 @@ class TestWaitForRunExceptionPaths:
             error_message=None,
         )
 
-        session.scalar.side_effect = [assistant, run_orm]
+        _creation_read(session, assistant)
+        session.scalar.return_value = run_orm
         session.refresh = AsyncMock()
 
         with (
-            patch(
-                "agent_server.api.runs._validate_resume_command", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.get_langgraph_service") as mock_lg_service,
             patch(
                 "agent_server.api.runs.resolve_assistant_id",
                 return_value="test-assistant",
             ),
-            patch("agent_server.api.runs.set_thread_status", new_callable=AsyncMock),
-            patch(
-                "agent_server.api.runs.update_thread_metadata", new_callable=AsyncMock
-            ),
             patch("agent_server.api.runs.uuid4", return_value=run_id),
-            patch("agent_server.api.runs.asyncio.create_task") as mock_create_task,
-            patch("agent_server.api.runs.asyncio.wait_for") as mock_wait_for,
+            patch("agent_server.api.runs.run_executor") as mock_executor,
+            patch(
+                "agent_server.api.runs._await_run_end", new_callable=AsyncMock
+            ) as mock_await_run_end,
             patch("agent_server.api.runs.active_runs", {}),
         ):
             mock_lg_service.return_value.list_graphs.return_value = ["test-graph"]
-            mock_wait_for.return_value = None
+            mock_await_run_end.return_value = True
             mock_task = AsyncMock()
-            mock_create_task.return_value = mock_task
+            mock_executor.submit.return_value = mock_task
 
             result = await wait_for_run(thread_id, request, user, session)
+            assert mock_executor.submit.call_args.args[0] == run_id
 
             assert result == {"result": "success"}
+
+
+class TestRunAdmission:
+    """Test that a full run queue rejects new runs before they are created."""
+
+    @pytest.mark.asyncio
+    async def test_wait_for_run_rejected_when_queue_full(self):
+        """Test that a 429 with Retry-After is raised and nothing is persisted."""
+        from agent_server.services.run_executor import RunExecutor
+
+        executor = RunExecutor(max_concurrency=1, max_queue=0)
+        executor._running = 1
+        request = MagicMock()
+        request.command = None
+        session = AsyncMock()
+
+        with (
+            patch("agent_server.api.runs.run_executor", executor),
+            pytest.raises(HTTPException) as exc_info,
+        ):
+            await wait_for_run(
+                "test-thread", request, User(identity="u", scopes=[]), session
+            )
+
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.headers["Retry-After"] == "1"
+        session.add.assert_not_called()
@@ -0,0 +1,83 @@
+"""Tests for the binary run event storage format"""
+
+from datetime import UTC, datetime
+
+import pytest
+
+from src.agent_server.core.event_codec import (
+    FORMAT_JSONB,
+    FORMAT_ZSTD,
+    TAG_RAW,
+    EventPayloadCodec,
+    train_dictionary,
+)
+from src.agent_server.core.sse import SSEEvent, create_values_event
+from src.agent_server.services.event_converter import EventConverter
+
+zstandard = pytest.importorskip("zstandard")
+
+FRAMES = [
+    create_values_event(
+        {"messages": [{"type": "ai", "content": f"respuesta {i} " * 10}]},
+        f"run-1_event_{i}",
+    )
+    for i in range(300)
+]
+
+
+class TestEventPayloadCodec:
+    """Test encoding frames into stored payloads"""
+
+    def test_round_trip(self):
+        """Test a compressed frame decodes to the same frame"""
+        codec = EventPayloadCodec(FORMAT_ZSTD)
+
+        payload = codec.encode(FRAMES[0])
+
+        assert codec.binary
+        assert len(payload) < len(FRAMES[0].encode())
+        assert codec.decode(payload) == FRAMES[0]
+
+    def test_raw_payload(self):
+        """Test uncompressed payloads are read as plain UTF-8"""
+        codec = EventPayloadCodec(FORMAT_ZSTD)
+        assert codec.decode(TAG_RAW + "data: ñ\n\n".encode()) == "data: ñ\n\n"
+
+    def test_dictionary_improves_small_frames(self):
+        """Test a trained dictionary shrinks frames and still round-trips"""
+        dictionary = train_dictionary([f.encode() for f in FRAMES], size=4096)
+        plain = EventPayloadCodec(FORMAT_ZSTD)
+        trained = EventPayloadCodec(FORMAT_ZSTD, dictionary=dictionary)
+
+        payload = trained.encode(FRAMES[7])
+
+        assert len(payload) < len(plain.encode(FRAMES[7]))
+        assert trained.decode(payload) == FRAMES[7]
+
+    def test_unknown_format_falls_back_to_jsonb(self):
+        """Test an unsupported storage format keeps JSONB storage"""
+        codec = EventPayloadCodec("lz4")
+        assert codec.storage_format == FORMAT_JSONB
+        assert not codec.binary
+
+    def test_unknown_tag_is_rejected(self):
+        """Test payloads with an unknown tag raise"""
+        with pytest.raises(ValueError):
+            EventPayloadCodec(FORMAT_ZSTD).decode(b"\x7fdata")
+
+
+class TestConvertStoredPayload:
+    """Test replay of events stored in the binary format"""
+
+    def test_convert_stored_to_sse_returns_stored_frame(self):
+        """Test a binary stored event replays its frame verbatim"""
+        codec = EventPayloadCodec(FORMAT_ZSTD)
+        event = SSEEvent(
+            id="run-1_event_1",
+            event="values",
+            data=None,
+            timestamp=datetime.now(UTC),
+            payload=codec.encode(FRAMES[1]),
+        )
+
+        assert EventConverter().convert_stored_to_sse(event) == FRAMES[1]
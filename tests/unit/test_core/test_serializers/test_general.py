@@ -239,6 +239,75 @@ class TestGeneralSerializer:
         assert self.serializer.serialize(-3.14) == -3.14
 
 
+class TestGeneralSerializerDispatch:
+    """Test the per-class handler cache and custom type registration"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.serializer = GeneralSerializer()
+
+    def test_handler_is_resolved_once_per_class(self):
+        """Test later objects of a class reuse the cached handler"""
+        self.serializer.serialize(PydanticV2Model(name="a", value=1))
+        handler = GeneralSerializer._dispatch[PydanticV2Model]
+
+        result = self.serializer.serialize(PydanticV2Model(name="b", value=2))
+
+        assert result == {"name": "b", "value": 2}
+        assert GeneralSerializer._dispatch[PydanticV2Model] is handler
+
+    def test_cache_is_shared_between_instances(self):
+        """Test a class resolved by one serializer is cached for all"""
+        self.serializer.serialize(PydanticV1Style("a", 1))
+        assert PydanticV1Style in GeneralSerializer()._dispatch
+
+    def test_registered_handler_takes_precedence(self):
+        """Test a registered handler applies to the type and its subclasses"""
+
+        class Money:
+            def __init__(self, cents):
+                self.cents = cents
+
+            def dict(self):
+                return {"cents": self.cents}
+
+        class Euro(Money):
+            pass
+
+        assert self.serializer.serialize(Money(5)) == {"cents": 5}
+        GeneralSerializer.register(Money, lambda m: f"{m.cents / 100:.2f}")
+        try:
+            assert self.serializer.serialize(Money(250)) == "2.50"
+            assert self.serializer.serialize([Euro(100)]) == ["1.00"]
+        finally:
+            GeneralSerializer.unregister(Money)
+
+        assert self.serializer.serialize(Money(5)) == {"cents": 5}
+
+    def test_classes_do_not_share_a_handler(self):
+        """Test class objects are resolved each time, not cached under type"""
+
+        class Legacy:
+            @staticmethod
+            def dict():
+                return {"x": 1}
+
+        class Plain:
+            pass
+
+        assert self.serializer.serialize(Legacy) == {"x": 1}
+        assert self.serializer.serialize(Plain) == str(Plain)
+        assert type not in GeneralSerializer._dispatch
+
+    def test_interrupt_mock_resolves_per_class(self):
+        """Test Interrupt detection still works through the cache"""
+        first = self.serializer.serialize(InterruptMock({"a": 1}, "i-1"))
+        second = self.serializer.serialize(InterruptMock([1, 2], "i-2"))
+
+        assert first == {"value": {"a": 1}, "id": "i-1"}
+        assert second == {"value": [1, 2], "id": "i-2"}
+
+
 class MockTask:
     """Mock LangGraph task"""
 
@@ -0,0 +1,141 @@
+"""Unit tests for the pluggable JSON codecs"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime
+from enum import Enum, IntEnum
+from typing import NamedTuple
+
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.types import Interrupt
+
+from src.agent_server.core.serializers.json_codec import (
+    OrjsonJSONCodec,
+    StdlibJSONCodec,
+    create_json_codec,
+)
+
+orjson = pytest.importorskip("orjson")
+
+CODECS = [StdlibJSONCodec(), OrjsonJSONCodec()]
+
+
+class Task(NamedTuple):
+    id: str
+    name: str
+
+
+class Color(Enum):
+    RED = "red"
+
+
+class Level(IntEnum):
+    HIGH = 3
+
+
+@dataclass
+class Step:
+    name: str
+    color: Color
+    at: datetime
+    levels: list[Level] = field(default_factory=list)
+
+
+def _payload():
+    return {
+        "messages": [AIMessage(content="hola ñandú", id="msg-1")],
+        "__interrupt__": [Interrupt(value={"question": "ok?"}, id="int-1")],
+        "task": Task("t-1", "agent"),
+        "tags": {"a"},
+        "nested": {"n": 1, "f": 1.5, "none": None, "flag": True},
+    }
+
+
+class TestJSONCodecs:
+    """Test both codecs produce the same JSON"""
+
+    @pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+    def test_encodes_langgraph_objects(self, codec):
+        """Test messages, interrupts, NamedTuples and sets are encoded"""
+        # NamedTuples are tuples to the json module, so they become arrays
+        decoded = json.loads(codec.dumps(_payload()))
+
+        assert decoded["messages"][0]["content"] == "hola ñandú"
+        assert decoded["messages"][0]["type"] == "ai"
+        assert decoded["__interrupt__"] == [
+            {"value": {"question": "ok?"}, "id": "int-1"}
+        ]
+        assert decoded["task"] == ["t-1", "agent"]
+        assert decoded["tags"] == ["a"]
+        assert decoded["nested"] == {"n": 1, "f": 1.5, "none": None, "flag": True}
+
+    def test_codecs_agree(self):
+        """Test the native codec decodes to the same value as the fallback"""
+        stdlib, native = CODECS
+        assert native.loads(native.dumps(_payload())) == stdlib.loads(
+            stdlib.dumps(_payload())
+        )
+
+    def test_codecs_encode_dataclasses_and_datetimes_alike(self):
+        """Test datetimes and dataclasses reach the serializer under orjson"""
+        at = datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=UTC)
+        step = Step("plan", Color.RED, at, [Level.HIGH])
+        payload = {
+            "level": Level.HIGH,
+            "step": step,
+            "aware": at,
+            "naive": datetime(2025, 1, 2, 3, 4, 5),
+            "day": date(2025, 1, 2),
+        }
+        stdlib, native = CODECS
+
+        assert stdlib.dumps(payload) == native.dumps(payload)
+        assert json.loads(native.dumps(payload)) == {
+            "level": 3,
+            "step": str(step),
+            "aware": "2025-01-02 03:04:05.678901+00:00",
+            "naive": "2025-01-02 03:04:05",
+            "day": "2025-01-02",
+        }
+
+    def test_plain_enums_differ_between_codecs(self):
+        """Test orjson encodes plain Enum members natively, by value"""
+        stdlib, native = CODECS
+
+        assert stdlib.dumps({"color": Color.RED}) == '{"color":"Color.RED"}'
+        assert native.dumps({"color": Color.RED}) == '{"color":"red"}'
+
+    def test_output_is_compact(self):
+        """Test frames carry no whitespace between tokens"""
+        for codec in CODECS:
+            assert codec.dumps({"a": [1, 2], "b": {"c": None}}) == (
+                '{"a":[1,2],"b":{"c":null}}'
+            )
+
+    def test_custom_default_receives_datetimes(self):
+        """Test a caller's default keeps control over datetimes"""
+        value = {"at": datetime(2025, 1, 1, tzinfo=UTC)}
+
+        encoded = OrjsonJSONCodec().dumps(value, default=lambda o: "custom")
+
+        assert json.loads(encoded) == {"at": "custom"}
+
+    def test_falls_back_for_values_orjson_rejects(self):
+        """Test integers beyond 64 bits are still encoded"""
+        assert OrjsonJSONCodec().dumps({"big": 2**70}) == f'{{"big":{2**70}}}'
+
+    def test_non_string_keys(self):
+        """Test integer keys are encoded as strings like the json module"""
+        for codec in CODECS:
+            assert codec.dumps({1: "a"}) == '{"1":"a"}'
+
+
+class TestCreateJSONCodec:
+    """Test codec selection"""
+
+    def test_selects_codec_by_name(self):
+        """Test known names select their codec and unknown ones the stdlib"""
+        assert create_json_codec("orjson").name == "orjson"
+        assert create_json_codec("stdlib").name == "stdlib"
+        assert create_json_codec("unknown").name == "stdlib"
@@ -0,0 +1,102 @@
+"""Unit tests for size-aware serialization offloading"""
+
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.agent_server.core.serializers.offload import (
+    estimate_size,
+    is_large,
+    serialize_offloaded,
+    shutdown_serialization_pool,
+)
+
+OFFLOAD = "src.agent_server.core.serializers.offload"
+
+
+def _thread_name(_payload) -> str:
+    return threading.current_thread().name
+
+
+def _process_id(_payload) -> int:
+    return os.getpid()
+
+
+class TestEstimateSize:
+    """Test the payload size estimate"""
+
+    def test_counts_strings_in_containers(self):
+        """Test nested strings and keys are counted"""
+        size = estimate_size({"messages": ["a" * 100, ("b" * 50,)]}, 10_000)
+        assert 150 < size < 200
+
+    def test_walks_object_attributes(self):
+        """Test message objects are sized by their content"""
+        message = AIMessage(content="x" * 5000)
+        assert estimate_size({"messages": [message]}, 100_000) > 5000
+
+    def test_stops_at_limit(self):
+        """Test the walk ends once the limit is reached"""
+        payload = [["x" * 1000] for _ in range(1000)]
+        assert estimate_size(payload, 5000) < 10_000
+
+    def test_threshold_zero_disables_offload(self):
+        """Test a zero threshold treats every payload as small"""
+        assert not is_large("x" * 10_000, threshold=0)
+        assert is_large("x" * 10_000, threshold=1000)
+
+
+class TestSerializeOffloaded:
+    """Test where serialization runs"""
+
+    @pytest.mark.asyncio
+    async def test_small_payload_runs_inline(self):
+        """Test small payloads are serialized on the event loop thread"""
+        name = await serialize_offloaded(_thread_name, {"a": 1})
+        assert name == threading.current_thread().name
+
+    @pytest.mark.asyncio
+    async def test_large_payload_runs_in_pool(self):
+        """Test large payloads are serialized in the worker pool"""
+        with patch(
+            "src.agent_server.core.serializers.offload.SERIALIZE_OFFLOAD_THRESHOLD",
+            1000,
+        ):
+            name = await serialize_offloaded(_thread_name, {"a": "x" * 5000})
+        assert name.startswith("serialize")
+
+    @pytest.mark.asyncio
+    async def test_explicit_payload_is_size_checked(self):
+        """Test the payload argument decides instead of the first argument"""
+        with patch(
+            "src.agent_server.core.serializers.offload.SERIALIZE_OFFLOAD_THRESHOLD",
+            1000,
+        ):
+            name = await serialize_offloaded(_thread_name, None, payload="x" * 5000)
+        assert name.startswith("serialize")
+
+    @pytest.mark.asyncio
+    async def test_process_pool_takes_picklable_calls(self):
+        """Test large payloads go to worker processes when configured"""
+        large = {"a": "x" * 5000}
+        with (
+            patch(f"{OFFLOAD}.SERIALIZE_OFFLOAD_THRESHOLD", 1000),
+            patch(f"{OFFLOAD}.SERIALIZE_OFFLOAD_PROCESSES", 1),
+        ):
+            try:
+                pid = await serialize_offloaded(_process_id, large)
+                # Local functions can't be pickled, so they stay in threads
+                name = await serialize_offloaded(
+                    lambda payload: _thread_name(payload), large
+                )
+                # Calls updating state here must not run in a copy of it
+                stateful = await serialize_offloaded(_thread_name, large, stateful=True)
+            finally:
+                shutdown_serialization_pool()
+
+        assert pid != os.getpid()
+        assert name.startswith("serialize")
+        assert stateful.startswith("serialize")
@@ -0,0 +1,118 @@
+"""Tests for compressed SSE streaming"""
+
+import zlib
+from unittest.mock import patch
+
+import pytest
+
+from src.agent_server.core.sse import create_values_event
+from src.agent_server.core.sse_compression import (
+    SSECompressor,
+    compress_sse_stream,
+    create_sse_compressor,
+    create_sse_response,
+    negotiate_sse_encoding,
+)
+
+FRAMES = [
+    create_values_event({"messages": [{"content": "hola " * 20}]}, f"run_event_{i}")
+    for i in range(5)
+]
+
+
+async def frames():
+    for frame in FRAMES:
+        yield frame
+
+
+def decoder_for(encoding: str):
+    """Return an incremental decode function for an encoding"""
+    if encoding == "gzip":
+        return zlib.decompressobj(31).decompress
+    if encoding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        return zstandard.ZstdDecompressor().decompressobj().decompress
+    brotli = pytest.importorskip("brotli")
+    return brotli.Decompressor().process
+
+
+class TestNegotiation:
+    """Test Accept-Encoding negotiation"""
+
+    def test_identity_without_header(self):
+        assert negotiate_sse_encoding(None) is None
+        assert negotiate_sse_encoding("") is None
+        assert negotiate_sse_encoding("identity") is None
+
+    def test_client_quality_wins(self):
+        """Test that q-values take precedence over server preference"""
+        assert negotiate_sse_encoding("gzip;q=1.0, zstd;q=0.5") == "gzip"
+
+    def test_server_preference_breaks_ties(self):
+        """Test that zstd is preferred over gzip when both are acceptable"""
+        pytest.importorskip("zstandard")
+        assert negotiate_sse_encoding("gzip, deflate, zstd") == "zstd"
+
+    def test_rejected_and_wildcard_codings(self):
+        """Test q=0 exclusions and wildcard acceptance"""
+        assert negotiate_sse_encoding("gzip;q=0") is None
+        assert negotiate_sse_encoding("*;q=0.1, zstd;q=0, br;q=0") == "gzip"
+
+    def test_disabled_by_configuration(self):
+        """Test that SSE_COMPRESSION=none disables compression"""
+        with patch("src.agent_server.core.sse_compression.SSE_COMPRESSION", "none"):
+            assert negotiate_sse_encoding("gzip") is None
+
+
+class TestCompressedStream:
+    """Test per-event flushed compression"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("encoding", ["gzip", "zstd", "br"])
+    async def test_each_event_is_decodable_on_arrival(self, encoding):
+        """Test that every compressed chunk decodes to exactly its event"""
+        decode = decoder_for(encoding)
+        compressor = create_sse_compressor(encoding)
+
+        chunks = [c async for c in compress_sse_stream(frames(), compressor)]
+
+        for chunk, frame in zip(chunks, FRAMES, strict=False):
+            assert decode(chunk) == frame.encode()
+        assert len(chunks) == len(FRAMES) + 1
+        assert sum(map(len, chunks)) < sum(len(f) for f in FRAMES) / 3
+
+    @pytest.mark.asyncio
+    async def test_context_is_shared_across_events(self):
+        """Test that repeated events compress against earlier ones"""
+        compressor = create_sse_compressor("gzip")
+
+        chunks = [c async for c in compress_sse_stream(frames(), compressor)]
+
+        # Later frames repeat the first one almost verbatim
+        assert len(chunks[1]) < len(chunks[0]) / 2
+
+    def test_compressors_must_implement_the_interface(self):
+        """Test that the base compressor and incomplete subclasses are abstract"""
+
+        class NoFinish(SSECompressor):
+            encoding = "test"
+
+            def compress(self, data: bytes) -> bytes:
+                return data
+
+        with pytest.raises(TypeError):
+            SSECompressor()
+        with pytest.raises(TypeError):
+            NoFinish()
+
+    def test_response_headers(self):
+        """Test that compressed responses advertise their coding"""
+        response = create_sse_response(frames(), "gzip", headers={"X-A": "1"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["x-a"] == "1"
+        assert response.media_type == "text/event-stream"
+
+        plain = create_sse_response(frames(), None)
+        assert "content-encoding" not in plain.headers
@@ -35,6 +35,8 @@ async def test_lifespan_registers_langfuse_provider(monkeypatch):
             "src.agent_server.main.get_langgraph_service"
         ) as mock_get_langgraph_service,
         patch("src.agent_server.main.event_store") as mock_event_store,
+        patch("src.agent_server.main.start_queued_runs", new_callable=AsyncMock),
+        patch("src.agent_server.main.run_completion") as mock_run_completion,
     ):
         # Setup mocks
         mock_db_manager.initialize = AsyncMock()
@@ -46,6 +48,8 @@ async def test_lifespan_registers_langfuse_provider(monkeypatch):
 
         mock_event_store.start_cleanup_task = AsyncMock()
         mock_event_store.stop_cleanup_task = AsyncMock()
+        mock_run_completion.start = AsyncMock()
+        mock_run_completion.stop = AsyncMock()
 
         # Clear the observability manager before test
         manager = get_observability_manager()
@@ -87,6 +91,11 @@ async def test_lifespan_calls_required_initialization():
             "src.agent_server.main.get_langgraph_service"
         ) as mock_get_langgraph_service,
         patch("src.agent_server.main.event_store") as mock_event_store,
+        patch("src.agent_server.main.broker_manager") as mock_broker_manager,
+        patch(
+            "src.agent_server.main.start_queued_runs", new_callable=AsyncMock
+        ) as mock_start_queued_runs,
+        patch("src.agent_server.main.run_completion") as mock_run_completion,
         patch(
             "src.agent_server.main.get_observability_manager"
         ) as mock_get_observability_manager,
@@ -101,6 +110,10 @@ async def test_lifespan_calls_required_initialization():
 
         mock_event_store.start_cleanup_task = AsyncMock()
         mock_event_store.stop_cleanup_task = AsyncMock()
+        mock_broker_manager.start_cleanup_task = AsyncMock()
+        mock_broker_manager.stop_cleanup_task = AsyncMock()
+        mock_run_completion.start = AsyncMock()
+        mock_run_completion.stop = AsyncMock()
 
         mock_manager = MagicMock()
         mock_get_observability_manager.return_value = mock_manager
@@ -115,6 +128,11 @@ async def test_lifespan_calls_required_initialization():
         mock_db_manager.initialize.assert_called_once()
         mock_langgraph_service.initialize.assert_called_once()
         mock_event_store.start_cleanup_task.assert_called_once()
+        mock_broker_manager.start_cleanup_task.assert_called_once()
+        mock_broker_manager.stop_cleanup_task.assert_called_once()
+        mock_start_queued_runs.assert_awaited_once()
+        mock_run_completion.start.assert_awaited_once()
+        mock_run_completion.stop.assert_awaited_once()
 
         # Verify observability manager was used to register provider
         mock_get_observability_manager.assert_called()
@@ -16,7 +16,8 @@ class TestRunBroker:
         broker = RunBroker("run-123")
 
         assert broker.run_id == "run-123"
-        assert broker.queue is not None
+        assert broker.next_offset == 0
+        assert broker.subscriber_count == 0
         assert not broker.finished.is_set()
 
     @pytest.mark.asyncio
@@ -25,11 +26,14 @@ class TestRunBroker:
         broker = RunBroker("run-123")
 
         await broker.put("evt-1", {"data": "test"})
+        broker.mark_finished()
 
-        # Event should be in queue
-        event_id, payload = await asyncio.wait_for(broker.queue.get(), timeout=1.0)
+        # Event should be delivered to a subscriber
+        iterator = broker.aiter()
+        event_id, payload = await asyncio.wait_for(anext(iterator), timeout=1.0)
         assert event_id == "evt-1"
         assert payload == {"data": "test"}
+        await iterator.aclose()
 
     @pytest.mark.asyncio
     async def test_put_end_event_marks_finished(self):
@@ -51,8 +55,8 @@ class TestRunBroker:
         # Should not raise, just log warning
         await broker.put("evt-1", {"data": "test"})
 
-        # Queue should be empty
-        assert broker.queue.empty()
+        # Nothing should have been buffered
+        assert broker.next_offset == 0
 
     @pytest.mark.asyncio
     async def test_mark_finished(self):
@@ -100,6 +104,115 @@ class TestRunBroker:
         # Should get both events including end
         assert len(events) == 2
 
+    @pytest.mark.asyncio
+    async def test_multiple_subscribers_each_receive_all_events(self):
+        """Test that concurrent subscribers do not steal events from each other"""
+        broker = RunBroker("run-123")
+
+        async def collect():
+            return [event_id async for event_id, _ in broker.aiter()]
+
+        first = asyncio.create_task(collect())
+        second = asyncio.create_task(collect())
+        await asyncio.sleep(0)
+        assert broker.subscriber_count == 2
+
+        await broker.put("evt-1", {"data": "first"})
+        await broker.put("evt-2", {"data": "second"})
+        await broker.put("evt-end", ("end", {}))
+
+        results = await asyncio.wait_for(asyncio.gather(first, second), timeout=1.0)
+        assert results == [["evt-1", "evt-2", "evt-end"]] * 2
+        assert broker.subscriber_count == 0
+
+    @pytest.mark.asyncio
+    async def test_idle_subscriber_parks_until_published(self):
+        """Test that an idle subscriber waits on a future instead of polling"""
+        broker = RunBroker("run-123")
+        iterator = broker.aiter()
+        pending = asyncio.create_task(anext(iterator))
+        await asyncio.sleep(0)
+
+        assert len(broker._waiters) == 1
+        assert not pending.done()
+
+        await broker.put("evt-1", {"data": "test"})
+        assert await asyncio.wait_for(pending, timeout=1.0) == (
+            "evt-1",
+            {"data": "test"},
+        )
+        await iterator.aclose()
+        assert broker._waiters == set()
+
+    @pytest.mark.asyncio
+    async def test_mark_finished_wakes_idle_subscribers(self):
+        """Test that finishing a run without an end event stops subscribers"""
+        broker = RunBroker("run-123")
+        consumer = asyncio.create_task(
+            asyncio.wait_for(anext(broker.aiter(), None), timeout=1.0)
+        )
+        await asyncio.sleep(0)
+
+        broker.mark_finished()
+
+        assert await consumer is None
+
+    @pytest.mark.asyncio
+    async def test_late_subscriber_replays_buffered_events(self):
+        """Test that a subscriber attaching late starts at the oldest buffered event"""
+        broker = RunBroker("run-123")
+
+        await broker.put("evt-1", {"data": "first"})
+        await broker.put("evt-end", ("end", {}))
+
+        first = [event_id async for event_id, _ in broker.aiter()]
+        second = [event_id async for event_id, _ in broker.aiter()]
+
+        assert first == second == ["evt-1", "evt-end"]
+
+    @pytest.mark.asyncio
+    async def test_buffer_is_bounded(self):
+        """Test that the ring buffer drops the oldest events beyond its size"""
+        broker = RunBroker("run-123", buffer_size=2)
+
+        await broker.put("evt-1", {})
+        await broker.put("evt-2", {})
+        await broker.put("evt-3", {})
+        broker.mark_finished()
+
+        assert broker.next_offset == 3
+        events = [event_id async for event_id, _ in broker.aiter()]
+        assert events == ["evt-2", "evt-3"]
+
+    @pytest.mark.asyncio
+    async def test_retains_after_tracks_evicted_tail(self):
+        """Test that the broker reports which reconnects its buffer covers"""
+        broker = RunBroker("run-123", buffer_size=2)
+        assert not broker.retains_after(0)
+
+        await broker.put("run-123_event_1", {})
+        await broker.put("run-123_event_2", {})
+        assert broker.retains_after(0)
+
+        await broker.put("run-123_event_3", {})
+        assert not broker.retains_after(0)
+        assert broker.retains_after(1)
+
+    @pytest.mark.asyncio
+    async def test_is_empty_tracks_subscriber_cursors(self):
+        """Test that is_empty reports whether subscribers have drained the buffer"""
+        broker = RunBroker("run-123")
+        await broker.put("evt-1", {})
+
+        iterator = broker.aiter()
+        await anext(iterator)
+        assert broker.is_empty()
+
+        await broker.put("evt-2", {})
+        assert not broker.is_empty()
+        await iterator.aclose()
+        assert broker.is_empty()
+
 
 class TestBrokerManager:
     """Test BrokerManager class"""
@@ -109,7 +222,7 @@ class TestBrokerManager:
         """Test BrokerManager initialization"""
         manager = BrokerManager()
 
-        assert manager._brokers == {}
+        assert manager._states == {}
 
     @pytest.mark.asyncio
     async def test_get_or_create_broker(self):
@@ -210,3 +323,198 @@ class TestBrokerManager:
         await manager.stop_cleanup_task()
 
         assert manager._cleanup_task.cancelled() or manager._cleanup_task.done()
+
+
+class TestRunBrokerOverflow:
+    """Test bounded buffers and slow-consumer policies"""
+
+    @pytest.mark.asyncio
+    async def test_read_events_are_evicted_without_policy(self):
+        """Test that events every subscriber has read are evicted freely"""
+        broker = RunBroker("run-123", buffer_size=2, policy="block", block_timeout=0)
+        iterator = broker.aiter()
+
+        await broker.put("evt-1", {})
+        assert await anext(iterator) == ("evt-1", {})
+        await broker.put("evt-2", {})
+        await broker.put("evt-3", {})
+
+        assert broker.get_stats()["buffered_events"] == 2
+        assert broker.disconnected_subscribers == 0
+        await iterator.aclose()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_policy_raises_in_slow_subscriber(self):
+        """Test that the disconnect policy drops subscribers behind the buffer"""
+        from src.agent_server.services.broker import SubscriberLaggedError
+
+        broker = RunBroker("run-123", buffer_size=2, policy="disconnect")
+        iterator = broker.aiter()
+
+        await broker.put("evt-1", {})
+        assert await anext(iterator) == ("evt-1", {})
+        await broker.put("evt-2", {})
+        await broker.put("evt-3", {})
+        await broker.put("evt-4", {})
+
+        with pytest.raises(SubscriberLaggedError):
+            await anext(iterator)
+        assert broker.disconnected_subscribers == 1
+        assert broker.subscriber_count == 0
+
+    @pytest.mark.asyncio
+    async def test_drop_messages_policy_skips_message_chunks(self):
+        """Test that the drop policy skips message chunks but keeps other events"""
+        broker = RunBroker("run-123", buffer_size=2, policy="drop_messages")
+        iterator = broker.aiter()
+        await broker.put("evt-1", ("values", {}))
+        assert (await anext(iterator))[0] == "evt-1"
+
+        await broker.put("evt-2", ("messages", ("chunk", {})))
+        await broker.put("evt-3", ("messages", ("chunk", {})))
+        await broker.put("evt-4", ("messages", ("chunk", {})))
+
+        assert broker.dropped_events == 1
+        assert broker.subscriber_count == 1
+        await iterator.aclose()
+
+    @pytest.mark.asyncio
+    async def test_block_policy_waits_for_slow_subscriber(self):
+        """Test that the block policy holds the producer until the buffer drains"""
+        broker = RunBroker("run-123", buffer_size=1, policy="block")
+        iterator = broker.aiter()
+        await broker.put("evt-1", {})
+        assert await anext(iterator) == ("evt-1", {})
+        await broker.put("evt-2", {})
+
+        producer = asyncio.create_task(broker.put("evt-3", {}))
+        await asyncio.sleep(0)
+        assert not producer.done()
+
+        assert await anext(iterator) == ("evt-2", {})
+        await asyncio.wait_for(producer, timeout=1.0)
+        assert await anext(iterator) == ("evt-3", {})
+        assert broker.disconnected_subscribers == 0
+        await iterator.aclose()
+
+    @pytest.mark.asyncio
+    async def test_block_policy_disconnects_after_timeout(self):
+        """Test that a blocked producer falls back to disconnecting subscribers"""
+        broker = RunBroker("run-123", buffer_size=1, policy="block", block_timeout=0)
+        iterator = broker.aiter()
+        await broker.put("evt-1", {})
+        await anext(iterator)
+        await broker.put("evt-2", {})
+        await broker.put("evt-3", {})
+
+        assert broker.disconnected_subscribers == 1
+        await iterator.aclose()
+
+    @pytest.mark.asyncio
+    async def test_byte_cap_and_global_budget(self):
+        """Test that per-run bytes and the shared budget bound the buffer"""
+        from src.agent_server.services.broker import BufferBudget
+
+        budget = BufferBudget(max_bytes=25)
+        broker = RunBroker("run-123", max_bytes=20, budget=budget)
+        await broker.put("evt-1", "x" * 10)
+        await broker.put("evt-2", "x" * 10)
+        await broker.put("evt-3", "x" * 10)
+
+        assert broker.get_stats()["buffered_events"] == 2
+        assert budget.used == 20
+
+        broker.release_buffer()
+        assert budget.used == 0
+
+    @pytest.mark.asyncio
+    async def test_manager_reports_stats(self):
+        """Test that the manager reports per-run and total occupancy"""
+        manager = BrokerManager()
+        await manager.get_or_create_broker("run-123").put("evt-1", "payload")
+
+        stats = manager.get_stats()
+
+        assert stats["brokers"] == 1
+        assert stats["total_bytes"] == len("payload")
+        assert stats["runs"][0]["run_id"] == "run-123"
+        assert stats["runs"][0]["buffered_events"] == 1
+
+        manager.remove_broker("run-123")
+        assert manager.get_stats()["total_bytes"] == 0
+
+
+class TestStreamStateExpiry:
+    """Test expiry of idle run stream states"""
+
+    @pytest.mark.asyncio
+    async def test_state_owns_broker_and_counter(self):
+        """Test that the stream state tracks the run's event sequence"""
+        manager = BrokerManager()
+        state = manager.get_or_create_state("run-123")
+
+        assert state.broker is manager.get_broker("run-123")
+        assert state.advance_sequence(3) == 3
+        assert state.advance_sequence(2) == 3
+        assert state.next_sequence() == 4
+
+    @pytest.mark.asyncio
+    async def test_finished_state_without_subscribers_is_scheduled(self):
+        """Test that finishing a run without subscribers schedules expiry"""
+        manager = BrokerManager(state_ttl=10)
+        state = manager.get_or_create_state("run-123")
+
+        manager.cleanup_broker("run-123")
+
+        assert state.expires_at is not None
+        assert manager._expire_due(state.expires_at - 1) == 0
+        assert manager._expire_due(state.expires_at) == 1
+        assert manager.get_state("run-123") is None
+
+    @pytest.mark.asyncio
+    async def test_expiry_waits_for_last_subscriber(self):
+        """Test that a finished run expires only after its subscribers left"""
+        manager = BrokerManager(state_ttl=0)
+        broker = manager.get_or_create_broker("run-123")
+        await broker.put("evt-1", "payload")
+        subscriber = broker.aiter()
+        await subscriber.__anext__()
+
+        manager.cleanup_broker("run-123")
+        assert manager.get_broker("run-123") is broker
+
+        with pytest.raises(StopAsyncIteration):
+            await subscriber.__anext__()
+        assert manager.get_broker("run-123") is None
+
+    @pytest.mark.asyncio
+    async def test_rejoined_subscriber_cancels_pending_expiry(self):
+        """Test that stale heap entries of reactivated states are skipped"""
+        manager = BrokerManager(state_ttl=10)
+        state = manager.get_or_create_state("run-123")
+        await state.broker.put("evt-1", "payload")
+        manager.cleanup_broker("run-123")
+        deadline = state.expires_at
+
+        subscriber = state.broker.aiter()
+        await subscriber.__anext__()
+
+        assert manager._expire_due(deadline) == 0
+        assert manager.get_state("run-123") is state
+        await subscriber.aclose()
+        assert state.expires_at > deadline
+
+    @pytest.mark.asyncio
+    async def test_cleanup_task_expires_states(self):
+        """Test that the background task wakes up for the earliest deadline"""
+        manager = BrokerManager(state_ttl=0.05)
+        await manager.start_cleanup_task()
+        try:
+            manager.get_or_create_broker("run-123")
+            manager.cleanup_broker("run-123")
+            await asyncio.sleep(0.2)
+        finally:
+            await manager.stop_cleanup_task()
+
+        assert manager.get_broker("run-123") is None
+        assert manager._expiry_heap == []
@@ -0,0 +1,150 @@
+"""Unit tests for MessageChunkCoalescer"""
+
+import asyncio
+import contextvars
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from src.agent_server.services.chunk_coalescer import MessageChunkCoalescer
+
+
+def token(text: str, message_id: str = "m1") -> tuple:
+    return "messages", (AIMessageChunk(content=text, id=message_id), {"node": "a"})
+
+
+async def source(*events, delay: float = 0.0):
+    for event in events:
+        if delay:
+            await asyncio.sleep(delay)
+        yield event
+
+
+async def collect(coalescer: MessageChunkCoalescer, events) -> list:
+    return [event async for event in coalescer.coalesce(events)]
+
+
+class TestMessageChunkCoalescer:
+    """Test merging of token chunks"""
+
+    @pytest.mark.asyncio
+    async def test_merges_chunks_of_same_message(self):
+        """Test that consecutive chunks of a message become one event"""
+        coalescer = MessageChunkCoalescer(window_ms=1000)
+
+        events = await collect(
+            coalescer, source(token("Hel"), token("lo"), token(" world"))
+        )
+
+        assert len(events) == 1
+        mode, (chunk, metadata) = events[0]
+        assert mode == "messages"
+        assert chunk.content == "Hello world"
+        assert metadata == {"node": "a"}
+        assert (coalescer.chunks_in, coalescer.events_out) == (3, 1)
+
+    @pytest.mark.asyncio
+    async def test_preserves_order_around_other_events(self):
+        """Test that other events and new messages flush pending chunks first"""
+        coalescer = MessageChunkCoalescer(window_ms=1000)
+
+        events = await collect(
+            coalescer,
+            source(
+                token("a"),
+                token("b"),
+                ("values", {"x": 1}),
+                token("c", "m2"),
+                token("d", "m3"),
+            ),
+        )
+
+        assert [e[0] for e in events] == ["messages", "values", "messages", "messages"]
+        assert events[0][1][0].content == "ab"
+        assert events[2][1][0].content == "c"
+        assert events[3][1][0].content == "d"
+
+    @pytest.mark.asyncio
+    async def test_keeps_node_path_of_subgraph_events(self):
+        """Test that subgraph message events keep their node path"""
+        coalescer = MessageChunkCoalescer(window_ms=1000)
+        sub = (("sub",),) + token("a")
+        other = (("other",),) + token("b")
+
+        events = await collect(coalescer, source(sub, sub, other))
+
+        assert [(e[0], e[2][0].content) for e in events] == [
+            (("sub",), "aa"),
+            (("other",), "b"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_flushes_after_max_chunks(self):
+        """Test that at most max_chunks chunks are merged into one event"""
+        coalescer = MessageChunkCoalescer(window_ms=1000, max_chunks=2)
+
+        events = await collect(coalescer, source(*(token(str(i)) for i in range(5))))
+
+        assert [e[1][0].content for e in events] == ["01", "23", "4"]
+
+    @pytest.mark.asyncio
+    async def test_flushes_when_window_elapses_during_stall(self):
+        """Test that held chunks are sent when the source stalls"""
+        release = asyncio.Event()
+
+        async def stalled():
+            yield token("a")
+            await release.wait()
+            yield token("b")
+
+        coalescer = MessageChunkCoalescer(window_ms=10)
+        stream = coalescer.coalesce(stalled())
+
+        first = await asyncio.wait_for(anext(stream), timeout=1)
+        assert first[1][0].content == "a"
+
+        release.set()
+        assert [e[1][0].content async for e in stream] == ["b"]
+
+    @pytest.mark.asyncio
+    async def test_window_adapts_to_pressure(self):
+        """Test that lagging consumers widen the coalescing window"""
+        pressure = 0.0
+        coalescer = MessageChunkCoalescer(
+            window_ms=10, max_window_ms=50, pressure=lambda: pressure
+        )
+
+        assert coalescer.window() == pytest.approx(0.01)
+        pressure = 0.5
+        assert coalescer.window() == pytest.approx(0.03)
+        pressure = 5
+        assert coalescer.window() == pytest.approx(0.05)
+
+    @pytest.mark.asyncio
+    async def test_source_context_is_preserved_across_steps(self):
+        """Test that context variables set by the source survive between steps"""
+        var = contextvars.ContextVar("var", default=None)
+
+        async def setting_source():
+            var.set("set")
+            yield ("values", {})
+            yield ("values", {"var": var.get()})
+
+        coalescer = MessageChunkCoalescer(window_ms=10)
+
+        events = await collect(coalescer, setting_source())
+
+        assert events[-1] == ("values", {"var": "set"})
+
+    @pytest.mark.asyncio
+    async def test_propagates_source_errors(self):
+        """Test that errors of the graph stream reach the run executor"""
+
+        async def failing():
+            yield token("a")
+            raise ValueError("boom")
+
+        coalescer = MessageChunkCoalescer(window_ms=1000)
+
+        with pytest.raises(ValueError, match="boom"):
+            await collect(coalescer, failing())
@@ -0,0 +1,146 @@
+"""Unit tests for compaction of stored run events"""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from src.agent_server.core.event_codec import EventPayloadCodec
+from src.agent_server.core.sse import SSEEvent
+from src.agent_server.services.event_compactor import FOLDED_FROM, EventCompactor
+from src.agent_server.services.event_converter import EventConverter
+
+RUN_ID = "run-1"
+
+
+def _stored(seq: int, raw_event) -> SSEEvent:
+    """Build a JSONB stored event the way the streaming path writes it"""
+    event_id = f"{RUN_ID}_event_{seq}"
+    encoded = EventConverter().encode_raw_event(event_id, raw_event)
+    return SSEEvent(
+        id=event_id,
+        event=encoded.stored_event,
+        data=json.loads(encoded.stored_data),
+    )
+
+
+def _token(seq: int, content: str, message_id: str = "msg-1") -> SSEEvent:
+    chunk = AIMessageChunk(content=content, id=message_id)
+    return _stored(seq, ("messages", (chunk, {"langgraph_node": "agent"})))
+
+
+def _values(seq: int, chunk: dict) -> SSEEvent:
+    return _stored(seq, ("values", chunk))
+
+
+@pytest.fixture
+def compactor():
+    return EventCompactor(delay=0)
+
+
+def _plan(compactor, events):
+    return compactor.plan([compactor._decode(e) for e in events])
+
+
+class TestEventCompactor:
+    """Test which events are folded, dropped and kept"""
+
+    def test_folds_consecutive_chunks_of_one_message(self, compactor):
+        """Test token chunks collapse into the last seq of their group"""
+        events = [_token(0, "Hel"), _token(1, "lo"), _token(2, " world")]
+
+        deleted, replacements = _plan(compactor, events)
+
+        assert deleted == [0, 1]
+        assert len(replacements) == 1
+        seq, data, payload = replacements[0]
+        assert seq == 2 and payload is None
+        stored = json.loads(data)
+        assert stored["message_chunk"]["content"] == "Hello world"
+        assert stored["message_chunk"]["id"] == "msg-1"
+        assert stored["metadata"] == {"langgraph_node": "agent"}
+        # Replay skips the event for clients resuming inside the group
+        assert stored[FOLDED_FROM] == 0
+
+    def test_keeps_interleaved_messages_apart(self, compactor):
+        """Test only consecutive chunks of the same message are folded"""
+        events = [
+            _token(0, "a", "msg-1"),
+            _token(1, "b", "msg-2"),
+            _token(2, "c", "msg-1"),
+        ]
+
+        assert _plan(compactor, events) == ([], [])
+
+    def test_keeps_only_last_snapshot(self, compactor):
+        """Test superseded values snapshots are dropped, interrupts kept"""
+        events = [
+            _values(0, {"messages": [1]}),
+            _stored(1, ("updates", {"agent": {"messages": [2]}})),
+            _values(2, {"__interrupt__": [{"value": "confirm?"}]}),
+            _values(3, {"messages": [1, 2]}),
+            _stored(4, ("end", {"status": "success"})),
+        ]
+
+        deleted, replacements = _plan(compactor, events)
+
+        assert deleted == [0]
+        assert replacements == []
+
+    def test_folds_binary_events_into_binary_payload(self, compactor):
+        """Test compressed events are rewritten in the compressed format"""
+        codec = EventPayloadCodec("zstd")
+        converter = EventConverter()
+        events = []
+        for seq, content in enumerate(["Hel", "lo"]):
+            event_id = f"{RUN_ID}_event_{seq}"
+            chunk = AIMessageChunk(content=content, id="msg-1")
+            frame = converter.convert_raw_to_sse(event_id, ("messages", chunk))
+            events.append(
+                SSEEvent(
+                    id=event_id,
+                    event="messages",
+                    data=None,
+                    payload=codec.encode(frame),
+                )
+            )
+
+        with patch(
+            "src.agent_server.services.event_compactor.get_event_codec",
+            return_value=codec,
+        ):
+            deleted, replacements = _plan(compactor, events)
+
+        assert deleted == [0]
+        seq, data, payload = replacements[0]
+        assert seq == 1 and json.loads(data) == {FOLDED_FROM: 0}
+        frame = codec.decode(payload)
+        assert frame.startswith("event: messages\n")
+        assert json.loads(frame.split("\n")[1][6:])["content"] == "Hello"
+        assert f"id: {RUN_ID}_event_1" in frame
+
+    @pytest.mark.asyncio
+    async def test_compact_run_rewrites_store(self, compactor):
+        """Test compact_run flushes pending events and rewrites the log"""
+        events = [_token(0, "a"), _token(1, "b"), _values(2, {"n": 1})]
+
+        async def iter_events(run_id):
+            for event in events:
+                yield event
+
+        with (
+            patch("src.agent_server.services.event_compactor.event_store") as store,
+            patch("src.agent_server.services.event_compactor.event_writer") as writer,
+        ):
+            store.iter_events = iter_events
+            store.rewrite_events = AsyncMock()
+            writer.flush = AsyncMock(return_value=True)
+
+            assert await compactor.compact_run(RUN_ID) == (3, 2)
+
+        writer.flush.assert_awaited_once_with(RUN_ID)
+        store.rewrite_events.assert_awaited_once()
+        run_id, deleted, replacements = store.rewrite_events.await_args.args
+        assert run_id == RUN_ID and deleted == [0]
+        assert [r[0] for r in replacements] == [1]
@@ -1,7 +1,13 @@
 """Unit tests for EventConverter"""
 
+import json
 from unittest.mock import Mock
 
+from src.agent_server.core.sse import (
+    SSEEvent,
+    create_messages_event,
+    create_values_event,
+)
 from src.agent_server.services.event_converter import EventConverter
 
 
@@ -314,3 +320,84 @@ class TestEventConverter:
         result = self.converter.convert_stored_to_sse(stored_event)
 
         assert result is None
+
+
+class TestEncodeRawEvent:
+    """Test single-pass encoding of raw events"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.converter = EventConverter()
+
+    def test_messages_frame_and_stored_share_payload(self):
+        """Test that the SSE frame and stored JSON carry the same message"""
+        raw_event = (("sub",), "messages", ({"content": "hi"}, {"node": "a"}))
+        encoded = self.converter.encode_raw_event("evt-1", raw_event)
+
+        assert encoded.frame == create_messages_event(
+            ({"content": "hi"}, {"node": "a"}), event_id="evt-1"
+        )
+        assert encoded.stored_event == "messages"
+        assert json.loads(encoded.stored_data) == {
+            "type": "messages_stream",
+            "message_chunk": {"content": "hi"},
+            "metadata": {"node": "a"},
+            "node_path": ["sub"],
+        }
+
+    def test_values_and_updates_are_stored_as_values(self):
+        """Test that values and interrupt updates keep their stored format"""
+        values = self.converter.encode_raw_event("evt-1", ("values", {"x": 1}))
+        interrupt = self.converter.encode_raw_event(
+            "evt-2", ("updates", {"__interrupt__": [1]})
+        )
+
+        assert values.frame == create_values_event({"x": 1}, "evt-1")
+        assert json.loads(values.stored_data) == {
+            "type": "execution_values",
+            "chunk": {"x": 1},
+        }
+        assert "event: values\n" in interrupt.frame
+        assert interrupt.stored_event == "values"
+
+    def test_updates_are_stored_and_replayed_as_updates(self):
+        """Test that node updates replay as the updates event sent live"""
+        encoded = self.converter.encode_raw_event("evt-1", ("updates", {"a": {}}))
+        stored = SSEEvent(
+            id="evt-1",
+            event=encoded.stored_event,
+            data=json.loads(encoded.stored_data),
+        )
+
+        assert encoded.stored_event == "updates"
+        assert self.converter.convert_stored_to_sse(stored) == encoded.frame
+
+    def test_end_event(self):
+        """Test that end events keep their status in the stored form"""
+        encoded = self.converter.encode_raw_event(
+            "evt-1", ("end", {"status": "failed"})
+        )
+
+        assert encoded.mode == "end"
+        assert json.loads(encoded.stored_data)["status"] == "failed"
+
+    def test_live_only_modes_are_not_stored(self):
+        """Test that modes without a stored form only get an SSE frame"""
+        encoded = self.converter.encode_raw_event("evt-1", ("custom", {"a": 1}))
+
+        assert "event: custom\n" in encoded.frame
+        assert encoded.stored_data is None
+
+    def test_values_delta_is_stored_and_replayed(self):
+        """Test that values-delta events replay with the same frame"""
+        encoded = self.converter.encode_raw_event(
+            "evt-1", ("values-delta", {"patch": [{"op": "add", "path": "/a"}]})
+        )
+        stored = Mock()
+        stored.event = encoded.stored_event
+        stored.data = json.loads(encoded.stored_data)
+        stored.id = "evt-1"
+
+        assert "event: values-delta\n" in encoded.frame
+        assert encoded.stored_event == "values-delta"
+        assert self.converter.convert_stored_to_sse(stored) == encoded.frame
@@ -0,0 +1,70 @@
+"""Unit tests for the event persistence policy"""
+
+from src.agent_server.core.sse import EncodedEvent
+from src.agent_server.services.event_persistence import (
+    DEFAULT_POLICY,
+    EventPersistencePolicy,
+    resolve_persistence_policy,
+)
+
+
+def _encoded(mode: str, stored: bool = True) -> EncodedEvent:
+    return EncodedEvent("run-1_event_1", mode, "frame", mode, "{}" if stored else None)
+
+
+class TestResolvePersistencePolicy:
+    """Test reading the policy from a run's config"""
+
+    def test_defaults_without_config(self):
+        """Test runs without a policy use the server defaults"""
+        assert resolve_persistence_policy(None) is DEFAULT_POLICY
+        assert resolve_persistence_policy({"configurable": {}}) is DEFAULT_POLICY
+
+    def test_boolean_toggles_persistence(self):
+        """Test a boolean value turns persistence on or off"""
+        assert not resolve_persistence_policy({"event_persistence": False}).enabled
+        assert resolve_persistence_policy({"event_persistence": True}).enabled
+
+    def test_object_sets_modes_and_retention(self):
+        """Test stream modes and retention are read from an object value"""
+        policy = resolve_persistence_policy(
+            {
+                "event_persistence": {
+                    "stream_modes": ["values", "messages-tuple"],
+                    "retention_hours": 0.5,
+                }
+            }
+        )
+
+        assert policy.enabled
+        assert policy.stream_modes == {"values", "messages"}
+        assert policy.retention_hours == 0.5
+
+    def test_invalid_values_fall_back_to_defaults(self):
+        """Test invalid fields are ignored instead of failing the run"""
+        policy = resolve_persistence_policy(
+            {
+                "event_persistence": {
+                    "enabled": "no",
+                    "stream_modes": "values",
+                    "retention_hours": -1,
+                }
+            }
+        )
+
+        assert policy == DEFAULT_POLICY
+        assert resolve_persistence_policy({"event_persistence": 3}) is DEFAULT_POLICY
+
+
+class TestEventPersistencePolicy:
+    """Test which encoded events a policy persists"""
+
+    def test_persists_only_selected_stored_modes(self):
+        """Test events are filtered by mode and must have a stored form"""
+        policy = EventPersistencePolicy(stream_modes=frozenset({"values"}))
+
+        assert policy.persists(_encoded("values"))
+        assert not policy.persists(_encoded("messages"))
+        assert not policy.persists(_encoded("values", stored=False))
+        assert not policy.persists(None)
+        assert not EventPersistencePolicy(enabled=False).persists(_encoded("values"))
@@ -133,12 +133,14 @@ class TestEventStore:
                 id=f"{run_id}_event_6",
                 event="event6",
                 data={"seq": 6},
+                payload=None,
                 created_at=datetime.now(UTC),
             ),
             Mock(
                 id=f"{run_id}_event_7",
                 event="event7",
                 data={"seq": 7},
+                payload=None,
                 created_at=datetime.now(UTC),
             ),
         ]
@@ -216,6 +218,50 @@ class TestEventStore:
             params = call_args[0][1]
             assert params["last_seq"] == -1
 
+    @pytest.mark.asyncio
+    async def test_iter_events_pages_by_sequence(self, event_store, mock_conn):
+        """Test replay fetches keyset pages until a short page"""
+        run_id = "test-run"
+
+        def page(*seqs):
+            result = Mock()
+            result.fetchall.return_value = [
+                Mock(
+                    id=f"{run_id}_event_{seq}",
+                    seq=seq,
+                    event="values",
+                    data={"seq": seq},
+                    payload=None,
+                    created_at=datetime.now(UTC),
+                )
+                for seq in seqs
+            ]
+            return result
+
+        mock_conn.execute = AsyncMock(side_effect=[page(3, 4), page(5, 6), page(7)])
+
+        with patch(
+            "src.agent_server.services.event_store.db_manager"
+        ) as mock_db_manager:
+            mock_db_manager.get_engine.return_value.begin.return_value.__aenter__ = (
+                AsyncMock(return_value=mock_conn)
+            )
+            mock_db_manager.get_engine.return_value.begin.return_value.__aexit__ = (
+                AsyncMock(return_value=None)
+            )
+
+            events = [
+                event
+                async for event in event_store.iter_events(
+                    run_id, after_seq=2, page_size=2
+                )
+            ]
+
+        assert [event.data["seq"] for event in events] == [3, 4, 5, 6, 7]
+        after_seqs = [c[0][1]["after_seq"] for c in mock_conn.execute.call_args_list]
+        assert after_seqs == [2, 4, 6]
+        assert all(c[0][1]["limit"] == 2 for c in mock_conn.execute.call_args_list)
+
     @pytest.mark.asyncio
     async def test_get_all_events_success(self, event_store, mock_conn):
         """Test successful retrieval of all events for a run"""
@@ -226,18 +272,21 @@ class TestEventStore:
                 id=f"{run_id}_event_1",
                 event="start",
                 data={"type": "start"},
+                payload=None,
                 created_at=datetime.now(UTC),
             ),
             Mock(
                 id=f"{run_id}_event_2",
                 event="chunk",
                 data={"data": "chunk1"},
+                payload=None,
                 created_at=datetime.now(UTC),
             ),
             Mock(
                 id=f"{run_id}_event_3",
                 event="end",
                 data={"type": "end"},
+                payload=None,
                 created_at=datetime.now(UTC),
             ),
         ]
@@ -431,6 +480,130 @@ class TestEventStore:
             "Cleanup loop did not attempt to execute cleanup SQL"
         )
 
+    @pytest.mark.asyncio
+    async def test_drop_expired_partitions(self, event_store, mock_conn):
+        """Test only hourly partitions past the retention window are dropped"""
+        names = Mock()
+        names.fetchall.return_value = [
+            ("run_events_p2025010108",),
+            ("run_events_p2025010109",),
+            ("run_events_p2025010110",),
+            ("run_events_default",),
+        ]
+        mock_conn.execute = AsyncMock(return_value=names)
+
+        with (
+            patch(
+                "src.agent_server.services.event_store.db_manager"
+            ) as mock_db_manager,
+            patch("src.agent_server.services.event_store.EVENT_RETENTION_HOURS", 1),
+        ):
+            mock_db_manager.get_engine.return_value.begin.return_value.__aenter__ = (
+                AsyncMock(return_value=mock_conn)
+            )
+            mock_db_manager.get_engine.return_value.begin.return_value.__aexit__ = (
+                AsyncMock(return_value=None)
+            )
+
+            dropped = await event_store.drop_expired_partitions(
+                datetime(2025, 1, 1, 10, 30, tzinfo=UTC)
+            )
+
+        assert dropped == ["run_events_p2025010108"]
+        statements = [str(c[0][0]) for c in mock_conn.execute.call_args_list]
+        assert any(
+            "DETACH PARTITION run_events_p2025010108" in sql for sql in statements
+        )
+        assert any("DROP TABLE run_events_p2025010108" in sql for sql in statements)
+        # Events of runs kept longer are copied out before the drop
+        copy = statements.index(
+            next(sql for sql in statements if "FROM run_events_p2025010108" in sql)
+        )
+        assert "INSERT INTO run_events" in statements[copy]
+        assert "events_expire_at > :now" in statements[copy]
+        assert "DROP TABLE" in statements[copy + 1]
+        assert "events_expire_at > :now" in statements[-1]
+        assert not any("run_events_p2025010109" in sql for sql in statements)
+
+    @pytest.mark.asyncio
+    async def test_run_expiry_is_stored_uncapped(self, event_store, mock_conn):
+        """Test a retention longer than the default is stored on the run as is"""
+        mock_conn.execute = AsyncMock()
+        with (
+            patch(
+                "src.agent_server.services.event_store.db_manager"
+            ) as mock_db_manager,
+            patch("src.agent_server.services.event_store.EVENT_RETENTION_HOURS", 1),
+        ):
+            mock_db_manager.get_engine.return_value.begin.return_value.__aenter__ = (
+                AsyncMock(return_value=mock_conn)
+            )
+            mock_db_manager.get_engine.return_value.begin.return_value.__aexit__ = (
+                AsyncMock(return_value=None)
+            )
+            await event_store.expire_run("run-long", 48)
+
+        statement, params = mock_conn.execute.call_args[0]
+        assert "UPDATE runs SET events_expire_at" in str(statement)
+        assert params == {"secs": 48 * 3600, "run_id": "run-long"}
+
+    @pytest.mark.asyncio
+    async def test_expired_runs_are_deleted(self, event_store, mock_conn):
+        """Test runs past their stored expiry have their events deleted"""
+        result = Mock()
+        result.fetchall.return_value = [("run-short",)]
+        mock_conn.execute = AsyncMock(return_value=result)
+        now = datetime(2025, 1, 1, 10, 30, tzinfo=UTC)
+
+        with patch(
+            "src.agent_server.services.event_store.db_manager"
+        ) as mock_db_manager:
+            mock_db_manager.get_engine.return_value.begin.return_value.__aenter__ = (
+                AsyncMock(return_value=mock_conn)
+            )
+            mock_db_manager.get_engine.return_value.begin.return_value.__aexit__ = (
+                AsyncMock(return_value=None)
+            )
+            expired = await event_store._cleanup_expired_runs(now)
+
+        assert expired == ["run-short"]
+        statement, params = mock_conn.execute.call_args[0]
+        assert "events_expire_at <= :now" in str(statement)
+        assert "DELETE FROM run_events" in str(statement)
+        assert params == {"now": now}
+
+    @pytest.mark.asyncio
+    async def test_ensure_partitions_creates_missing_hours(
+        self, event_store, mock_conn
+    ):
+        """Test upcoming hourly partitions are created and attached"""
+        names = Mock()
+        names.fetchall.return_value = [("run_events_p2025010110",)]
+        mock_conn.execute = AsyncMock(return_value=names)
+
+        with (
+            patch(
+                "src.agent_server.services.event_store.db_manager"
+            ) as mock_db_manager,
+            patch("src.agent_server.services.event_store.EVENT_PARTITIONS_AHEAD", 1),
+        ):
+            mock_db_manager.get_engine.return_value.begin.return_value.__aenter__ = (
+                AsyncMock(return_value=mock_conn)
+            )
+            mock_db_manager.get_engine.return_value.begin.return_value.__aexit__ = (
+                AsyncMock(return_value=None)
+            )
+
+            created = await event_store.ensure_partitions(
+                datetime(2025, 1, 1, 10, 30, tzinfo=UTC)
+            )
+
+        assert created == ["run_events_p2025010111"]
+        statements = [str(c[0][0]) for c in mock_conn.execute.call_args_list]
+        assert any(
+            "ATTACH PARTITION run_events_p2025010111" in sql for sql in statements
+        )
+
 
 class TestStoreSSEEvent:
     """Unit tests for store_sse_event helper function"""
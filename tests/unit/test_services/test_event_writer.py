@@ -0,0 +1,186 @@
+"""Unit tests for the write-behind event writer"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from src.agent_server.core.sse import EncodedEvent
+from src.agent_server.services.event_writer import EventWriter
+
+
+def _event(run_id: str, seq: int) -> EncodedEvent:
+    return EncodedEvent(
+        f"{run_id}_event_{seq}", "values", "frame", "values", f'{{"n": {seq}}}'
+    )
+
+
+def _db_error(sqlstate: str) -> DBAPIError:
+    orig = Exception(f"sqlstate {sqlstate}")
+    orig.sqlstate = sqlstate
+    return DBAPIError("INSERT INTO run_events ...", {}, orig)
+
+
+@pytest.fixture
+def mock_store():
+    with patch("src.agent_server.services.event_writer.event_store") as store:
+        store.store_encoded_event = AsyncMock()
+        store.store_encoded_events = AsyncMock()
+        yield store
+
+
+@pytest.fixture
+async def writer(mock_store):
+    with patch("src.agent_server.services.event_writer.EVENT_WRITE_BEHIND", True):
+        writer = EventWriter(batch_size=3, flush_ms=1000, flush_timeout=2)
+        await writer.start()
+        yield writer
+        await writer.stop()
+
+
+class TestEventWriter:
+    """Test batching, ordering and flush barriers"""
+
+    @pytest.mark.asyncio
+    async def test_writes_inline_when_not_started(self, mock_store):
+        """Test events are written directly while the writer is not running"""
+        writer = EventWriter()
+        event = _event("run-1", 1)
+
+        await writer.enqueue("run-1", event)
+
+        mock_store.store_encoded_event.assert_awaited_once_with("run-1", event)
+        assert await writer.flush("run-1") is True
+
+    @pytest.mark.asyncio
+    async def test_full_batches_are_written_without_waiting(self, writer, mock_store):
+        """Test a full batch is written as one multi-row insert"""
+        events = [_event("run-1", i) for i in range(1, 4)]
+        for event in events:
+            await writer.enqueue("run-1", event)
+
+        for _ in range(10):
+            await asyncio.sleep(0)
+        mock_store.store_encoded_events.assert_awaited_once_with(
+            [("run-1", event) for event in events]
+        )
+        assert writer.get_stats()["pending_events"] == 0
+
+    @pytest.mark.asyncio
+    async def test_flush_barrier_writes_partial_batch(self, writer, mock_store):
+        """Test flush writes a run's pending events without the linger delay"""
+        await writer.enqueue("run-1", _event("run-1", 1))
+        await writer.enqueue("run-2", _event("run-2", 1))
+
+        assert await asyncio.wait_for(writer.flush("run-1"), 0.5) is True
+
+        written = mock_store.store_encoded_events.await_args_list[0][0][0]
+        assert [run_id for run_id, _ in written] == ["run-1", "run-2"]
+        assert writer.get_stats()["pending_runs"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried_in_order(self, writer, mock_store):
+        """Test a failed batch is retried before later events"""
+        mock_store.store_encoded_events.side_effect = [RuntimeError("db down"), None]
+        first = [_event("run-1", i) for i in range(1, 4)]
+        for event in first:
+            await writer.enqueue("run-1", event)
+
+        with patch("src.agent_server.services.event_writer.asyncio.sleep"):
+            assert await writer.flush("run-1") is True
+
+        calls = mock_store.store_encoded_events.await_args_list
+        assert calls[0][0][0] == calls[1][0][0] == [("run-1", e) for e in first]
+        assert writer.get_stats()["write_errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_poison_row_is_dropped_after_retries(self, mock_store):
+        """Test a row the database rejects is dropped instead of blocking the queue"""
+        written = []
+
+        async def store(rows):
+            if any(event.id == "run-1_event_2" for _, event in rows):
+                # e.g. "\u0000 cannot be converted to text" in the JSONB column
+                raise _db_error("22P05")
+            written.extend(event.id for _, event in rows)
+
+        mock_store.store_encoded_events.side_effect = store
+        with patch("src.agent_server.services.event_writer.EVENT_WRITE_BEHIND", True):
+            writer = EventWriter(batch_size=4, flush_timeout=5, max_attempts=1)
+            await writer.start()
+            for seq in range(1, 5):
+                await writer.enqueue("run-1", _event("run-1", seq))
+            assert await writer.flush("run-1") is True
+            await writer.stop()
+
+        assert written == ["run-1_event_1", "run-1_event_3", "run-1_event_4"]
+        stats = writer.get_stats()
+        assert stats["events_dropped"] == 1
+        assert stats["events_written"] == 3
+
+    @pytest.mark.asyncio
+    async def test_connection_errors_never_drop_rows(self, mock_store):
+        """Test failures unrelated to the rows keep retrying the whole batch"""
+        mock_store.store_encoded_events.side_effect = [
+            _db_error("08006"),
+            ConnectionResetError("connection lost"),
+            None,
+        ]
+        with patch("src.agent_server.services.event_writer.EVENT_WRITE_BEHIND", True):
+            writer = EventWriter(batch_size=2, flush_timeout=5, max_attempts=1)
+            await writer.start()
+            events = [_event("run-1", 1), _event("run-1", 2)]
+            for event in events:
+                await writer.enqueue("run-1", event)
+            assert await writer.flush("run-1") is True
+            await writer.stop()
+
+        assert mock_store.store_encoded_events.await_args_list[-1][0][0] == [
+            ("run-1", event) for event in events
+        ]
+        assert writer.get_stats()["events_dropped"] == 0
+
+    @pytest.mark.asyncio
+    async def test_enqueue_blocks_when_backlog_is_full(self, mock_store):
+        """Test producers wait while max_pending events are queued"""
+        release = asyncio.Event()
+
+        async def slow_write(_batch):
+            await release.wait()
+
+        mock_store.store_encoded_events.side_effect = slow_write
+        with patch("src.agent_server.services.event_writer.EVENT_WRITE_BEHIND", True):
+            writer = EventWriter(batch_size=2, max_pending=2, flush_ms=0)
+            await writer.start()
+            for i in range(1, 3):
+                await writer.enqueue("run-1", _event("run-1", i))
+
+            blocked = asyncio.create_task(writer.enqueue("run-1", _event("run-1", 3)))
+            await asyncio.sleep(0.01)
+            assert not blocked.done()
+
+            release.set()
+            await asyncio.wait_for(blocked, 0.5)
+            await writer.stop()
+
+        assert writer.get_stats()["events_written"] == 3
+
+    @pytest.mark.asyncio
+    async def test_flush_times_out_when_database_is_stuck(self, mock_store):
+        """Test the barrier gives up after flush_timeout"""
+
+        async def stuck(_batch):
+            await asyncio.sleep(10)
+
+        mock_store.store_encoded_events.side_effect = stuck
+        with patch("src.agent_server.services.event_writer.EVENT_WRITE_BEHIND", True):
+            writer = EventWriter(flush_timeout=0.05)
+            await writer.start()
+            await writer.enqueue("run-1", _event("run-1", 1))
+
+            assert await writer.flush("run-1") is False
+
+            writer._task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await writer._task
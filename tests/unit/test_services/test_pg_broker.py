@@ -0,0 +1,296 @@
+"""Unit tests for the Postgres LISTEN/NOTIFY broker"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from src.agent_server.core.sse import EncodedEvent, SSEEvent
+from src.agent_server.services.event_converter import EventConverter
+from src.agent_server.services.pg_broker import (
+    MAX_NOTIFY_BYTES,
+    PostgresBrokerManager,
+    event_from_wire,
+    event_to_wire,
+    stored_event_to_encoded,
+)
+
+converter = EventConverter()
+
+
+async def _delivered(manager: PostgresBrokerManager) -> None:
+    """Wait until every run's pending notifications are delivered"""
+    await asyncio.gather(*manager._deliveries.values())
+
+
+class TestEventEncoding:
+    """Test the NOTIFY wire format of broker events"""
+
+    def test_wire_round_trip_keeps_frame(self):
+        """Test that the encoded SSE frame crosses processes verbatim"""
+        raw = ("messages", (AIMessageChunk(content="hi", id="m1"), {"node": "a"}))
+        encoded = converter.encode_raw_event("r_event_1", raw)
+
+        wire = json.loads(json.dumps(event_to_wire("r_event_1", encoded)))
+        decoded = event_from_wire("r_event_1", wire)
+
+        assert decoded.mode == "messages"
+        assert decoded.frame == encoded.frame
+        # Receivers only stream live, so the stored form is not sent
+        assert decoded.stored_data is None
+
+    def test_raw_payloads_are_encoded(self):
+        """Test that raw payloads put directly into a broker are encoded"""
+        wire = event_to_wire("r_event_1", ("values", {"x": 1}))
+
+        assert wire["m"] == "values"
+        assert 'data: {"x":1}' in wire["f"]
+
+    def test_stored_event_to_encoded(self):
+        """Test rebuilding broker payloads from their persisted form"""
+        values = SSEEvent(id="r_event_2", event="values", data={"chunk": {"x": 1}})
+        end = SSEEvent(
+            id="r_event_3",
+            event="end",
+            data={"type": "run_complete", "status": "completed"},
+        )
+
+        assert stored_event_to_encoded(values).frame == converter.convert_raw_to_sse(
+            "r_event_2", ("values", {"x": 1})
+        )
+        assert stored_event_to_encoded(end).mode == "end"
+
+
+class TestPostgresBrokerManager:
+    """Test publishing and dispatching of notifications"""
+
+    @pytest.mark.asyncio
+    async def test_put_publishes_and_delivers_locally(self):
+        """Test that a local put is queued for NOTIFY and fanned out locally"""
+        manager = PostgresBrokerManager()
+        broker = manager.get_or_create_broker("run-1")
+
+        await broker.put("run-1_event_1", ("values", {"x": 1}))
+
+        message = json.loads(manager._outbox.get_nowait())
+        assert message == {
+            "o": manager.origin,
+            "r": "run-1",
+            "e": "run-1_event_1",
+            "s": 0,
+            "p": event_to_wire("run-1_event_1", ("values", {"x": 1})),
+        }
+        assert broker.next_offset == 1
+
+    @pytest.mark.asyncio
+    async def test_events_carry_latest_stored_sequence(self):
+        """Test receivers learn which earlier events must be in the store"""
+        publisher = PostgresBrokerManager()
+        broker = publisher.get_or_create_broker("run-1")
+        stored = converter.encode_raw_event("run-1_event_1", ("values", {"x": 1}))
+        live_only = EncodedEvent("run-1_event_2", "custom", "data: {}\n\n")
+        last = converter.encode_raw_event("run-1_event_3", ("values", {"x": 2}))
+
+        for event in (stored, live_only, last):
+            await broker.put(event.id, event)
+
+        messages = [publisher._outbox.get_nowait() for _ in range(3)]
+        assert [json.loads(message)["s"] for message in messages] == [0, 1, 1]
+
+        receiver = PostgresBrokerManager()
+        received = receiver.get_or_create_broker("run-1")
+        await receiver._dispatch(messages[2])
+        await _delivered(receiver)
+        assert received._buffer[0][1].stored_before == 1
+
+    @pytest.mark.asyncio
+    async def test_large_payload_is_sent_by_reference(self):
+        """Test that payloads over the NOTIFY limit are sent by reference"""
+        manager = PostgresBrokerManager()
+        broker = manager.get_or_create_broker("run-1")
+
+        await broker.put("run-1_event_1", ("values", {"x": "y" * MAX_NOTIFY_BYTES}))
+
+        message = json.loads(manager._outbox.get_nowait())
+        assert message["ref"] is True
+        assert "p" not in message
+
+    @pytest.mark.asyncio
+    async def test_large_unpersisted_event_is_split(self):
+        """Test events that are never persisted cross processes in pieces"""
+        publisher = PostgresBrokerManager()
+        frame = "event: custom\ndata: " + "é" * (3 * MAX_NOTIFY_BYTES) + "\n\n"
+        event = EncodedEvent("run-1_event_1", "custom", frame)
+
+        publisher.publish_event("run-1", "run-1_event_1", event)
+
+        messages = []
+        while not publisher._outbox.empty():
+            messages.append(publisher._outbox.get_nowait())
+        assert len(messages) > 1
+        assert all(len(message.encode()) <= MAX_NOTIFY_BYTES for message in messages)
+        assert not any(json.loads(message).get("ref") for message in messages)
+
+        receiver = PostgresBrokerManager()
+        broker = receiver.get_or_create_broker("run-1")
+        # A receiver joining mid-event drops the incomplete event
+        for message in [*messages[1:], *messages]:
+            await receiver._dispatch(message)
+        await _delivered(receiver)
+
+        assert [event for event, _, _ in broker._buffer] == ["run-1_event_1"]
+        assert broker._buffer[0][1] == event
+
+    @pytest.mark.asyncio
+    async def test_mark_finished_publishes_once(self):
+        """Test that completion is broadcast once"""
+        manager = PostgresBrokerManager()
+        broker = manager.get_or_create_broker("run-1")
+
+        broker.mark_finished()
+        broker.mark_finished()
+
+        assert manager._outbox.qsize() == 1
+        assert json.loads(manager._outbox.get_nowait())["f"] is True
+
+    @pytest.mark.asyncio
+    async def test_dispatch_delivers_remote_events(self):
+        """Test that notifications of other processes reach local subscribers"""
+        manager = PostgresBrokerManager()
+        broker = manager.get_or_create_broker("run-1")
+        wire = event_to_wire("run-1_event_1", ("values", {}))
+        payload = json.dumps(
+            {"o": "other", "r": "run-1", "e": "run-1_event_1", "p": wire}
+        )
+
+        await manager._dispatch(payload)
+        await manager._dispatch(json.dumps({"o": "other", "r": "run-1", "f": True}))
+        await _delivered(manager)
+
+        events = [event async for event in broker.aiter()]
+        assert events == [("run-1_event_1", event_from_wire("run-1_event_1", wire))]
+        assert broker.is_finished()
+        # Remote events are not re-published
+        assert manager._outbox.empty()
+
+    @pytest.mark.asyncio
+    async def test_remote_end_event_publishes_nothing(self):
+        """Test a run ending elsewhere doesn't re-broadcast its completion"""
+        manager = PostgresBrokerManager()
+        broker = manager.get_or_create_broker("run-1")
+        wire = event_to_wire("run-1_event_1", ("end", {"status": "completed"}))
+
+        await manager._dispatch(
+            json.dumps({"o": "other", "r": "run-1", "e": "run-1_event_1", "p": wire})
+        )
+        await _delivered(manager)
+
+        assert broker.is_finished()
+        assert manager._outbox.empty()
+
+    @pytest.mark.asyncio
+    async def test_dispatch_ignores_own_notifications(self):
+        """Test that a process skips the notifications it sent itself"""
+        manager = PostgresBrokerManager()
+        payload = json.dumps(
+            {"o": manager.origin, "r": "run-1", "e": "run-1_event_1", "p": []}
+        )
+
+        await manager._dispatch(payload)
+
+        assert manager.get_broker("run-1") is None
+
+    @pytest.mark.asyncio
+    async def test_dispatch_drops_runs_not_streamed_here(self):
+        """Test notifications of runs without a local broker are dropped"""
+        manager = PostgresBrokerManager()
+        wire = event_to_wire("run-1_event_1", ("values", {}))
+
+        await manager._dispatch(
+            json.dumps({"o": "other", "r": "run-1", "e": "run-1_event_1", "p": wire})
+        )
+        await manager._dispatch(json.dumps({"o": "other", "r": "run-1", "f": True}))
+
+        assert manager.get_broker("run-1") is None
+        assert manager.get_stats()["notifications_dropped"] == 2
+        # A subscriber joining afterwards doesn't wait for a finished run
+        assert manager.get_or_create_broker("run-1").is_finished()
+        assert not manager.get_or_create_broker("run-2").is_finished()
+
+    @pytest.mark.asyncio
+    async def test_reference_does_not_hold_up_other_runs(self):
+        """Test a run waiting for a referenced event doesn't delay other runs"""
+        manager = PostgresBrokerManager()
+        slow = manager.get_or_create_broker("run-1")
+        fast = manager.get_or_create_broker("run-2")
+        persisted = asyncio.Event()
+        stored = SSEEvent(id="run-1_event_1", event="values", data={"chunk": {}})
+
+        async def get_event(_event_id):
+            await persisted.wait()
+            return stored
+
+        with patch("src.agent_server.services.pg_broker.event_store") as mock_store:
+            mock_store.get_event = get_event
+            await manager._dispatch(
+                json.dumps(
+                    {"o": "other", "r": "run-1", "e": "run-1_event_1", "ref": True}
+                )
+            )
+            await manager._dispatch(
+                json.dumps(
+                    {
+                        "o": "other",
+                        "r": "run-2",
+                        "e": "run-2_event_1",
+                        "p": event_to_wire("run-2_event_1", ("values", {})),
+                    }
+                )
+            )
+            await asyncio.wait_for(manager._deliveries["run-2"], timeout=1)
+            assert fast.next_offset == 1
+            assert slow.next_offset == 0
+
+            persisted.set()
+            await _delivered(manager)
+        assert slow.next_offset == 1
+
+    @pytest.mark.asyncio
+    async def test_dispatch_resolves_references(self):
+        """Test that referenced events are loaded from the event store"""
+        manager = PostgresBrokerManager()
+        broker = manager.get_or_create_broker("run-1")
+        stored = SSEEvent(id="run-1_event_1", event="values", data={"chunk": {"x": 1}})
+        payload = json.dumps(
+            {"o": "other", "r": "run-1", "e": "run-1_event_1", "ref": True}
+        )
+
+        with patch("src.agent_server.services.pg_broker.event_store") as mock_store:
+            mock_store.get_event = AsyncMock(side_effect=[None, stored])
+            await manager._dispatch(payload)
+            await _delivered(manager)
+
+        event_id, event, _ = broker._buffer[0]
+        assert event_id == "run-1_event_1"
+        assert event.frame == stored_event_to_encoded(stored).frame
+        assert mock_store.get_event.await_count == 2
+
+
+class TestCreateBrokerManager:
+    """Test backend selection"""
+
+    def test_backend_selection(self, monkeypatch):
+        """Test that BROKER_BACKEND selects the broker implementation"""
+        from src.agent_server.services.broker import (
+            BrokerManager,
+            create_broker_manager,
+        )
+
+        monkeypatch.setenv("BROKER_BACKEND", "postgres")
+        assert isinstance(create_broker_manager(), PostgresBrokerManager)
+
+        monkeypatch.setenv("BROKER_BACKEND", "memory")
+        manager = create_broker_manager()
+        assert type(manager) is BrokerManager
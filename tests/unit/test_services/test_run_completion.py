@@ -0,0 +1,79 @@
+"""Unit tests for cross-process run completion notifications"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.agent_server.services.run_completion import RunCompletion
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestRunCompletion:
+    """Test waiting on runs, notifications and the registration race"""
+
+    @pytest.mark.asyncio
+    async def test_notification_wakes_every_waiter(self):
+        """Test a completion from another process resolves all waiters of a run"""
+        completion = RunCompletion()
+        with patch.object(
+            completion, "_fetch_status", AsyncMock(return_value="running")
+        ):
+            waiters = [
+                asyncio.create_task(completion.wait("run-1", timeout=5))
+                for _ in range(2)
+            ]
+            await _settle()
+            assert completion.get_stats()["waiters"] == 2
+
+            payload = json.dumps({"run_id": "run-1", "status": "completed"})
+            completion._on_notification(None, 0, completion.channel, payload)
+
+            assert await asyncio.gather(*waiters) == ["completed", "completed"]
+        assert completion.get_stats()["awaited_runs"] == 0
+        assert completion.get_stats()["notified_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_finished_run_returns_without_waiting(self):
+        """Test a run already ended when the waiter registers returns at once"""
+        completion = RunCompletion()
+        with patch.object(
+            completion, "_fetch_status", AsyncMock(return_value="failed")
+        ):
+            assert await completion.wait("run-1", timeout=5) == "failed"
+
+    @pytest.mark.asyncio
+    async def test_timeout_leaves_run_alone(self):
+        """Test a waiter gives up after its timeout while the run is active"""
+        completion = RunCompletion()
+        with patch.object(
+            completion, "_fetch_status", AsyncMock(return_value="pending")
+        ):
+            assert await completion.wait("run-1", timeout=0.01) is None
+            # Non-terminal statuses and malformed payloads are ignored
+            completion.resolve("run-1", "running")
+            completion._on_notification(None, 0, completion.channel, "not json")
+        assert completion.get_stats()["awaited_runs"] == 0
+
+    @pytest.mark.asyncio
+    async def test_notify_is_sent_only_for_terminal_statuses(self):
+        """Test NOTIFY is issued in the caller's transaction for terminal runs"""
+        completion = RunCompletion()
+        session = MagicMock()
+        session.execute = AsyncMock()
+
+        await completion.notify(session, "run-1", "running")
+        session.execute.assert_not_awaited()
+
+        await completion.notify(session, "run-1", "interrupted")
+        params = session.execute.call_args.args[1]
+        assert params["channel"] == completion.channel
+        assert json.loads(params["payload"]) == {
+            "run_id": "run-1",
+            "status": "interrupted",
+        }
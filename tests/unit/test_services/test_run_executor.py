@@ -0,0 +1,285 @@
+"""Unit tests for the bounded run executor"""
+
+import asyncio
+
+import pytest
+
+from src.agent_server.services.run_executor import (
+    RunExecutor,
+    RunQueueFullError,
+    SchedulingPolicy,
+)
+
+
+class _Runs:
+    """Runs that block until released, recording their start order"""
+
+    def __init__(self):
+        self.started: list[str] = []
+        self.release: dict[str, asyncio.Event] = {}
+
+    def factory(self, run_id: str):
+        self.release[run_id] = asyncio.Event()
+
+        async def run():
+            self.started.append(run_id)
+            await self.release[run_id].wait()
+            return run_id
+
+        return run
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestRunExecutor:
+    """Test concurrency limits, queueing and admission control"""
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrency_and_admits_in_order(self):
+        """Test queued runs start in submission order as slots free up"""
+        executor = RunExecutor(max_concurrency=2, max_queue=10)
+        runs = _Runs()
+        tasks = [
+            executor.submit(run_id, runs.factory(run_id))
+            for run_id in ("a", "b", "c", "d")
+        ]
+        await _settle()
+
+        assert runs.started == ["a", "b"]
+        assert executor.get_stats()["queued"] == 2
+
+        runs.release["b"].set()
+        await _settle()
+        assert runs.started == ["a", "b", "c"]
+
+        for event in runs.release.values():
+            event.set()
+        assert await asyncio.gather(*tasks) == ["a", "b", "c", "d"]
+        stats = executor.get_stats()
+        assert stats["running"] == 0
+        assert stats["queued"] == 0
+        assert stats["admitted_total"] == 4
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_is_full(self):
+        """Test admission fails fast once every slot and queue place is taken"""
+        executor = RunExecutor(max_concurrency=1, max_queue=1)
+        runs = _Runs()
+        executor.ensure_capacity()
+        executor.submit("a", runs.factory("a"))
+        executor.ensure_capacity()
+        executor.submit("b", runs.factory("b"))
+
+        with pytest.raises(RunQueueFullError) as exc_info:
+            executor.ensure_capacity()
+
+        assert exc_info.value.retry_after >= 1
+        assert executor.get_stats()["rejected_total"] == 1
+        for event in runs.release.values():
+            event.set()
+
+    @pytest.mark.asyncio
+    async def test_cancel_queued_run_never_starts(self):
+        """Test a run cancelled while queued is skipped without taking a slot"""
+        executor = RunExecutor(max_concurrency=1, max_queue=10)
+        runs = _Runs()
+        first = executor.submit("a", runs.factory("a"))
+        queued = executor.submit("b", runs.factory("b"))
+        last = executor.submit("c", runs.factory("c"))
+        await _settle()
+
+        assert executor.cancel_queued("b")
+        assert not executor.cancel_queued("a")
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        runs.release["a"].set()
+        runs.release["c"].set()
+        await asyncio.gather(first, last)
+        assert runs.started == ["a", "c"]
+        assert executor.running == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_run_frees_its_slot(self):
+        """Test a run raising an error releases its slot to the next run"""
+        executor = RunExecutor(max_concurrency=1, max_queue=10)
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def succeed():
+            return "ok"
+
+        failing = executor.submit("a", fail)
+        following = executor.submit("b", succeed)
+
+        with pytest.raises(RuntimeError):
+            await failing
+        assert await following == "ok"
+        assert executor.running == 0
+
+
+class TestFairScheduling:
+    """Test weighted fair queueing across users and per-tenant quotas"""
+
+    @pytest.mark.parametrize(
+        ("weights", "expected"),
+        [
+            ({}, ["a1", "b1", "a2", "b2", "a3", "a4"]),
+            ({"a": 2.0}, ["a1", "b1", "a2", "a3", "b2", "a4"]),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_users_share_slots_by_weight(self, weights, expected):
+        """Test a busy user cannot starve others and weights set the share"""
+        executor = RunExecutor(
+            max_concurrency=1,
+            max_queue=20,
+            policy=SchedulingPolicy(weights=weights),
+        )
+        runs = _Runs()
+        blocker = executor.submit("x", runs.factory("x"), user_id="c")
+        tasks = [
+            executor.submit(run_id, runs.factory(run_id), user_id=run_id[0])
+            for run_id in ("a1", "a2", "a3", "a4", "b1", "b2")
+        ]
+        runs.release["x"].set()
+        await blocker
+
+        for run_id in expected:
+            await _settle()
+            assert runs.started[-1] == run_id
+            runs.release[run_id].set()
+        await asyncio.gather(*tasks)
+
+    @pytest.mark.asyncio
+    async def test_quotas_hold_back_only_their_tenant(self):
+        """Test runs over a user or assistant quota wait while others proceed"""
+        executor = RunExecutor(
+            max_concurrency=4,
+            max_queue=10,
+            policy=SchedulingPolicy(user_limit=1, assistant_limits={"graph": 2}),
+        )
+        runs = _Runs()
+        tasks = [
+            executor.submit(
+                run_id,
+                runs.factory(run_id),
+                user_id=user_id,
+                assistant_id=f"assistant-{user_id}",
+                graph_id="graph",
+            )
+            for run_id, user_id in (("a1", "a"), ("a2", "a"), ("b1", "b"))
+        ]
+        tasks.append(
+            executor.submit("c1", runs.factory("c1"), user_id="c", assistant_id="other")
+        )
+        await _settle()
+
+        assert runs.started == ["a1", "b1", "c1"]
+        stats = executor.get_stats()
+        assert stats["users"]["a"]["running"] == 1
+        assert stats["users"]["a"]["queued"] == 1
+        assert stats["users"]["b"]["admitted_total"] == 1
+        # Runs under the graph quota are counted together
+        assert stats["assistants"]["graph"]["running"] == 2
+        assert stats["assistants"]["other"]["running"] == 1
+
+        runs.release["a1"].set()
+        await _settle()
+        assert runs.started[-1] == "a2"
+        assert executor.get_stats()["users"]["a"]["admitted_total"] == 2
+
+        for event in runs.release.values():
+            event.set()
+        await asyncio.gather(*tasks)
+
+    @pytest.mark.asyncio
+    async def test_graph_quota_spans_its_assistants(self):
+        """Test a graph id quota caps runs of all the graph's assistants together"""
+        executor = RunExecutor(
+            max_concurrency=4,
+            max_queue=10,
+            policy=SchedulingPolicy(assistant_limits={"graph": 1, "assistant-own": 1}),
+        )
+        runs = _Runs()
+        tasks = [
+            executor.submit(
+                run_id,
+                runs.factory(run_id),
+                user_id=run_id,
+                assistant_id=assistant_id,
+                graph_id="graph",
+            )
+            for run_id, assistant_id in (
+                ("x1", "assistant-x"),
+                ("y1", "assistant-y"),
+                ("own1", "assistant-own"),
+            )
+        ]
+        await _settle()
+
+        # assistant-own has its own quota; the others share the graph's
+        assert runs.started == ["x1", "own1"]
+
+        runs.release["x1"].set()
+        await _settle()
+        assert runs.started[-1] == "y1"
+        assert "graph" in executor.get_stats()["assistants"]
+
+        for event in runs.release.values():
+            event.set()
+        await asyncio.gather(*tasks)
+        assert executor.get_stats()["assistants"] == {}
+
+    @pytest.mark.asyncio
+    async def test_idle_users_are_forgotten(self):
+        """Test users without runs stop holding scheduler state"""
+        executor = RunExecutor(max_concurrency=1, max_queue=20)
+        runs = _Runs()
+        tasks = [
+            executor.submit(run_id, runs.factory(run_id), user_id=run_id[0])
+            for run_id in ("a1", "a2", "b1")
+        ]
+        await _settle()
+
+        runs.release["a1"].set()
+        await _settle()
+        assert runs.started[-1] == "b1"
+        runs.release["b1"].set()
+        await _settle()
+        # a2 moved the clock past b's finish tag while a is still busy
+        assert runs.started[-1] == "a2"
+        assert set(executor._finish) == {"a"}
+        assert set(executor.get_stats()["users"]) == {"a"}
+
+        runs.release["a2"].set()
+        await asyncio.gather(*tasks)
+        assert executor._finish == {}
+        assert executor.get_stats()["users"] == {}
+
+        # A returning user is scheduled as usual
+        task = executor.submit("b2", runs.factory("b2"), user_id="b")
+        await _settle()
+        assert runs.started[-1] == "b2"
+        runs.release["b2"].set()
+        await task
+
+    def test_policy_from_env(self, monkeypatch):
+        """Test quotas and weights are read from the environment"""
+        monkeypatch.setenv("RUN_USER_MAX_CONCURRENCY", "2")
+        monkeypatch.setenv("RUN_USER_QUOTAS", "vip=10, bad")
+        monkeypatch.setenv("RUN_ASSISTANT_QUOTAS", "agent=3")
+        monkeypatch.setenv("RUN_USER_WEIGHTS", "vip=4,zero=0")
+
+        policy = SchedulingPolicy.from_env()
+
+        assert policy.user_quota("vip") == 10
+        assert policy.user_quota("someone") == 2
+        assert policy.assistant_quota("assistant-id", "agent") == 3
+        assert policy.assistant_quota("assistant-id", "other") == 0
+        assert policy.weight("vip") == 4.0
+        assert policy.weight("zero") == 1.0
@@ -0,0 +1,101 @@
+"""Unit tests for the out-of-process run worker"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from src.agent_server.services.run_worker import RunWorker
+
+
+def _run(run_id: str) -> SimpleNamespace:
+    return SimpleNamespace(run_id=run_id, thread_id=f"thread-{run_id}")
+
+
+async def _settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+class _PendingRuns:
+    """Pending runs handed out by a fake claim, recording the limits asked"""
+
+    def __init__(self, run_ids: list[str]):
+        self.pending = [_run(run_id) for run_id in run_ids]
+        self.limits: list[int] = []
+
+    async def claim(self, limit: int):
+        self.limits.append(limit)
+        claimed, self.pending = self.pending[:limit], self.pending[limit:]
+        return claimed
+
+
+class TestRunWorker:
+    """Test claiming within the slot limit, wake-ups and cancellation"""
+
+    @pytest.mark.asyncio
+    async def test_claims_only_free_slots(self):
+        """Test a worker never holds more runs than its concurrency"""
+        worker = RunWorker(concurrency=2, poll_interval=60)
+        runs = _PendingRuns(["a", "b", "c"])
+        release = {run.run_id: asyncio.Event() for run in runs.pending}
+        started: list[str] = []
+
+        async def execute(run_orm):
+            started.append(run_orm.run_id)
+            await release[run_orm.run_id].wait()
+
+        async def no_listen():
+            await asyncio.Event().wait()
+
+        with (
+            patch.object(worker, "claim", runs.claim),
+            patch.object(worker, "_listen_loop", no_listen),
+            patch("src.agent_server.api.runs.execute_stored_run", execute),
+            patch("src.agent_server.api.runs.active_runs", {}),
+        ):
+            loop_task = asyncio.create_task(worker.run())
+            await _settle()
+            assert started == ["a", "b"]
+            assert worker.running == 2
+
+            # A finished run frees a slot and wakes the claim loop
+            release["a"].set()
+            await _settle()
+            assert started == ["a", "b", "c"]
+            assert runs.limits == [2, 1]
+
+            release["b"].set()
+            release["c"].set()
+            await worker.stop(timeout=1)
+            await loop_task
+
+        assert worker.get_stats()["claimed_total"] == 3
+        assert worker.running == 0
+
+    @pytest.mark.asyncio
+    async def test_notifications_wake_up_and_cancel(self):
+        """Test an empty payload wakes the worker and a cancel stops a run"""
+        worker = RunWorker(concurrency=1)
+        task = asyncio.create_task(asyncio.Event().wait())
+        worker._tasks["a"] = task
+
+        worker._on_notification(None, 0, worker.channel, "")
+        assert worker._wakeup.is_set()
+
+        worker._on_notification(None, 0, worker.channel, json.dumps({"cancel": "a"}))
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    @pytest.mark.asyncio
+    async def test_stop_cancels_runs_past_the_drain_timeout(self):
+        """Test runs still executing after the drain timeout are cancelled"""
+        worker = RunWorker(concurrency=1)
+        task = asyncio.create_task(asyncio.Event().wait())
+        worker._tasks["a"] = task
+
+        await worker.stop(timeout=0.01)
+
+        assert task.cancelled()
@@ -0,0 +1,544 @@
+"""Unit tests for StreamingService live streaming"""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from src.agent_server.core.sse import EncodedEvent, SSEEvent
+from src.agent_server.services.broker import BrokerManager
+from src.agent_server.services.event_compactor import FOLDED_FROM
+from src.agent_server.services.event_converter import EventConverter
+from src.agent_server.services.event_persistence import EventPersistencePolicy
+from src.agent_server.services.streaming_service import StreamingService
+from tests.fixtures.test_helpers import make_run
+
+
+class TestStreamLiveEvents:
+    """Test live streaming from the broker"""
+
+    @pytest.mark.asyncio
+    async def test_lagged_subscriber_resumes_from_event_store(self):
+        """Test that a disconnected slow subscriber is resumed from stored events"""
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="running")
+        broker = manager.get_or_create_broker("run-1")
+        broker.buffer_size = 2
+
+        stored = [
+            SSEEvent(id="run-1_event_2", event="values", data={"chunk": {"n": 2}}),
+            SSEEvent(id="run-1_event_3", event="values", data={"chunk": {"n": 3}}),
+        ]
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_store"
+            ) as mock_store,
+        ):
+            replays = []
+
+            async def iter_events(_run_id, after_seq=-1, before_seq=None):
+                replays.append((after_seq, before_seq))
+                for ev in stored:
+                    seq = int(ev.id.split("_event_")[-1])
+                    if seq > after_seq and (before_seq is None or seq < before_seq):
+                        yield ev
+
+            mock_store.iter_events = iter_events
+            stream = service._stream_live_events(run, 0)
+
+            await broker.put("run-1_event_1", ("values", {"n": 1}))
+            assert "run-1_event_1" in await anext(stream)
+
+            # Overflow the buffer while the client is not reading
+            await broker.put("run-1_event_2", ("values", {"n": 2}))
+            await broker.put("run-1_event_3", ("values", {"n": 3}))
+            await broker.put("run-1_event_4", ("values", {"n": 4}))
+            await broker.put("run-1_event_5", ("end", {}))
+
+            frames = [frame async for frame in stream]
+
+        ids = [line for frame in frames for line in frame.split("\n") if "id:" in line]
+        assert ids == [
+            "id: run-1_event_2",
+            "id: run-1_event_3",
+            "id: run-1_event_4",
+            "id: run-1_event_5",
+        ]
+        assert (1, None) in replays
+
+    @pytest.mark.asyncio
+    async def test_reconnect_is_served_from_buffered_tail(self):
+        """Test that a reconnect covered by the broker buffer skips the store"""
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="running")
+        broker = manager.get_or_create_broker("run-1")
+        for seq in range(1, 4):
+            await broker.put(f"run-1_event_{seq}", ("values", {"n": seq}))
+        await broker.put("run-1_event_4", ("end", {}))
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_store"
+            ) as mock_store,
+        ):
+            frames = [
+                frame
+                async for frame in service.stream_run_execution(run, "run-1_event_1")
+            ]
+
+        ids = [line for frame in frames for line in frame.split("\n") if "id:" in line]
+        assert ids == ["id: run-1_event_2", "id: run-1_event_3", "id: run-1_event_4"]
+        mock_store.iter_events.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_reconnect_reads_only_evicted_gap_from_store(self):
+        """Test that only events evicted from the buffer are read from the store"""
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="running")
+        broker = manager.get_or_create_broker("run-1")
+        broker.buffer_size = 2
+        for seq in range(1, 5):
+            await broker.put(f"run-1_event_{seq}", ("values", {"n": seq}))
+        await broker.put("run-1_event_5", ("end", {}))
+
+        stored = [
+            SSEEvent(id=f"run-1_event_{seq}", event="values", data={"chunk": {}})
+            for seq in range(1, 5)
+        ]
+        replays = []
+
+        async def iter_events(_run_id, after_seq=-1, before_seq=None):
+            replays.append((after_seq, before_seq))
+            for ev in stored:
+                seq = int(ev.id.split("_event_")[-1])
+                if seq > after_seq and (before_seq is None or seq < before_seq):
+                    yield ev
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_store"
+            ) as mock_store,
+        ):
+            mock_store.iter_events = iter_events
+            frames = [
+                frame
+                async for frame in service.stream_run_execution(run, "run-1_event_1")
+            ]
+
+        ids = [line for frame in frames for line in frame.split("\n") if "id:" in line]
+        assert ids == [
+            "id: run-1_event_2",
+            "id: run-1_event_3",
+            "id: run-1_event_4",
+            "id: run-1_event_5",
+        ]
+        assert replays == [(1, 4)]
+
+    @pytest.mark.asyncio
+    async def test_run_finished_before_subscribing_reads_stored_tail(self):
+        """Test a live stream with no live events reads the rest from the store"""
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="running")
+        # The run ended in another process before this subscriber joined
+        manager.get_or_create_broker("run-1").mark_finished()
+        stored = [
+            SSEEvent(id=f"run-1_event_{seq}", event="values", data={"chunk": {}})
+            for seq in range(1, 4)
+        ]
+
+        async def iter_events(_run_id, after_seq=-1, before_seq=None):
+            for ev in stored:
+                if int(ev.id.split("_event_")[-1]) > after_seq:
+                    yield ev
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_store"
+            ) as mock_store,
+        ):
+            mock_store.iter_events = iter_events
+            frames = [frame async for frame in service._stream_live_events(run, 1)]
+
+        ids = [line for frame in frames for line in frame.split("\n") if "id:" in line]
+        assert ids == ["id: run-1_event_2", "id: run-1_event_3"]
+
+    @pytest.mark.asyncio
+    async def test_gap_waits_for_events_persisted_elsewhere(self):
+        """Test a gap is replayed once another process's rows reach the store"""
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="running")
+        broker = manager.get_or_create_broker("run-1")
+        # Received from the origin process, which stored events 2 and 3 first
+        await broker.put(
+            "run-1_event_4",
+            EncodedEvent(
+                "run-1_event_4", "end", "id: run-1_event_4\n\n", stored_before=3
+            ),
+        )
+        stored = [
+            SSEEvent(id=f"run-1_event_{seq}", event="values", data={"chunk": {}})
+            for seq in (2, 3)
+        ]
+        reads = []
+
+        async def iter_events(_run_id, after_seq=-1, before_seq=None):
+            # The origin's writer persists one more row per read
+            reads.append(after_seq)
+            for ev in stored[: len(reads)]:
+                if int(ev.id.split("_event_")[-1]) > after_seq:
+                    yield ev
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_store"
+            ) as mock_store,
+        ):
+            mock_store.iter_events = iter_events
+            frames = [frame async for frame in service._stream_live_events(run, 1)]
+
+        ids = [line for frame in frames for line in frame.split("\n") if "id:" in line]
+        assert ids == ["id: run-1_event_2", "id: run-1_event_3", "id: run-1_event_4"]
+        assert reads == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_gap_missing_from_store_fails_the_stream(self):
+        """Test events that never reach the store end the stream with an error"""
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="running")
+        broker = manager.get_or_create_broker("run-1")
+        await broker.put(
+            "run-1_event_4",
+            EncodedEvent(
+                "run-1_event_4", "end", "id: run-1_event_4\n\n", stored_before=3
+            ),
+        )
+
+        async def iter_events(_run_id, after_seq=-1, before_seq=None):
+            return
+            yield
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_store"
+            ) as mock_store,
+            patch(
+                "src.agent_server.services.streaming_service.STORE_LAG_TIMEOUT", 0.05
+            ),
+        ):
+            mock_store.iter_events = iter_events
+            frames = [
+                frame
+                async for frame in service.stream_run_execution(run, "run-1_event_1")
+            ]
+
+        assert len(frames) == 1
+        assert "event: error" in frames[0]
+        assert "not persisted" in frames[0]
+
+
+class TestStoredReplay:
+    """Test replaying the stored events of a finished run"""
+
+    @pytest.mark.asyncio
+    async def test_stored_updates_replay_as_updates(self):
+        """Test node updates replay under the updates event, as sent live.
+
+        They used to be stored and replayed as values events; interrupt
+        updates are still sent and replayed as values.
+        """
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="completed")
+        raw_events = [
+            ("values", {"x": 1}),
+            ("updates", {"node": {"x": 2}}),
+            ("updates", {"__interrupt__": [{"value": "ok?"}]}),
+        ]
+        stored = []
+        for seq, raw_event in enumerate(raw_events, start=1):
+            encoded = EventConverter().encode_raw_event(f"run-1_event_{seq}", raw_event)
+            stored.append(
+                SSEEvent(
+                    id=encoded.id,
+                    event=encoded.stored_event,
+                    data=json.loads(encoded.stored_data),
+                )
+            )
+
+        async def iter_events(_run_id, after_seq=-1, before_seq=None):
+            for ev in stored:
+                yield ev
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_store"
+            ) as mock_store,
+        ):
+            mock_store.iter_events = iter_events
+            frames = [
+                frame
+                async for frame in service.stream_run_execution(
+                    run, last_event_id="run-1_event_0"
+                )
+            ]
+
+        events = [
+            line for frame in frames for line in frame.split("\n") if "event:" in line
+        ]
+        assert events == ["event: values", "event: updates", "event: values"]
+        assert 'data: {"node":{"x":2}}' in frames[1]
+
+    @pytest.mark.parametrize(
+        ("last_event_id", "expected"),
+        [
+            ("run-1_event_1", ["event: messages", "event: values"]),
+            ("run-1_event_2", ["event: values"]),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_resume_inside_folded_message_skips_it(self, last_event_id, expected):
+        """Test a resume after part of a compacted message doesn't resend it"""
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="completed")
+        chunk = AIMessageChunk(content="Hello world", id="msg-1")
+        stored = []
+        # Compaction folded the chunks at sequences 2 to 4 into the last one
+        for seq, raw_event, extra in [
+            (1, ("values", {"x": 1}), {}),
+            (4, ("messages", chunk), {FOLDED_FROM: 2}),
+            (5, ("values", {"x": 2}), {}),
+        ]:
+            encoded = EventConverter().encode_raw_event(f"run-1_event_{seq}", raw_event)
+            data = {**json.loads(encoded.stored_data), **extra}
+            stored.append(
+                SSEEvent(id=encoded.id, event=encoded.stored_event, data=data)
+            )
+
+        async def iter_events(_run_id, after_seq=-1, before_seq=None):
+            for ev in stored:
+                if int(ev.id.split("_event_")[-1]) > after_seq:
+                    yield ev
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_store"
+            ) as mock_store,
+        ):
+            mock_store.iter_events = iter_events
+            frames = [
+                frame
+                async for frame in service.stream_run_execution(run, last_event_id)
+            ]
+
+        events = [
+            line for frame in frames for line in frame.split("\n") if "event:" in line
+        ]
+        assert events == expected
+
+
+class TestStreamStateLifecycle:
+    """Test that streaming keeps run state only while it is needed"""
+
+    @pytest.mark.asyncio
+    async def test_finished_run_does_not_recreate_expired_state(self):
+        """Test that streaming a finished run leaves no broker behind"""
+        manager = BrokerManager()
+        service = StreamingService()
+        run = make_run(run_id="run-1", status="completed")
+
+        with patch(
+            "src.agent_server.services.streaming_service.broker_manager", manager
+        ):
+            frames = [frame async for frame in service._stream_live_events(run, 0)]
+
+        assert frames == []
+        assert manager.get_state("run-1") is None
+
+    @pytest.mark.asyncio
+    async def test_error_signal_continues_run_sequence(self):
+        """Test that terminal signals use the counter of the run's stream state"""
+        manager = BrokerManager(state_ttl=0)
+        service = StreamingService()
+
+        with patch(
+            "src.agent_server.services.streaming_service.broker_manager", manager
+        ):
+            broker = manager.get_or_create_broker("run-1")
+            await service.put_to_broker("run-1", "run-1_event_4", ("values", {}))
+            subscriber = broker.aiter()
+            await anext(subscriber)
+
+            await service.signal_run_error("run-1", "boom")
+
+            event_id, payload = await anext(subscriber)
+            await subscriber.aclose()
+
+        assert event_id == "run-1_event_5"
+        assert payload.mode == "end"
+        assert '"status":"failed"' in payload.stored_data
+        # Finished and unsubscribed: the state expired immediately
+        assert manager.get_state("run-1") is None
+
+
+class TestEncodeOnce:
+    """Test that each event is serialized once for all consumers"""
+
+    @pytest.mark.asyncio
+    async def test_put_to_broker_shares_encoded_event(self):
+        """Test that subscribers and the event store get the same encoded event"""
+        manager = BrokerManager()
+        service = StreamingService()
+        broker = manager.get_or_create_broker("run-1")
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_writer"
+            ) as mock_writer,
+        ):
+            mock_writer.enqueue = AsyncMock()
+            encoded = await service.put_to_broker(
+                "run-1", "run-1_event_1", ("values", {"n": 1})
+            )
+            await service.store_encoded_event("run-1", encoded)
+
+        assert broker._buffer[0][1] is encoded
+        mock_writer.enqueue.assert_awaited_once_with("run-1", encoded)
+        assert await service._convert_raw_to_sse("run-1_event_1", encoded) is (
+            encoded.frame
+        )
+
+    @pytest.mark.asyncio
+    async def test_persistence_policy_filters_stored_modes(self):
+        """Test only the stream modes of the run's policy reach the store"""
+        service = StreamingService()
+        policy = EventPersistencePolicy(stream_modes=frozenset({"values"}))
+        converter = service.event_converter
+        values = converter.encode_raw_event("run-1_event_1", ("values", {"n": 1}))
+        updates = converter.encode_raw_event("run-1_event_2", ("updates", {"n": 2}))
+
+        with patch(
+            "src.agent_server.services.streaming_service.event_writer"
+        ) as mock_writer:
+            mock_writer.enqueue = AsyncMock()
+            await service.store_encoded_event("run-1", values, policy)
+            await service.store_encoded_event("run-1", updates, policy)
+            await service.store_encoded_event(
+                "run-1", values, EventPersistencePolicy(enabled=False)
+            )
+
+        mock_writer.enqueue.assert_awaited_once_with("run-1", values)
+
+    @pytest.mark.asyncio
+    async def test_unpersisted_events_carry_no_stored_form(self):
+        """Test events the policy doesn't store are brokered without their row"""
+        manager = BrokerManager()
+        service = StreamingService()
+        policy = EventPersistencePolicy(enabled=False)
+
+        with (
+            patch(
+                "src.agent_server.services.streaming_service.broker_manager", manager
+            ),
+            patch(
+                "src.agent_server.services.streaming_service.event_writer"
+            ) as mock_writer,
+        ):
+            mock_writer.enqueue = AsyncMock()
+            encoded = await service.put_to_broker(
+                "run-1", "run-1_event_1", ("values", {"n": 1}), policy=policy
+            )
+            await service.store_encoded_event("run-1", encoded, policy)
+
+        assert encoded.stored_data is None
+        assert '{"n":1}' in encoded.frame
+        assert manager.get_broker("run-1")._buffer[0][1] is encoded
+        mock_writer.enqueue.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_skipped_updates_are_not_encoded(self):
+        """Test that filtered non-interrupt updates never reach broker or store"""
+        manager = BrokerManager()
+        service = StreamingService()
+
+        with patch(
+            "src.agent_server.services.streaming_service.broker_manager", manager
+        ):
+            encoded = await service.put_to_broker(
+                "run-1",
+                "run-1_event_1",
+                ("updates", {"node": {}}),
+                only_interrupt_updates=True,
+            )
+
+        assert encoded is None
+        assert manager.get_broker("run-1").next_offset == 0
+
+
+class TestCoalesceMessages:
+    """Test opt-in token chunk coalescing"""
+
+    def test_disabled_returns_stream_unchanged(self):
+        """Test that the graph stream is untouched unless coalescing is enabled"""
+        service = StreamingService()
+        events = object()
+
+        with patch(
+            "src.agent_server.services.streaming_service.coalescing_enabled",
+            return_value=False,
+        ):
+            assert service.coalesce_messages("run-1", events) is events
+
+    @pytest.mark.asyncio
+    async def test_pressure_follows_subscriber_lag(self):
+        """Test that the coalescing pressure reflects live subscribers"""
+        service = StreamingService()
+        broker = BrokerManager().get_or_create_broker("run-1")
+
+        # Nobody watching: coalesce as much as allowed
+        assert service._drain_pressure(broker, 4) == 1.0
+
+        subscriber = broker.aiter()
+        await broker.put("run-1_event_1", ("values", {}))
+        await anext(subscriber)
+        assert service._drain_pressure(broker, 4) == 0.0
+
+        await broker.put("run-1_event_2", ("values", {}))
+        await broker.put("run-1_event_3", ("values", {}))
+        assert service._drain_pressure(broker, 4) == 0.5
+        await subscriber.aclose()
@@ -0,0 +1,132 @@
+"""Unit tests for the values-delta stream mode encoder"""
+
+import copy
+
+import jsonpatch
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.agent_server.services.values_delta import (
+    ValuesDeltaEncoder,
+    make_json_patch,
+)
+
+
+class TestMakeJsonPatch:
+    """Test RFC 6902 patch generation"""
+
+    def test_patch_applies_to_old_state(self):
+        """Test that applying the patch to the old state yields the new one"""
+        old = {
+            "messages": [{"id": "1", "content": "hi"}],
+            "motoboy": {"name": "Ana", "zona": "norte"},
+            "removed": True,
+            "a/b~c": 1,
+        }
+        new = {
+            "messages": [
+                {"id": "1", "content": "hi"},
+                {"id": "2", "content": "hello"},
+            ],
+            "motoboy": {"name": "Ana", "zona": "sur"},
+            "viaje": None,
+            "a/b~c": 2,
+        }
+
+        patch = make_json_patch(old, new)
+
+        assert jsonpatch.apply_patch(copy.deepcopy(old), patch) == new
+
+    def test_appended_messages_only_add_the_tail(self):
+        """Test that growing the history patches only the new messages"""
+        history = [{"id": str(i), "content": "x" * 100} for i in range(50)]
+        old = {"messages": history}
+        new = {"messages": history + [{"id": "50", "content": "new"}]}
+
+        patch = make_json_patch(old, new)
+
+        assert patch == [
+            {"op": "add", "path": "/messages/50", "value": new["messages"][-1]}
+        ]
+
+    def test_shrinking_list_and_type_changes(self):
+        """Test list truncation and scalar type changes"""
+        old = {"items": [1, 2, 3], "flag": 1}
+        new = {"items": [1], "flag": True}
+
+        patch = make_json_patch(old, new)
+
+        assert jsonpatch.apply_patch(copy.deepcopy(old), patch) == new
+        assert {"op": "replace", "path": "/flag", "value": True} in patch
+
+
+class TestValuesDeltaEncoder:
+    """Test snapshot/patch sequencing"""
+
+    def test_first_event_is_snapshot_then_patches(self):
+        """Test that clients can rebuild every state from the delta events"""
+        encoder = ValuesDeltaEncoder(snapshot_every=10)
+        states = [
+            {"messages": [HumanMessage(content="hola", id="h1")], "step": 1},
+            {
+                "messages": [
+                    HumanMessage(content="hola", id="h1"),
+                    AIMessage(content="buenas", id="a1"),
+                ],
+                "step": 2,
+            },
+        ]
+
+        events = [encoder.encode(("values", state)) for state in states]
+
+        assert events[0][0] == "values-delta"
+        assert "snapshot" in events[0][1]
+        assert "patch" in events[1][1]
+        rebuilt = jsonpatch.apply_patch(events[0][1]["snapshot"], events[1][1]["patch"])
+        assert rebuilt["step"] == 2
+        assert [m["content"] for m in rebuilt["messages"]] == ["hola", "buenas"]
+
+    def test_periodic_snapshot(self):
+        """Test that a full snapshot is sent every snapshot_every events"""
+        encoder = ValuesDeltaEncoder(snapshot_every=3)
+        base = {"history": ["x" * 50] * 10}
+
+        kinds = [
+            next(iter(encoder.encode(("values", {**base, "n": n}))[1]))
+            for n in range(7)
+        ]
+
+        assert kinds == [
+            "snapshot",
+            "patch",
+            "patch",
+            "snapshot",
+            "patch",
+            "patch",
+            "snapshot",
+        ]
+
+    def test_snapshot_when_patch_is_not_smaller(self):
+        """Test that a full rewrite is sent as a snapshot"""
+        encoder = ValuesDeltaEncoder(snapshot_every=10)
+        encoder.encode(("values", {"a": 1}))
+
+        _, delta = encoder.encode(("values", {"b": 2}))
+
+        assert delta == {"snapshot": {"b": 2}}
+
+    def test_subgraph_namespaces_are_independent(self):
+        """Test that subgraph values are diffed against their own namespace"""
+        encoder = ValuesDeltaEncoder(snapshot_every=10)
+        encoder.encode(("values", {"root": "x" * 50}))
+
+        node_path, mode, delta = encoder.encode((("sub",), "values", {"sub": 1}))
+
+        assert (node_path, mode) == (("sub",), "values-delta")
+        assert delta == {"snapshot": {"sub": 1}}
+
+    def test_other_modes_pass_through(self):
+        """Test that non-values events are returned unchanged"""
+        encoder = ValuesDeltaEncoder()
+        event = ("updates", {"node": {}})
+
+        assert encoder.encode(event) is event